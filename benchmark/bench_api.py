@@ -0,0 +1,319 @@
+"""
+Benchmark throughput and peak memory of public Client methods against the
+local fake GCP server (benchmark/fakegcp.py), so regressions of paging,
+uploads, downloads, batching and retries show up without a live project.
+
+The fake server runs in a subprocess and the client is pointed at it by
+DSCLIENT_API_ROOT. Each case is timed over --repeat runs (median) and run
+once more under tracemalloc for peak memory (python 3). HTTP requests are
+counted by the server and retries are taken from client.stats().
+
+    $ python benchmark/bench_api.py --rows 100000 --latency 0.01 --page-size 10000
+    $ python benchmark/bench_api.py --error-rate 0.05 --only query,read_csv
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+
+FAKEGCP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakegcp.py")
+BUCKET = "bench-bucket"
+DATASET = "bench"
+
+
+def start_server(config):
+
+    command = [sys.executable, FAKEGCP, "--port", "0"]
+    for name, value in sorted(config.items()):
+        command += ["--" + name.replace("_", "-"), str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    line = process.stdout.readline().decode("utf-8").strip()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise Exception("fake server did not start: {0}".format(line))
+    return process, line[len("listening on "):]
+
+
+def control(url, path, resource=None):
+
+    # GET if resource is None, else POST of JSON resource.
+    try:
+        from urllib.request import Request, urlopen
+    except ImportError:
+        from urllib2 import Request, urlopen
+    data = None if resource is None else json.dumps(resource).encode("utf-8")
+    request = Request(url + path, data, {"Content-Type": "application/json"})
+    return json.loads(urlopen(request).read().decode("utf-8"))
+
+
+def make_frame(rows, string_size=16):
+
+    index = np.arange(rows)
+    return pd.DataFrame({"id": index, "value": index * 0.5,
+                         "name": [str(i).rjust(string_size, "x") for i in index],
+                         "flag": index % 2 == 1})
+
+
+def make_client(url):
+
+    import dsclient
+    from dsclient.credentials import StaticCredentials
+    from dsclient.retry import RetryPolicy, RetryBudget
+
+    client = dsclient.Client("bench-project")
+    client._credentials = StaticCredentials()
+    # injected errors are retried at once, so time is spent on the client side.
+    client.set_retry_policy(RetryPolicy(max_attempts=10, initial=0.01, max_delay=0.1,
+                                        budget=RetryBudget(tokens=1000)))
+    return client
+
+
+def cases(client, url, args):
+    """
+    Return list of (name, unit, setup, run). run returns number of units processed.
+    """
+
+    rows = args.rows
+    df = make_frame(rows)
+    small = make_frame(min(rows, 10000))
+    shards = 8
+
+    def setup_bucket():
+        control(url, "/_fake/reset", {})
+        client.create_bucket(BUCKET)
+
+    def setup_dataset():
+        setup_bucket()
+        client.create_dataset(DATASET)
+        client.load(small, DATASET + ".source")
+
+    def setup_shards():
+        setup_bucket()
+        part = make_frame(rows // shards)
+        for i in range(shards):
+            client.write_csv(part, "gs://{0}/shards/part-{1:03d}.csv".format(BUCKET, i))
+
+    def setup_blob():
+        setup_bucket()
+        client.write_blob(b"x" * args.blob_bytes, "gs://{0}/blob.bin".format(BUCKET))
+
+    def setup_tables():
+        setup_dataset()
+        for i in range(100):
+            client.create_table("{0}.t{1}".format(DATASET, i), {"schema": {"fields": []}})
+
+    def setup_objects():
+        setup_bucket()
+        for i in range(1000):
+            client.write_blob(b"", "gs://{0}/list/{1:05d}".format(BUCKET, i))
+
+    def query():
+        return len(client.query("SELECT 1", use_cache=False))
+
+    def query_workers():
+        return len(client.query("SELECT 1", use_cache=False, workers=8))
+
+    def query_iter():
+        return sum(len(chunk) for chunk in client.query_iter("SELECT 1", chunk_rows=rows // 4 or 1))
+
+    def lquery():
+        return len(client.lquery("SELECT 1", use_cache=False))
+
+    def load_csv():
+        client.load(df, DATASET + ".loaded", append=False)
+        return rows
+
+    def load_ndjson():
+        client.load(df, DATASET + ".loaded", append=False, source_format="NEWLINE_DELIMITED_JSON")
+        return rows
+
+    def insert():
+        client.insert(small, DATASET + ".streamed", verbose=False)
+        return len(small)
+
+    def gql():
+        return len(client.gql("SELECT * FROM Bench"))
+
+    def write_csv():
+        client.write_csv(df, "gs://{0}/frame.csv".format(BUCKET))
+        return rows
+
+    def read_csv():
+        return len(client.read_csv("gs://{0}/shards/part-000.csv".format(BUCKET)))
+
+    def read_csv_shards():
+        return len(client.read_csv("gs://{0}/shards/part-*".format(BUCKET), processes=1))
+
+    def write_blob():
+        client.write_blob(b"x" * args.blob_bytes, "gs://{0}/written.bin".format(BUCKET))
+        return args.blob_bytes
+
+    def read_blob():
+        return len(client.read_blob("gs://{0}/blob.bin".format(BUCKET)))
+
+    def download():
+        client.download("gs://{0}/blob.bin".format(BUCKET), chunk_size=1024 * 1024)
+        return args.blob_bytes
+
+    def get_table():
+        for i in range(100):
+            client.get_table("{0}.t{1}".format(DATASET, i), use_cache=False)
+        return 100
+
+    def get_tables():
+        return len(client.get_tables(["{0}.t{1}".format(DATASET, i) for i in range(100)]))
+
+    def iter_objects():
+        return sum(1 for _ in client.iter_objects("gs://{0}/list/".format(BUCKET), page_size=100))
+
+    def scheduler_copy():
+        scheduler = client.scheduler(max_running=10)
+        jobs = [scheduler.submit_copy(DATASET + ".source", "{0}.copy{1}".format(DATASET, i))
+                for i in range(20)]
+        scheduler.wait_all()
+        return len(jobs)
+
+    def async_read_csv():
+        import asyncio
+        from dsclient.aio import AsyncClient
+        from dsclient.credentials import StaticCredentials
+
+        async def run():
+            async with AsyncClient("bench-project", None, None, credentials=StaticCredentials()) as aclient:
+                aclient.set_retry_policy(client.get_retry_policy())
+                # retries are reported from stats of client.
+                aclient.add_collector(client._stats_collector)
+                frames = await asyncio.gather(*[
+                    aclient.read_csv("gs://{0}/shards/part-{1:03d}.csv".format(BUCKET, i))
+                    for i in range(shards)])
+            return sum(len(frame) for frame in frames)
+
+        return asyncio.get_event_loop().run_until_complete(run())
+
+    result = [
+        ("query", "rows", setup_dataset, query),
+        ("query(workers=8)", "rows", setup_dataset, query_workers),
+        ("query_iter", "rows", setup_dataset, query_iter),
+        ("lquery", "rows", setup_dataset, lquery),
+        ("load(csv)", "rows", setup_dataset, load_csv),
+        ("load(ndjson)", "rows", setup_dataset, load_ndjson),
+        ("insert", "rows", setup_dataset, insert),
+        ("gql", "entities", setup_bucket, gql),
+        ("write_csv", "rows", setup_bucket, write_csv),
+        ("read_csv", "rows", setup_shards, read_csv),
+        ("read_csv(wildcard)", "rows", setup_shards, read_csv_shards),
+        ("write_blob", "bytes", setup_bucket, write_blob),
+        ("read_blob", "bytes", setup_blob, read_blob),
+        ("download", "bytes", setup_blob, download),
+        ("get_table x100", "calls", setup_tables, get_table),
+        ("get_tables(batch)", "calls", setup_tables, get_tables),
+        ("iter_objects", "items", setup_objects, iter_objects),
+        ("scheduler copy", "jobs", setup_dataset, scheduler_copy),
+    ]
+    if sys.version_info >= (3, 5):
+        try:
+            import aiohttp
+            result.append(("AsyncClient read_csv", "rows", setup_shards, async_read_csv))
+        except ImportError:
+            pass
+    return result
+
+
+def quiet(run):
+
+    # progress lines of load and jobs are not part of the report.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        return run()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def requests(url):
+
+    return control(url, "/_fake/stats")["http_requests"]
+
+
+def measure(client, url, run, repeat):
+
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        units = quiet(run)
+        times.append(time.time() - start)
+    times.sort()
+
+    peak = None
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        quiet(run)
+        peak = tracemalloc.get_traced_memory()[1] / 1024.0 / 1024.0
+        tracemalloc.stop()
+
+    client.reset_stats()
+    before = requests(url)
+    quiet(run)
+    calls = requests(url) - before
+    stats = client.stats()
+    retries = int(stats["retries"].sum()) if len(stats) else 0
+    return times[len(times) // 2], units, peak, calls, retries
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--blob-bytes", type=int, default=16 * 1024 * 1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=10000)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-match", default="")
+    parser.add_argument("--only", default="", help="comma separated case names (prefix match)")
+    args = parser.parse_args()
+
+    config = {"latency": args.latency, "page_size": args.page_size, "error_rate": args.error_rate,
+              "query_rows": args.rows, "gql_entities": args.rows}
+    if args.error_match:
+        config["error_match"] = args.error_match
+    process, url = start_server(config)
+    os.environ["DSCLIENT_API_ROOT"] = url
+    os.environ["DSCLIENT_TOKEN_CACHE"] = ""
+    try:
+        client = make_client(url)
+        only = [name for name in args.only.split(",") if name]
+        print("{0:<22} {1:>9} {2:>22} {3:>10} {4:>8} {5:>8}".format(
+            "case", "time (s)", "throughput", "peak (MB)", "requests", "retries"))
+        for name, unit, setup, run in cases(client, url, args):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            control(url, "/_fake/config", {"error_rate": 0.0})
+            quiet(setup)
+            control(url, "/_fake/config", {"error_rate": args.error_rate})
+            try:
+                sec, units, peak, calls, retries = measure(client, url, run, args.repeat)
+            except Exception as e:
+                print("{0:<22} failed: {1!r}".format(name, e))
+                continue
+            print("{0:<22} {1:9.3f} {2:>22} {3:>10} {4:8d} {5:8d}".format(
+                name, sec, "{0:,.0f} {1}/s".format(units / sec if sec else 0, unit),
+                "-" if peak is None else "{0:.1f}".format(peak), calls, retries))
+    finally:
+        process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark decoding of BigQuery result pages into pandas.DataFrame.
+
+Compares the row-list path (list of lists -> DataFrame -> update_dtype)
+with the columnar decoder in Schema.to_dataframe.
+
+    $ python benchmark/bench_schema.py --rows 1000000
+"""
+from __future__ import print_function
+import argparse
+import random
+import time
+import pandas as pd
+from dsclient.schema import Schema
+
+
+SCHEMA = {"fields": [
+    {"name": "name",  "type": "STRING"},
+    {"name": "count", "type": "INTEGER"},
+    {"name": "score", "type": "FLOAT"},
+    {"name": "flag",  "type": "BOOLEAN"},
+]}
+
+
+def make_rows(nrows, seed=0):
+
+    rnd = random.Random(seed)
+    names = ["name{0}".format(i) for i in range(100)]
+    return [{"f": [{"v": rnd.choice(names)},
+                   {"v": str(rnd.randint(0, 1000000))},
+                   {"v": repr(rnd.random())},
+                   {"v": "true" if rnd.random() > 0.5 else "false"}]}
+            for _ in range(nrows)]
+
+
+def rowlist_to_dataframe(schema, bq_rows):
+
+    rows = [[col["v"] for col in row["f"]] for row in bq_rows]
+    df = pd.DataFrame(rows, columns=schema.get_columns())
+    df = schema.update_dtype(df)
+    return df
+
+
+def measure(func, repeat):
+
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page-size", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    pages = [rows[i:i+args.page_size] for i in range(0, len(rows), args.page_size)]
+    schema = Schema(SCHEMA)
+    cschema = Schema(SCHEMA, categorical=True)
+
+    cases = [
+        ("rowlist + update_dtype", lambda: pd.concat([rowlist_to_dataframe(schema, page) for page in pages])),
+        ("columnar", lambda: pd.concat([schema.to_dataframe(page) for page in pages])),
+        ("columnar (categorical)", lambda: pd.concat([cschema.to_dataframe(page) for page in pages])),
+    ]
+    print("rows: {0}, page size: {1}".format(args.rows, args.page_size))
+    for name, func in cases:
+        sec = measure(func, args.repeat)
+        print("{0:<28} {1:8.3f}s {2:12.0f} rows/s".format(name, sec, args.rows / sec))
+
+
+if __name__ == "__main__":
+    main()
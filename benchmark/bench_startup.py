@@ -0,0 +1,78 @@
+"""
+Benchmark startup time of dsclient: import, Client construction and first
+use of each service (discovery document load and service build).
+
+Each case runs in a fresh interpreter, so module import caches of the
+previous case do not affect it. Credentials are replaced by a dummy one
+that needs no network, so only client side cost is measured.
+
+    $ python benchmark/bench_startup.py --repeat 5
+"""
+from __future__ import print_function
+import argparse
+import json
+import subprocess
+import sys
+
+
+CASE = r"""
+import json, time
+start = time.time()
+import dsclient
+imported = time.time()
+client = dsclient.Client("benchmark-project")
+constructed = time.time()
+
+class DummyCredentials(object):
+    def authorize(self, http):
+        return http
+
+client._load_credentials = lambda scopes: DummyCredentials()
+services = {}
+for name in SERVICES:
+    t = time.time()
+    getattr(client, "_{0}service".format(name))
+    services[name] = time.time() - t
+print(json.dumps({"import": imported - start, "client": constructed - imported, "services": services}))
+"""
+
+
+def run_case(services):
+
+    code = "SERVICES = {0!r}\n".format(services) + CASE
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def median(values):
+
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("import + Client only", []),
+        ("+ storage", ["gs"]),
+        ("+ all services", ["gs", "bq", "ds", "ce"]),
+    ]
+    for name, services in cases:
+        results = [run_case(services) for _ in range(args.repeat)]
+        imported = median([result["import"] for result in results])
+        client = median([result["client"] for result in results])
+        built = median([sum(result["services"].values()) for result in results])
+        print("{0:<22} import {1:6.3f}s  Client() {2:7.4f}s  services {3:6.3f}s  total {4:6.3f}s".format(
+            name, imported, client, built, imported + client + built))
+        if services:
+            for service in services:
+                sec = median([result["services"][service] for result in results])
+                print("    first use of {0}: {1:6.3f}s".format(service, sec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark Schema.update_dtype against the previous whole-frame implementation.
+
+The input frame has object (string) columns, as read from extracted csv
+or decoded from tabledata rows: 1M rows x 10 columns = 10M cells by default.
+
+    $ python benchmark/bench_update_dtype.py --rows 1000000
+"""
+from __future__ import print_function
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from dsclient.schema import Schema
+
+
+FIELDS = [("s0", "STRING"), ("s1", "STRING"), ("s2", "STRING"),
+          ("i0", "INTEGER"), ("i1", "INTEGER"), ("i2", "INTEGER"),
+          ("f0", "FLOAT"), ("f1", "FLOAT"),
+          ("b0", "BOOLEAN"), ("t0", "TIMESTAMP")]
+
+
+def make_frame(nrows, seed=0):
+
+    rnd = np.random.RandomState(seed)
+    data = {}
+    for name, rtype in FIELDS:
+        if rtype == "STRING":
+            values = np.array(["name{0}".format(i) for i in range(100)], dtype=object)[rnd.randint(0, 100, nrows)]
+        elif rtype == "INTEGER":
+            values = rnd.randint(0, 1000000, nrows).astype(str).astype(object)
+        elif rtype == "FLOAT":
+            values = rnd.rand(nrows).astype(str).astype(object)
+        elif rtype == "BOOLEAN":
+            values = np.where(rnd.rand(nrows) > 0.5, "true", "false").astype(object)
+        else:
+            values = (1.4e9 + rnd.randint(0, 10**8, nrows)).astype(str).astype(object)
+        values[rnd.rand(nrows) < 0.01] = None
+        data[name] = values
+    return pd.DataFrame(data, columns=[name for name, rtype in FIELDS])
+
+
+def legacy_update_dtype(df, scols, bcols, ncols, tcols):
+
+    df = df.replace('NaN', np.nan)
+    df[scols] = df[scols].astype(str)
+    df[bcols] = df[bcols].astype(bool)
+    df[ncols] = df[ncols].apply(pd.to_numeric)
+    df[tcols] = df[tcols].apply(lambda c: pd.to_datetime(pd.to_numeric(c), unit="s"))
+    return df
+
+
+def measure(func, repeat):
+
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    cols = lambda rtype: [name for name, t in FIELDS if t == rtype]
+    schema = {"fields": [{"name": name, "type": rtype} for name, rtype in FIELDS]}
+
+    cases = [
+        ("legacy update_dtype", lambda: legacy_update_dtype(df, cols("STRING"), cols("BOOLEAN"),
+                                                            cols("INTEGER") + cols("FLOAT"), cols("TIMESTAMP"))),
+        ("plan (nullable)", lambda: Schema(schema).update_dtype(df)),
+        ("plan (not nullable)", lambda: Schema(schema, nullable=False).update_dtype(df)),
+        ("plan (categorical 0.1)", lambda: Schema(schema, categorical=0.1).update_dtype(df)),
+    ]
+    cells = df.shape[0] * df.shape[1]
+    print("rows: {0}, cells: {1}".format(df.shape[0], cells))
+    for name, func in cases:
+        sec = measure(func, args.repeat)
+        mem = func().memory_usage(deep=True).sum() / 1024.0**2
+        print("{0:<24} {1:8.3f}s {2:12.0f} cells/s {3:10.1f} MB".format(name, sec, cells / sec, mem))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,999 @@
+"""
+Local stand-in of the GCP REST APIs called by dsclient: BigQuery v2,
+Storage v1, Datastore v1 and Compute beta (with batch and resumable upload).
+
+State (datasets, tables, jobs, buckets, objects) is kept in memory.
+Query results and GQL entities are synthesized, their size is set by
+config. Every request can be delayed and errors can be injected, so
+paging, retries and transfers are measured without a live project.
+
+    $ python benchmark/fakegcp.py --port 8080 --latency 0.02 --page-size 10000
+    $ DSCLIENT_API_ROOT=http://127.0.0.1:8080 python your_script.py
+
+Credentials are not checked, use dsclient.credentials.StaticCredentials.
+Config is changed while running by POST /_fake/config (JSON), state is
+cleared by POST /_fake/reset and request counts are read by GET /_fake/stats
+(requests counts API calls including parts of batch requests, http_requests
+counts HTTP requests).
+"""
+from __future__ import print_function
+import io
+import re
+import gzip
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qsl, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qsl
+    from urllib import unquote
+
+
+DEFAULT_CONFIG = {
+    # seconds added to every HTTP request (batch request counts once).
+    "latency": 0.0,
+    # max rows, items or entities of one page (maxResults is capped by it).
+    "page_size": 10000,
+    # fraction of requests answered by error_status / error_reason.
+    "error_rate": 0.0,
+    # number of next requests answered by error (before error_rate is applied).
+    "fail_requests": 0,
+    "error_status": 503,
+    "error_reason": "backendError",
+    # errors are injected only into requests whose "METHOD /path" matches.
+    "error_match": "",
+    # Retry-After header (seconds) of injected errors.
+    "retry_after": None,
+    # number of next jobs finished with errorResult of error_reason.
+    "fail_jobs": 0,
+    # rows of query results, and size of their STRING values.
+    "query_rows": 10000,
+    "string_size": 16,
+    # seconds jobs stay RUNNING (query responses wait up to timeoutMs).
+    "job_seconds": 0.0,
+    # entities returned by Datastore runQuery.
+    "gql_entities": 1000,
+}
+
+QUERY_SCHEMA = {"fields": [
+    {"name": "id", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "value", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "name", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "flag", "type": "BOOLEAN", "mode": "NULLABLE"},
+    {"name": "ts", "type": "TIMESTAMP", "mode": "NULLABLE"},
+]}
+
+STATUS_NAMES = {400: "INVALID_ARGUMENT", 403: "PERMISSION_DENIED", 404: "NOT_FOUND",
+                409: "ALREADY_EXISTS", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL",
+                503: "UNAVAILABLE"}
+
+
+class FakeError(Exception):
+
+    def __init__(self, status, reason, message=""):
+
+        self.status = status
+        self.reason = reason
+        self.message = message or reason
+
+
+def _json(status, resource, headers=None):
+
+    headers = dict(headers or {})
+    headers["Content-Type"] = "application/json; charset=UTF-8"
+    return status, headers, json.dumps(resource).encode("utf-8")
+
+
+# HTTP status of job error reasons (as getQueryResults of failed job answers).
+ERROR_STATUSES = {"invalid": 400, "invalidQuery": 400, "resourcesExceeded": 400,
+                  "accessDenied": 403, "rateLimitExceeded": 403, "notFound": 404,
+                  "duplicate": 409, "backendError": 500, "internalError": 500}
+
+
+def _error(status, reason, message="", headers=None):
+
+    error = {"code": status, "message": message or reason,
+             "errors": [{"reason": reason, "message": message or reason, "domain": "global"}],
+             "status": STATUS_NAMES.get(status, "UNKNOWN")}
+    return _json(status, {"error": error}, headers)
+
+
+def _now_ms():
+
+    return str(int(time.time() * 1000))
+
+
+def _page(items, query, page_size):
+
+    start = int(query.get("pageToken") or 0)
+    size = min(int(query.get("maxResults") or page_size), page_size)
+    end = start + size
+    return items[start:end], (str(end) if end < len(items) else None)
+
+
+def _split_headers(text):
+
+    parts = re.split(r"\r?\n\r?\n", text, 1)
+    lines = parts[0].splitlines()
+    return lines, (parts[1] if len(parts) > 1 else "")
+
+
+class FakeGCP(object):
+    """
+    Request handler and in-memory state of the fake APIs.
+
+    Parameters
+    ----------
+    config : dict
+        overrides of DEFAULT_CONFIG.
+    seed : int
+        seed of error injection.
+    """
+
+    def __init__(self, config=None, seed=0):
+
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._routes = self._make_routes()
+        self.reset()
+
+    def reset(self):
+
+        with self._lock:
+            self.datasets = OrderedDict()
+            self.tables = OrderedDict()
+            self.jobs = OrderedDict()
+            self.buckets = OrderedDict()
+            self.objects = {}
+            self.uploads = {}
+            self.counts = {}
+            self.http_requests = 0
+            self.errors = 0
+            self._next_id = 0
+
+    def _new_id(self, prefix):
+
+        with self._lock:
+            self._next_id += 1
+            return "{0}{1}".format(prefix, self._next_id)
+
+    def _make_routes(self):
+
+        bq = r"^/bigquery/v2/projects/(?P<project>[^/]+)"
+        gs = r"^/storage/v1"
+        routes = [
+            ("POST", bq + r"/queries$", self.bq_query),
+            ("GET", bq + r"/queries/(?P<job>[^/]+)$", self.bq_query_results),
+            ("POST", r"^(/resumable)?(/upload)?/bigquery/v2/projects/(?P<project>[^/]+)/jobs$", self.bq_insert_job),
+            ("GET", bq + r"/jobs$", self.bq_list_jobs),
+            ("GET", bq + r"/jobs/(?P<job>[^/]+)$", self.bq_get_job),
+            ("POST", bq + r"/jobs/(?P<job>[^/]+)/cancel$", self.bq_cancel_job),
+            ("GET", bq + r"/datasets$", self.bq_list_datasets),
+            ("POST", bq + r"/datasets$", self.bq_insert_dataset),
+            ("GET", bq + r"/datasets/(?P<dataset>[^/]+)$", self.bq_get_dataset),
+            ("PATCH", bq + r"/datasets/(?P<dataset>[^/]+)$", self.bq_patch_dataset),
+            ("DELETE", bq + r"/datasets/(?P<dataset>[^/]+)$", self.bq_delete_dataset),
+            ("GET", bq + r"/datasets/(?P<dataset>[^/]+)/tables$", self.bq_list_tables),
+            ("POST", bq + r"/datasets/(?P<dataset>[^/]+)/tables$", self.bq_insert_table),
+            ("GET", bq + r"/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)$", self.bq_get_table),
+            ("PATCH", bq + r"/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)$", self.bq_patch_table),
+            ("PUT", bq + r"/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)$", self.bq_patch_table),
+            ("DELETE", bq + r"/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)$", self.bq_delete_table),
+            ("POST", bq + r"/datasets/(?P<dataset>[^/]+)/tables/(?P<table>[^/]+)/insertAll$", self.bq_insert_all),
+            ("GET", gs + r"/b$", self.gs_list_buckets),
+            ("POST", gs + r"/b$", self.gs_insert_bucket),
+            ("GET", gs + r"/b/(?P<bucket>[^/]+)$", self.gs_get_bucket),
+            ("DELETE", gs + r"/b/(?P<bucket>[^/]+)$", self.gs_delete_bucket),
+            ("GET", gs + r"/b/(?P<bucket>[^/]+)/o$", self.gs_list_objects),
+            ("GET", gs + r"/b/(?P<bucket>[^/]+)/o/(?P<object>[^/]+)$", self.gs_get_object),
+            ("DELETE", gs + r"/b/(?P<bucket>[^/]+)/o/(?P<object>[^/]+)$", self.gs_delete_object),
+            ("POST", r"^(/resumable)?/upload/storage/v1/b/(?P<bucket>[^/]+)/o$", self.gs_insert_object),
+            ("POST", r"^/v1/projects/(?P<project>[^/:]+):runQuery$", self.ds_run_query),
+            ("GET", r"^/compute/beta/projects/(?P<project>[^/]+)/(?P<path>.+)$", self.ce_get),
+            ("POST", r"^/compute/beta/projects/(?P<project>[^/]+)/(?P<path>.+)$", self.ce_operation),
+            ("DELETE", r"^/compute/beta/projects/(?P<project>[^/]+)/(?P<path>.+)$", self.ce_operation),
+            ("PUT", r"^/_fake/upload/(?P<upload>[^/]+)$", self.upload_chunk),
+            ("POST", r"^/_fake/config$", self.fake_config),
+            ("POST", r"^/_fake/reset$", self.fake_reset),
+            ("GET", r"^/_fake/stats$", self.fake_stats),
+        ]
+        return [(method, re.compile(pattern), handler) for method, pattern, handler in routes]
+
+    # request dispatch
+
+    def serve(self, method, url, headers, body, root):
+        """
+        Handle one HTTP request and return (status, headers, body bytes).
+        """
+
+        path = urlsplit(url).path
+        if not path.startswith("/_fake/"):
+            with self._lock:
+                self.http_requests += 1
+            latency = self.config["latency"]
+            if latency:
+                time.sleep(latency)
+        if re.match(r"^/batch(/|$)", path):
+            return self._serve_batch(headers, body, root)
+        return self.dispatch(method, url, headers, body, root)
+
+    def dispatch(self, method, url, headers, body, root):
+
+        parts = urlsplit(url)
+        path = parts.path
+        query = dict(parse_qsl(parts.query))
+        method = headers.get("x-http-method-override", method)
+        if not path.startswith("/_fake/"):
+            with self._lock:
+                key = "{0} {1}".format(method, re.sub(r"/[^/]+$", "/*", path) if method != "POST" else path)
+                self.counts[key] = self.counts.get(key, 0) + 1
+            injected = self._inject_error(method, path)
+            if injected is not None:
+                return injected
+        for route_method, pattern, handler in self._routes:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match is None:
+                continue
+            params = dict((name, unquote(value)) for name, value
+                          in match.groupdict().items() if value is not None)
+            try:
+                return handler(params=params, query=query, headers=headers, body=body, root=root)
+            except FakeError as e:
+                return _error(e.status, e.reason, e.message)
+            except (KeyError, ValueError) as e:
+                return _error(400, "invalid", "invalid request: {0!r}".format(e))
+        return _error(404, "notFound", "{0} {1} is not implemented by fake server".format(method, path))
+
+    def _inject_error(self, method, path):
+
+        config = self.config
+        if not config["error_rate"] and not config["fail_requests"]:
+            return None
+        if config["error_match"] and not re.search(config["error_match"], "{0} {1}".format(method, path)):
+            return None
+        with self._lock:
+            if config["fail_requests"] > 0:
+                config["fail_requests"] -= 1
+            elif self._random.random() >= config["error_rate"]:
+                return None
+            self.errors += 1
+        headers = {}
+        if config["retry_after"] is not None:
+            headers["Retry-After"] = str(config["retry_after"])
+        return _error(config["error_status"], config["error_reason"], "injected error", headers)
+
+    def _serve_batch(self, headers, body, root):
+
+        match = re.search(r'boundary="?([^";]+)"?', headers.get("content-type", ""))
+        if match is None:
+            return _error(400, "invalid", "batch request without boundary")
+        boundary = match.group(1)
+        text = body.decode("utf-8")
+        out_boundary = "batch_" + self._new_id("")
+        chunks = []
+        for part in text.split("--" + boundary)[1:]:
+            if part.startswith("--"):
+                break
+            part_headers, request = _split_headers(part.lstrip("\r\n"))
+            content_id = ""
+            for line in part_headers:
+                if line.lower().startswith("content-id:"):
+                    content_id = line.split(":", 1)[1].strip()[1:-1]
+            request_lines, request_body = _split_headers(request)
+            method, url = request_lines[0].split(" ")[:2]
+            request_headers = dict((line.split(":", 1)[0].strip().lower(), line.split(":", 1)[1].strip())
+                                   for line in request_lines[1:] if ":" in line)
+            status, response_headers, content = self.dispatch(
+                method, url, request_headers, request_body.rstrip("\r\n").encode("utf-8"), root)
+            lines = ["Content-Type: application/http", "Content-ID: <response-{0}>".format(content_id), "",
+                     "HTTP/1.1 {0} {1}".format(status, "OK" if status < 300 else "Error")]
+            lines.extend("{0}: {1}".format(name, value) for name, value in response_headers.items())
+            # as Google, every part has headers (empty 204 is not parsed without them).
+            lines.append("Content-Length: {0}".format(len(content)))
+            lines.extend(["", content.decode("utf-8")])
+            chunks.append("--{0}\r\n{1}\r\n".format(out_boundary, "\r\n".join(lines)))
+        chunks.append("--{0}--\r\n".format(out_boundary))
+        content = "".join(chunks).encode("utf-8")
+        return 200, {"Content-Type": 'multipart/mixed; boundary="{0}"'.format(out_boundary)}, content
+
+    # uploads (media, multipart and resumable)
+
+    def _upload(self, query, headers, body, root, finish):
+
+        upload_type = query.get("uploadType", "media")
+        if upload_type == "resumable":
+            upload_id = self._new_id("upload")
+            metadata = json.loads(body.decode("utf-8")) if body else {}
+            with self._lock:
+                self.uploads[upload_id] = {"metadata": metadata, "data": bytearray(), "finish": finish}
+            return 200, {"Location": "{0}/_fake/upload/{1}".format(root, upload_id)}, b""
+        if upload_type == "multipart":
+            match = re.search(r'boundary="?([^";]+)"?', headers.get("content-type", ""))
+            delimiter = b"--" + match.group(1).encode("utf-8")
+            parts = body.split(delimiter)
+            metadata = json.loads(re.split(b"\r?\n\r?\n", parts[1], 1)[1].decode("utf-8"))
+            data = re.split(b"\r?\n\r?\n", parts[2], 1)[1]
+            return finish(metadata, data[:-2] if data.endswith(b"\r\n") else data.rstrip(b"\n"))
+        return finish({}, body)
+
+    def upload_chunk(self, params, query, headers, body, root):
+
+        with self._lock:
+            upload = self.uploads.get(params["upload"])
+        if upload is None:
+            raise FakeError(404, "notFound", "upload session not found")
+        upload["data"].extend(body)
+        match = re.match(r"bytes (\*|\d+-\d+)/(\*|\d+)", headers.get("content-range", ""))
+        total = match.group(2) if match else str(len(upload["data"]))
+        if total == "*" or int(total) > len(upload["data"]):
+            if not upload["data"]:
+                return 308, {}, b""
+            return 308, {"Range": "bytes=0-{0}".format(len(upload["data"]) - 1)}, b""
+        with self._lock:
+            del self.uploads[params["upload"]]
+        return upload["finish"](upload["metadata"], bytes(upload["data"]))
+
+    # BigQuery
+
+    def _rows(self, start, end):
+
+        size = self.config["string_size"]
+        rows = []
+        for i in range(start, end):
+            text = str(i)
+            rows.append({"f": [{"v": text}, {"v": repr(i * 0.5)},
+                               {"v": "x" * max(size - len(text), 0) + text},
+                               {"v": "true" if i % 2 else "false"},
+                               {"v": repr(1483228800.0 + i)}]})
+        return rows
+
+    def _job(self, project, configuration, rows=0, job_id=None):
+
+        job_id = job_id or self._new_id("job_")
+        now = time.time()
+        job = {"kind": "bigquery#job", "id": "{0}:{1}".format(project, job_id),
+               "jobReference": {"projectId": project, "jobId": job_id},
+               "configuration": configuration,
+               "status": {"state": "RUNNING"},
+               "statistics": {"creationTime": _now_ms(), "startTime": _now_ms(),
+                              "query": {"totalBytesProcessed": "0"}},
+               "_done_at": now + self.config["job_seconds"],
+               "_rows": rows}
+        with self._lock:
+            self.jobs[job_id] = job
+        return job
+
+    def _job_resource(self, job):
+
+        resource = dict((key, value) for key, value in job.items() if not key.startswith("_"))
+        if job["status"]["state"] != "DONE" and time.time() >= job["_done_at"]:
+            with self._lock:
+                failed = self.config["fail_jobs"] > 0
+                if failed:
+                    self.config["fail_jobs"] -= 1
+            job["status"] = dict(job["status"], state="DONE")
+            job["statistics"]["endTime"] = _now_ms()
+            finish = job.pop("_finish", None)
+            if failed:
+                error = {"reason": self.config["error_reason"], "message": "injected job error"}
+                job["status"].update(errorResult=error, errors=[error])
+            elif finish is not None:
+                finish()
+            resource["status"] = job["status"]
+        return resource
+
+    def _find_job(self, job_id):
+
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise FakeError(404, "notFound", "Not found: Job {0}".format(job_id))
+        return job
+
+    def _wait_job(self, job, timeout_ms):
+
+        wait = min(job["_done_at"] - time.time(), (timeout_ms or 10000) / 1000.0)
+        if wait > 0:
+            time.sleep(wait)
+        return self._job_resource(job)
+
+    def _query_response(self, job, query):
+
+        resource = self._wait_job(job, int(query.get("timeoutMs") or 10000))
+        response = {"kind": "bigquery#queryResponse", "jobReference": resource["jobReference"],
+                    "jobComplete": resource["status"]["state"] == "DONE"}
+        if not response["jobComplete"]:
+            return response
+        error = resource["status"].get("errorResult")
+        if error is not None:
+            # results of failed job are answered by error of the job, not by jobComplete.
+            raise FakeError(ERROR_STATUSES.get(error["reason"], 400), error["reason"], error["message"])
+        total = job["_rows"]
+        start = int(query.get("startIndex") or query.get("pageToken") or 0)
+        max_results = query.get("maxResults")
+        size = self.config["page_size"] if max_results is None else min(int(max_results), self.config["page_size"])
+        end = min(start + size, total)
+        response.update({"schema": QUERY_SCHEMA, "totalRows": str(total), "cacheHit": False,
+                         "totalBytesProcessed": "0"})
+        if end > start:
+            response["rows"] = self._rows(start, end)
+        if end < total:
+            response["pageToken"] = str(end)
+        return response
+
+    def bq_query(self, params, query, headers, body, root):
+
+        request = json.loads(body.decode("utf-8"))
+        configuration = {"query": {"query": request["query"],
+                                   "useLegacySql": request.get("useLegacySql", True)}}
+        job = self._job(params["project"], configuration, rows=self.config["query_rows"])
+        page = {"timeoutMs": request.get("timeoutMs", 10000)}
+        if "maxResults" in request:
+            page["maxResults"] = request["maxResults"]
+        return _json(200, self._query_response(job, page))
+
+    def bq_query_results(self, params, query, headers, body, root):
+
+        return _json(200, self._query_response(self._find_job(params["job"]), query))
+
+    def bq_insert_job(self, params, query, headers, body, root):
+
+        project = params["project"]
+        if "uploadType" in query:
+            def finish(metadata, data):
+                return self._finish_load(project, metadata, data)
+            return self._upload(query, headers, body, root, finish)
+
+        request = json.loads(body.decode("utf-8"))
+        configuration = request.get("configuration", {})
+        job_id = request.get("jobReference", {}).get("jobId")
+        if job_id is not None and job_id in self.jobs:
+            raise FakeError(409, "duplicate", "Already Exists: Job {0}".format(job_id))
+        if request.get("configuration", {}).get("dryRun"):
+            return _json(200, self._dry_run(project, configuration))
+        job = self._job(project, configuration, job_id=job_id)
+        if "query" in configuration:
+            job["_rows"] = self.config["query_rows"]
+            destination = configuration["query"].get("destinationTable")
+            if destination is not None:
+                job["_finish"] = lambda: self._put_table(destination, QUERY_SCHEMA, job["_rows"],
+                                                         configuration["query"].get("writeDisposition"))
+        elif "copy" in configuration:
+            copy = configuration["copy"]
+            sources = [self._table(reference) for reference
+                       in copy.get("sourceTables") or [copy["sourceTable"]]]
+            job["_finish"] = lambda: self._put_table(copy["destinationTable"], sources[0].get("schema"),
+                                                     sum(int(source.get("numRows", 0)) for source in sources),
+                                                     copy.get("writeDisposition"))
+        elif "extract" in configuration:
+            extract = configuration["extract"]
+            source = self._table(extract["sourceTable"])
+            job["_finish"] = lambda: self._extract(source, extract)
+        return _json(200, self._job_resource(job))
+
+    def _dry_run(self, project, configuration):
+
+        # tables named in query (dataset.table) are reported as referenced.
+        query = configuration.get("query", {}).get("query", "")
+        with self._lock:
+            references = [dict(table["tableReference"]) for key, table in self.tables.items()
+                          if re.search(r"\b{0}\.{1}\b".format(re.escape(key[1]), re.escape(key[2])), query)]
+        return {"kind": "bigquery#job", "configuration": configuration,
+                "jobReference": {"projectId": project},
+                "status": {"state": "DONE"},
+                "statistics": {"creationTime": _now_ms(),
+                               "query": {"totalBytesProcessed": "0", "referencedTables": references}}}
+
+    def _finish_load(self, project, metadata, data):
+
+        load = metadata.get("configuration", {}).get("load", {})
+        source_format = load.get("sourceFormat", "CSV")
+        rows = self._count_rows(source_format, data)
+        if source_format == "CSV":
+            rows -= int(load.get("skipLeadingRows", 0))
+        job_id = metadata.get("jobReference", {}).get("jobId")
+        job = self._job(project, metadata.get("configuration", {}), rows, job_id)
+        job["statistics"]["load"] = {"outputRows": str(rows), "inputFileBytes": str(len(data))}
+        job["_finish"] = lambda: self._put_table(load["destinationTable"], load.get("schema"),
+                                                 rows, load.get("writeDisposition"), len(data))
+        return _json(200, self._job_resource(job))
+
+    @staticmethod
+    def _count_rows(source_format, data):
+
+        # binary formats are read by the same libraries as dsclient uses,
+        # a format which can not be read is rejected like invalid data.
+        if source_format in ["CSV", "NEWLINE_DELIMITED_JSON"]:
+            return len([line for line in data.split(b"\n") if line.strip()])
+        try:
+            if source_format == "AVRO":
+                import fastavro
+                return sum(1 for _ in fastavro.reader(io.BytesIO(data)))
+            if source_format == "PARQUET":
+                import pyarrow.parquet
+                return pyarrow.parquet.ParquetFile(io.BytesIO(data)).metadata.num_rows
+        except ImportError as e:
+            raise FakeError(400, "invalid", "{0} load is not supported: {1}".format(source_format, e))
+        except Exception as e:
+            raise FakeError(400, "invalid", "Error while reading data: {0}".format(e))
+        raise FakeError(400, "invalid", "unsupported source format {0}".format(source_format))
+
+    def _extract(self, source, extract):
+
+        rows = self._rows(0, int(source.get("numRows", 0)))
+        names = [field["name"] for field in QUERY_SCHEMA["fields"]]
+        destination_format = extract.get("destinationFormat", "CSV")
+        compression = extract.get("compression", "NONE")
+        if destination_format == "AVRO":
+            data = self._avro_rows(rows, compression)
+        elif destination_format == "NEWLINE_DELIMITED_JSON":
+            lines = [json.dumps(dict(zip(names, [cell["v"] for cell in row["f"]]))) for row in rows]
+            data = "".join(line + "\n" for line in lines).encode("utf-8")
+        else:
+            lines = [",".join(names)] + [",".join(cell["v"] for cell in row["f"]) for row in rows]
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+        if compression == "GZIP":
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode="wb") as fileobj:
+                fileobj.write(data)
+            data = buf.getvalue()
+        for uri in extract.get("destinationUris", []):
+            bucket, name = uri[len("gs://"):].split("/", 1)
+            self._put_object(bucket, name.replace("*", "000000000000"), data,
+                             "application/octet-stream")
+
+    @staticmethod
+    def _avro_rows(rows, compression):
+
+        import fastavro
+        types = {"INTEGER": "long", "FLOAT": "double", "STRING": "string", "BOOLEAN": "boolean",
+                 "TIMESTAMP": {"type": "long", "logicalType": "timestamp-micros"}}
+        fields = [{"name": field["name"], "type": ["null", types[field["type"]]]}
+                  for field in QUERY_SCHEMA["fields"]]
+        schema = fastavro.parse_schema({"type": "record", "name": "Root", "fields": fields})
+        records = []
+        for row in rows:
+            i, value, name, flag, ts = [cell["v"] for cell in row["f"]]
+            records.append({"id": int(i), "value": float(value), "name": name,
+                            "flag": flag == "true", "ts": int(round(float(ts) * 1e6))})
+        buf = io.BytesIO()
+        codec = {"DEFLATE": "deflate", "SNAPPY": "snappy"}.get(compression, "null")
+        fastavro.writer(buf, schema, records, codec=codec)
+        return buf.getvalue()
+
+    def _table_key(self, reference):
+
+        return (reference["projectId"], reference["datasetId"], reference["tableId"])
+
+    def _table(self, reference):
+
+        with self._lock:
+            table = self.tables.get(self._table_key(reference))
+        if table is None:
+            raise FakeError(404, "notFound", "Not found: Table {0}".format(reference["tableId"]))
+        return table
+
+    def _put_table(self, reference, schema, rows, write_disposition=None, size=0):
+
+        key = self._table_key(reference)
+        with self._lock:
+            table = self.tables.get(key)
+            if table is None or write_disposition == "WRITE_TRUNCATE":
+                table = self.tables[key] = {
+                    "kind": "bigquery#table", "id": "{0}:{1}.{2}".format(*key),
+                    "tableReference": dict(reference), "schema": schema or {"fields": []},
+                    "numRows": "0", "numBytes": "0", "creationTime": _now_ms(), "type": "TABLE"}
+            table["numRows"] = str(int(table["numRows"]) + rows)
+            table["numBytes"] = str(int(table["numBytes"]) + size)
+            table["lastModifiedTime"] = _now_ms()
+        return table
+
+    def bq_list_jobs(self, params, query, headers, body, root):
+
+        with self._lock:
+            jobs = [self._job_resource(job) for job in reversed(list(self.jobs.values()))]
+        items, token = _page(jobs, query, self.config["page_size"])
+        resource = {"kind": "bigquery#jobList", "jobs": items}
+        if token is not None:
+            resource["nextPageToken"] = token
+        return _json(200, resource)
+
+    def bq_get_job(self, params, query, headers, body, root):
+
+        return _json(200, self._job_resource(self._find_job(params["job"])))
+
+    def bq_cancel_job(self, params, query, headers, body, root):
+
+        job = self._find_job(params["job"])
+        job["_done_at"] = time.time()
+        return _json(200, {"kind": "bigquery#jobCancelResponse", "job": self._job_resource(job)})
+
+    def bq_list_datasets(self, params, query, headers, body, root):
+
+        with self._lock:
+            datasets = [dataset for (project, _), dataset in self.datasets.items()
+                        if project == params["project"]]
+        items, token = _page(datasets, query, self.config["page_size"])
+        resource = {"kind": "bigquery#datasetList", "datasets": items}
+        if token is not None:
+            resource["nextPageToken"] = token
+        return _json(200, resource)
+
+    def bq_insert_dataset(self, params, query, headers, body, root):
+
+        dataset = json.loads(body.decode("utf-8"))
+        key = (params["project"], dataset["datasetReference"]["datasetId"])
+        with self._lock:
+            if key in self.datasets:
+                raise FakeError(409, "duplicate", "Already Exists: Dataset {0}".format(key[1]))
+            dataset.update({"kind": "bigquery#dataset", "id": "{0}:{1}".format(*key),
+                            "creationTime": _now_ms()})
+            self.datasets[key] = dataset
+        return _json(200, dataset)
+
+    def _dataset(self, params):
+
+        with self._lock:
+            dataset = self.datasets.get((params["project"], params["dataset"]))
+        if dataset is None:
+            raise FakeError(404, "notFound", "Not found: Dataset {0}".format(params["dataset"]))
+        return dataset
+
+    def bq_get_dataset(self, params, query, headers, body, root):
+
+        return _json(200, self._dataset(params))
+
+    def bq_patch_dataset(self, params, query, headers, body, root):
+
+        dataset = self._dataset(params)
+        dataset.update(json.loads(body.decode("utf-8")))
+        return _json(200, dataset)
+
+    def bq_delete_dataset(self, params, query, headers, body, root):
+
+        self._dataset(params)
+        with self._lock:
+            del self.datasets[(params["project"], params["dataset"])]
+            for key in [key for key in self.tables if key[:2] == (params["project"], params["dataset"])]:
+                del self.tables[key]
+        return 204, {}, b""
+
+    def _table_params(self, params):
+
+        return {"projectId": params["project"], "datasetId": params["dataset"],
+                "tableId": params["table"]}
+
+    def bq_list_tables(self, params, query, headers, body, root):
+
+        with self._lock:
+            tables = [table for key, table in self.tables.items()
+                      if key[:2] == (params["project"], params["dataset"])]
+        items, token = _page(tables, query, self.config["page_size"])
+        resource = {"kind": "bigquery#tableList", "tables": items, "totalItems": len(tables)}
+        if token is not None:
+            resource["nextPageToken"] = token
+        return _json(200, resource)
+
+    def bq_insert_table(self, params, query, headers, body, root):
+
+        table = json.loads(body.decode("utf-8"))
+        reference = table["tableReference"]
+        with self._lock:
+            if self._table_key(reference) in self.tables:
+                raise FakeError(409, "duplicate", "Already Exists: Table {0}".format(reference["tableId"]))
+        created = self._put_table(reference, table.get("schema"), 0)
+        created.update(dict((key, value) for key, value in table.items() if key != "tableReference"))
+        return _json(200, created)
+
+    def bq_get_table(self, params, query, headers, body, root):
+
+        return _json(200, self._table(self._table_params(params)))
+
+    def bq_patch_table(self, params, query, headers, body, root):
+
+        table = self._table(self._table_params(params))
+        table.update(json.loads(body.decode("utf-8")))
+        return _json(200, table)
+
+    def bq_delete_table(self, params, query, headers, body, root):
+
+        reference = self._table_params(params)
+        self._table(reference)
+        with self._lock:
+            del self.tables[self._table_key(reference)]
+        return 204, {}, b""
+
+    def bq_insert_all(self, params, query, headers, body, root):
+
+        rows = json.loads(body.decode("utf-8")).get("rows", [])
+        self._put_table(self._table_params(params), None, len(rows), size=len(body))
+        return _json(200, {"kind": "bigquery#tableDataInsertAllResponse"})
+
+    # Cloud Storage
+
+    def _bucket(self, name):
+
+        with self._lock:
+            bucket = self.buckets.get(name)
+        if bucket is None:
+            raise FakeError(404, "notFound", "Not Found")
+        return bucket
+
+    def _put_object(self, bucket, name, data, content_type):
+
+        # every write makes new generation, older ones are not kept.
+        generation = self._new_id("")
+        resource = {"kind": "storage#object", "id": "{0}/{1}/{2}".format(bucket, name, generation),
+                    "name": name, "bucket": bucket, "generation": generation,
+                    "contentType": content_type, "size": str(len(data)),
+                    "updated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}
+        with self._lock:
+            self.buckets.setdefault(bucket, {"kind": "storage#bucket", "id": bucket, "name": bucket})
+            self.objects.setdefault(bucket, {})[name] = (data, resource)
+        return resource
+
+    def gs_list_buckets(self, params, query, headers, body, root):
+
+        with self._lock:
+            buckets = [bucket for name, bucket in self.buckets.items()
+                       if name.startswith(query.get("prefix", ""))]
+        items, token = _page(buckets, query, self.config["page_size"])
+        resource = {"kind": "storage#buckets", "items": items}
+        if token is not None:
+            resource["nextPageToken"] = token
+        return _json(200, resource)
+
+    def gs_insert_bucket(self, params, query, headers, body, root):
+
+        bucket = json.loads(body.decode("utf-8"))
+        with self._lock:
+            if bucket["name"] in self.buckets:
+                raise FakeError(409, "conflict", "You already own this bucket.")
+            bucket.update({"kind": "storage#bucket", "id": bucket["name"]})
+            self.buckets[bucket["name"]] = bucket
+        return _json(200, bucket)
+
+    def gs_get_bucket(self, params, query, headers, body, root):
+
+        return _json(200, self._bucket(params["bucket"]))
+
+    def gs_delete_bucket(self, params, query, headers, body, root):
+
+        self._bucket(params["bucket"])
+        with self._lock:
+            del self.buckets[params["bucket"]]
+            self.objects.pop(params["bucket"], None)
+        return 204, {}, b""
+
+    def gs_list_objects(self, params, query, headers, body, root):
+
+        self._bucket(params["bucket"])
+        prefix = query.get("prefix", "")
+        with self._lock:
+            objects = self.objects.get(params["bucket"], {})
+            items = [objects[name][1] for name in sorted(objects) if name.startswith(prefix)]
+        items, token = _page(items, query, self.config["page_size"])
+        resource = {"kind": "storage#objects", "items": items}
+        if token is not None:
+            resource["nextPageToken"] = token
+        return _json(200, resource)
+
+    def _object(self, params):
+
+        with self._lock:
+            entry = self.objects.get(params["bucket"], {}).get(params["object"])
+        if entry is None:
+            raise FakeError(404, "notFound", "No such object: {0}/{1}".format(params["bucket"], params["object"]))
+        return entry
+
+    def gs_get_object(self, params, query, headers, body, root):
+
+        data, resource = self._object(params)
+        if query.get("generation", resource["generation"]) != resource["generation"]:
+            raise FakeError(404, "notFound", "No such object: {0}/{1}#{2}".format(
+                params["bucket"], params["object"], query["generation"]))
+        if query.get("alt") != "media":
+            return _json(200, resource)
+        media_headers = {"Content-Type": resource["contentType"],
+                         "X-Goog-Generation": resource["generation"]}
+        match = re.match(r"bytes=(\d+)-(\d*)", headers.get("range", ""))
+        if match is None:
+            return 200, media_headers, data
+        if int(match.group(1)) >= len(data):
+            # as Cloud Storage, range of empty object is not satisfiable.
+            raise FakeError(416, "requestedRangeNotSatisfiable", "Request range not satisfiable")
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+        media_headers["Content-Range"] = "bytes {0}-{1}/{2}".format(start, end, len(data))
+        return 206, media_headers, data[start:end + 1]
+
+    def gs_delete_object(self, params, query, headers, body, root):
+
+        self._object(params)
+        with self._lock:
+            del self.objects[params["bucket"]][params["object"]]
+        return 204, {}, b""
+
+    def gs_insert_object(self, params, query, headers, body, root):
+
+        bucket = params["bucket"]
+        content_type = headers.get("x-upload-content-type") or headers.get("content-type", "application/octet-stream")
+
+        def finish(metadata, data):
+            name = query.get("name") or metadata.get("name")
+            return _json(200, self._put_object(bucket, name, data, metadata.get("contentType", content_type)))
+
+        return self._upload(query, headers, body, root, finish)
+
+    # Datastore
+
+    def ds_run_query(self, params, query, headers, body, root):
+
+        request = json.loads(body.decode("utf-8"))
+        start = int(request.get("query", {}).get("startCursor") or 0)
+        total = self.config["gql_entities"]
+        end = min(start + self.config["page_size"], total)
+        size = self.config["string_size"]
+        entities = []
+        for i in range(start, end):
+            text = str(i)
+            entities.append({"entity": {
+                "key": {"partitionId": {"projectId": params["project"]},
+                        "path": [{"kind": "Bench", "id": text}]},
+                "properties": {"id": {"integerValue": text},
+                               "value": {"doubleValue": i * 0.5},
+                               "name": {"stringValue": "x" * max(size - len(text), 0) + text},
+                               "flag": {"booleanValue": i % 2 == 1},
+                               "created": {"timestampValue": time.strftime(
+                                   "%Y-%m-%dT%H:%M:%SZ", time.gmtime(1483228800 + i))}}},
+                "cursor": str(i + 1), "version": "1"})
+        batch = {"entityResultType": "FULL", "entityResults": entities, "endCursor": str(end),
+                 "moreResults": "NOT_FINISHED" if end < total else "NO_MORE_RESULTS"}
+        return _json(200, {"batch": batch})
+
+    # Compute Engine
+
+    def ce_get(self, params, query, headers, body, root):
+
+        name = params["path"].split("/")[-1]
+        if params["path"].endswith("Operations/" + name):
+            return _json(200, {"kind": "compute#operation", "name": name, "status": "DONE"})
+        if "/" not in params["path"] or params["path"].count("/") == 2:
+            return _json(200, {"kind": "compute#list", "items": []})
+        return _json(200, {"name": name, "status": "RUNNING",
+                           "selfLink": "{0}/compute/beta/projects/{1}/{2}".format(root, params["project"], params["path"]),
+                           "networkInterfaces": [{"networkIP": "10.0.0.1"}]})
+
+    def ce_operation(self, params, query, headers, body, root):
+
+        return _json(200, {"kind": "compute#operation", "name": self._new_id("operation-"),
+                           "status": "DONE", "targetLink": params["path"]})
+
+    # control
+
+    def fake_config(self, params, query, headers, body, root):
+
+        with self._lock:
+            self.config.update(json.loads(body.decode("utf-8")))
+        return _json(200, self.config)
+
+    def fake_reset(self, params, query, headers, body, root):
+
+        self.reset()
+        return _json(200, {})
+
+    def fake_stats(self, params, query, headers, body, root):
+
+        with self._lock:
+            return _json(200, {"requests": dict(self.counts), "http_requests": self.http_requests,
+                               "errors": self.errors,
+                               "objects": sum(len(objects) for objects in self.objects.values()),
+                               "tables": len(self.tables), "jobs": len(self.jobs)})
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    # keep-alive, so clients reuse connections as they do with googleapis.
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, Nagle would delay the body by delayed ACK.
+    disable_nagle_algorithm = True
+
+    def _serve(self):
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        headers = dict((name.lower(), value) for name, value in self.headers.items())
+        root = "http://{0}".format(self.headers.get("Host") or "{0}:{1}".format(*self.server.server_address))
+        status, response_headers, content = self.server.fake.serve(self.command, self.path, headers, body, root)
+        self.send_response(status)
+        for name, value in response_headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if content and self.command != "HEAD":
+            self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+    def log_message(self, format, *args):
+
+        pass
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server of FakeGCP.
+
+        server = FakeServer(port=0, config={"latency": 0.01}).start()
+        os.environ["DSCLIENT_API_ROOT"] = server.url
+        ...
+        server.stop()
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # concurrent clients open many connections at once (default backlog 5 drops them).
+    request_queue_size = 128
+
+    def __init__(self, host="127.0.0.1", port=0, config=None, seed=0):
+
+        HTTPServer.__init__(self, (host, port), _Handler)
+        self.fake = FakeGCP(config, seed)
+        self._thread = None
+
+    @property
+    def url(self):
+
+        return "http://{0}:{1}".format(*self.server_address[:2])
+
+    def start(self):
+
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local fake of GCP REST APIs used by dsclient.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--seed", type=int, default=0)
+    for name, value in sorted(DEFAULT_CONFIG.items()):
+        kind = float if isinstance(value, float) or value is None else type(value)
+        parser.add_argument("--" + name.replace("_", "-"), type=kind, default=value)
+    args = parser.parse_args()
+
+    config = dict((name, getattr(args, name)) for name in DEFAULT_CONFIG)
+    server = FakeServer(args.host, args.port, config, args.seed)
+    print("listening on {0}".format(server.url))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
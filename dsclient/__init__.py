@@ -1,5 +1,10 @@
-from pkg_resources import get_distribution
 from . client import Client
 from . schema import Schema
 
-__version__ = get_distribution('dsclient').version
+try:
+    from importlib.metadata import version as _version
+    __version__ = _version('dsclient')
+except ImportError:
+    # python<3.8, pkg_resources is slow to import.
+    from pkg_resources import get_distribution
+    __version__ = get_distribution('dsclient').version
@@ -0,0 +1,518 @@
+"""
+asyncio front-end of dsclient (python>=3.5, requires aiohttp).
+
+AsyncClient keeps thousands of BigQuery, Cloud Storage and Datastore
+requests in flight on one event loop. Requests share kept-alive
+connections of one aiohttp session, and CPU heavy decoding (JSON pages,
+CSV, DataFrame conversion) runs in executor so the loop is not blocked.
+
+    import asyncio
+    from dsclient.aio import AsyncClient
+
+    async def main():
+        async with AsyncClient("your project name") as client:
+            dfs = await asyncio.gather(*[client.read_csv(uri) for uri in uris])
+
+    asyncio.get_event_loop().run_until_complete(main())
+"""
+import json
+import time
+import pickle
+import asyncio
+import fnmatch
+from functools import partial
+from urllib.parse import quote
+import pandas as pd
+from googleapiclient.errors import HttpError
+from . base import ClientBase
+from . discovery import api_root as _api_root
+from . errors import error_reasons
+from . schema import Schema
+from . bigquery.client import Client as _BigQueryClient
+from . bigquery.job import Job
+from . storage.client import Client as _StorageClient
+from . storage.client import _parse_csv, _parse_ndjson, _parse_avro, _import_fastavro, _infer_compression
+from . datastore.client import _gql_body, _GqlDecoder
+
+
+API_ROOT = "https://www.googleapis.com"
+DATASTORE_ROOT = "https://datastore.googleapis.com"
+
+# JSON responses larger than this are decoded in executor.
+DECODE_IN_EXECUTOR_BYTES = 1024 * 1024
+
+
+def _import_aiohttp():
+
+    try:
+        import aiohttp
+    except ImportError:
+        raise Exception("aiohttp is required to use AsyncClient.")
+    return aiohttp
+
+
+def _response(status, headers):
+
+    import httplib2
+
+    info = dict((key.lower(), value) for key, value in headers.items())
+    info["status"] = str(status)
+    return httplib2.Response(info)
+
+
+def _query_param(value):
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+class AsyncClient(ClientBase):
+    """
+    Client of BigQuery, Cloud Storage and Datastore with coroutine methods.
+
+    Credentials, retry policy (set_retry_policy) and instrumentation
+    (stats, add_collector) work as in dsclient.Client.
+
+    Parameters
+    ----------
+    project_id : str
+    keyfile_path : str
+    account_email : str
+    pool_size : int
+        max number of connections held by the session.
+    api_root : str
+        root URL of all APIs (ex: http://localhost:8080 of local stand-in server),
+        DSCLIENT_API_ROOT if None.
+    credentials : object
+        credentials with get_token() (ex: dsclient.credentials.StaticCredentials),
+        shared CredentialManager from key file or default credentials if None.
+    executor : concurrent.futures.Executor
+        executor of decoding (default executor of event loop if None).
+    timeout : float
+        total seconds of each HTTP request (aiohttp default if None).
+    """
+
+    _parse_uri = _StorageClient._parse_uri
+    _parse_table_name = _BigQueryClient._parse_table_name
+    _query_job_body = _BigQueryClient._query_job_body
+    _check_joberror = staticmethod(_BigQueryClient._check_joberror)
+    _check_resperror = staticmethod(_BigQueryClient._check_resperror)
+
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=100,
+                 api_root=None, credentials=None, executor=None, timeout=None):
+
+        super(AsyncClient, self).__init__(project_id, keyfile_path, account_email, pool_size)
+        self._api_root = api_root or _api_root()
+        if credentials is not None:
+            self._credentials = credentials
+        self._executor = executor
+        self._timeout = timeout
+        self._session = None
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, *args):
+
+        await self.close()
+
+    async def close(self):
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+
+        if self._session is None:
+            aiohttp = _import_aiohttp()
+            timeout = aiohttp.ClientTimeout(total=self._timeout)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size), timeout=timeout)
+        return self._session
+
+    def _url(self, path, root=API_ROOT):
+
+        return (self._api_root or root) + path
+
+    def _run(self, func, *args, **kwargs):
+
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _token(self):
+
+        if self._credentials is None:
+            # loading key file (or metadata server) blocks, so run it in executor.
+            await self._run(self._get_credentials, None)
+        credentials = self._credentials
+        if getattr(credentials, "access_token_expired", False):
+            return await self._run(credentials.get_token)
+        return credentials.get_token()
+
+    async def _send(self, method, url, params, data, headers):
+
+        aiohttp = _import_aiohttp()
+        for attempt in range(2):
+            token = await self._token()
+            headers["Authorization"] = "Bearer " + token
+            try:
+                async with self._get_session().request(method, url, params=params, data=data,
+                                                       headers=headers) as resp:
+                    content = await resp.read()
+                    status, response_headers = resp.status, resp.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # transport errors are retried by policy like socket errors.
+                raise ConnectionError("{0}: {1}".format(type(e).__name__, e)) from e
+            if status == 401 and attempt == 0 and hasattr(self._credentials, "invalidate"):
+                self._credentials.invalidate(token)
+                continue
+            break
+        if status >= 300:
+            raise HttpError(_response(status, response_headers), content, uri=url)
+        return content
+
+    async def _request(self, service, name, method, url, params=None, body=None, data=None,
+                       content_type=None, retry=None, raw=False):
+        """
+        Send request retrying by policy, return decoded JSON (or bytes if raw).
+        """
+
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            content_type = "application/json"
+        headers = {} if content_type is None else {"Content-Type": content_type}
+        params = dict((key, _query_param(value)) for key, value in (params or {}).items()
+                      if value is not None)
+
+        policy = self._policy(retry)
+        start = time.time()
+        attempt = 0
+        status, reason, content = 200, None, b""
+        try:
+            while True:
+                attempt += 1
+                try:
+                    content = await self._send(method, url, params, data, headers)
+                    break
+                except Exception as e:
+                    delay = policy.next_delay(attempt, e, start)
+                    if delay is None:
+                        status = e.resp.status if isinstance(e, HttpError) else 0
+                        reason = (error_reasons(e) or [type(e).__name__])[0]
+                        raise
+                    await asyncio.sleep(delay)
+            policy.succeeded()
+        finally:
+            latency = time.time() - start
+            for collector in self._collectors:
+                collector.record(service, name, latency, len(data or b""), len(content),
+                                 attempt - 1, status, reason)
+
+        if raw:
+            return content
+        if not content:
+            return {}
+        if len(content) > DECODE_IN_EXECUTOR_BYTES:
+            return await self._run(json.loads, content.decode("utf-8"))
+        return json.loads(content.decode("utf-8"))
+
+    # BigQuery
+
+    def _bq_url(self, path):
+
+        return self._url("/bigquery/v2/projects/{0}{1}".format(self._project_id, path))
+
+    async def _get_query_results(self, job_id, retry=None, **params):
+
+        params["timeoutMs"] = params.get("timeoutMs", Job.LONG_POLL_MS)
+        resp = await self._request("bigquery", "jobs.getQueryResults", "GET",
+                                   self._bq_url("/queries/{0}".format(job_id)),
+                                   params=params, retry=retry)
+        self._check_resperror(resp)
+        return resp
+
+    async def _query_range(self, job_id, schema, start_index, max_results, retry=None):
+
+        # getQueryResults may return less rows than maxResults (response size limit).
+        df_list = []
+        fetched = 0
+        while fetched < max_results:
+            resp = await self._get_query_results(job_id, retry, startIndex=start_index + fetched,
+                                                 maxResults=max_results - fetched)
+            rows = resp.get("rows", [])
+            if not rows:
+                break
+            df_list.append(await self._run(schema.to_dataframe, rows))
+            fetched += len(rows)
+        return df_list
+
+    async def query(self, query, table_name=None, append=True, write_disposition=None,
+                    allow_large_results=True, use_legacy=True, max_tier=None, block=True,
+                    page_size=None, concurrency=None, retry=None):
+        """
+        Run query and read result as pandas.DataFrame or insert into table.
+
+        Parameters
+        ----------
+        query : str
+            query string.
+        table_name : str
+            dataset.table. if None, query result is returned as DataFrame.
+        block : boolean
+            if False, inserted job resource is returned without waiting
+            (only when table_name is set, see wait_job).
+        page_size : int
+            maxResults of each result page.
+        concurrency : int
+            number of result pages requested at once by startIndex.
+            if None or 1, pages are read one by one following pageToken.
+
+        Returns
+        -------
+        pandas.DataFrame or JSON job
+        """
+
+        if table_name is not None:
+            body = self._query_job_body(query, table_name, append, write_disposition,
+                                        allow_large_results, use_legacy, max_tier)
+            job = await self._request("bigquery", "jobs.insert", "POST", self._bq_url("/jobs"),
+                                      body=body, retry=retry)
+            self._check_joberror(job)
+            return await self.wait_job(job) if block else job
+
+        body = {"query": query, "timeoutMs": Job.LONG_POLL_MS, "useLegacySql": use_legacy}
+        if page_size is not None:
+            body["maxResults"] = page_size
+        resp = await self._request("bigquery", "jobs.query", "POST", self._bq_url("/queries"),
+                                   body=body, retry=retry)
+        job_id = resp["jobReference"]["jobId"]
+        while not resp["jobComplete"]:
+            # server side long-poll, no sleep between requests.
+            resp = await self._get_query_results(job_id, retry, maxResults=page_size)
+
+        schema = Schema(resp["schema"])
+        total_rows = int(resp["totalRows"])
+        df_list = [await self._run(schema.to_dataframe, resp.get("rows", []))]
+        fetched = len(df_list[0])
+
+        if fetched < total_rows and concurrency is not None and concurrency > 1:
+            page_size = page_size or fetched or 100000
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def read_range(index):
+                async with semaphore:
+                    return await self._query_range(job_id, schema, index,
+                                                   min(page_size, total_rows - index), retry)
+
+            ranges = await asyncio.gather(*[read_range(index) for index
+                                            in range(fetched, total_rows, page_size)])
+            df_list.extend(df for dfs in ranges for df in dfs)
+        else:
+            page_token = resp.get("pageToken")
+            while fetched < total_rows:
+                resp = await self._get_query_results(job_id, retry, pageToken=page_token,
+                                                     maxResults=page_size)
+                rows = resp.get("rows", [])
+                if not rows:
+                    break
+                df_list.append(await self._run(schema.to_dataframe, rows))
+                fetched += len(rows)
+                page_token = resp.get("pageToken")
+
+        if len(df_list) == 1:
+            return df_list[0]
+        return await self._run(pd.concat, df_list)
+
+    async def get_job(self, job_id, retry=None):
+
+        return await self._request("bigquery", "jobs.get", "GET",
+                                   self._bq_url("/jobs/{0}".format(job_id)), retry=retry)
+
+    async def wait_job(self, job, timeout=None):
+        """
+        Wait job (resource or job id) and return finished job resource.
+
+        Query jobs wait on server side by getQueryResults, other jobs are
+        polled by jobs.get with exponential backoff. BigQueryError is
+        raised if job failed, asyncio.TimeoutError after timeout seconds.
+        """
+
+        if not isinstance(job, dict):
+            job = await self.get_job(job)
+        job_id = job["jobReference"]["jobId"]
+        start = time.time()
+        interval = Job.MIN_INTERVAL
+        while job.get("status", {}).get("state") != "DONE":
+            elapsed = time.time() - start
+            if timeout is not None and elapsed >= timeout:
+                raise asyncio.TimeoutError("job {0} is not finished in {1}s".format(job_id, timeout))
+            if "query" in job.get("configuration", {}):
+                remaining_ms = Job.LONG_POLL_MS if timeout is None else int(1000 * (timeout - elapsed))
+                resp = await self._get_query_results(job_id, maxResults=0,
+                                                     timeoutMs=min(remaining_ms, Job.LONG_POLL_MS))
+                if not resp.get("jobComplete", False):
+                    continue
+            else:
+                await asyncio.sleep(interval if timeout is None else min(interval, max(timeout - elapsed, 0)))
+                interval = min(interval * Job.BACKOFF, Job.MAX_INTERVAL)
+            job = await self.get_job(job_id)
+        self._check_joberror(job)
+        return job
+
+    async def wait_all(self, jobs, timeout=None, return_exceptions=False):
+        """
+        Wait all jobs and return finished job resources in order of jobs.
+
+        If return_exceptions is True, BigQueryError of failed job is returned
+        in place of its resource, otherwise the first error is raised.
+        """
+
+        waits = asyncio.gather(*[self.wait_job(job) for job in jobs],
+                               return_exceptions=return_exceptions)
+        return await asyncio.wait_for(waits, timeout)
+
+    def as_completed(self, jobs, timeout=None):
+        """
+        Return iterator of awaitables of finished job resources in order of completion.
+        """
+
+        return asyncio.as_completed([self.wait_job(job) for job in jobs], timeout=timeout)
+
+    # Cloud Storage
+
+    def _object_url(self, bucket, name, upload=False):
+
+        prefix = "/upload" if upload else ""
+        path = "{0}/storage/v1/b/{1}/o".format(prefix, quote(bucket, safe=""))
+        if name is not None:
+            path += "/" + quote(name, safe="")
+        return self._url(path)
+
+    async def _read(self, uri, retry=None):
+
+        bucket, name = self._parse_uri(uri)
+        return await self._request("storage", "objects.get", "GET", self._object_url(bucket, name),
+                                   params={"alt": "media"}, retry=retry, raw=True)
+
+    async def _write(self, obj, uri, mimetype=None, retry=None):
+
+        bucket, name = self._parse_uri(uri)
+        return await self._request("storage", "objects.insert", "POST",
+                                   self._object_url(bucket, None, upload=True),
+                                   params={"uploadType": "media", "name": name},
+                                   data=obj, content_type=mimetype or "application/octet-stream",
+                                   retry=retry)
+
+    async def list_object(self, uri, page_size=1000, retry=None):
+        """
+        List objects matching uri (gs://bucket/prefix*) in order of name.
+        """
+
+        bucket, pattern = self._parse_uri(uri)
+        params = {"prefix": pattern.split("*", 1)[0], "maxResults": page_size,
+                  "fields": "nextPageToken,items(name)"}
+        uris = []
+        while True:
+            resp = await self._request("storage", "objects.list", "GET",
+                                       self._object_url(bucket, None), params=params, retry=retry)
+            uris.extend("gs://{0}/{1}".format(bucket, item["name"]) for item in resp.get("items", [])
+                        if "*" not in pattern or fnmatch.fnmatchcase(item["name"], pattern))
+            params["pageToken"] = resp.get("nextPageToken")
+            if not params["pageToken"]:
+                return uris
+
+    async def _read_frames(self, uri, parse, args=(), retry=None):
+
+        async def read(uri):
+            return await self._run(parse, await self._read(uri, retry), *args)
+
+        if "*" not in uri:
+            df = await read(uri)
+            return df if df is not None else pd.DataFrame()
+
+        # shards are downloaded at once, each parsed as soon as it arrives.
+        dfs = await asyncio.gather(*[read(shard) for shard in await self.list_object(uri, retry=retry)])
+        dfs = [df for df in dfs if df is not None]
+        if not dfs:
+            return pd.DataFrame()
+        return await self._run(pd.concat, dfs, ignore_index=True)
+
+    async def read_csv(self, uri, sep=",", header="infer", dtype=None, compression=None, retry=None):
+        """
+        Read csv file(s) on Cloud Storage as pandas.DataFrame.
+
+        uri with wildcard (*) reads all matching objects concurrently and
+        concatenates them in order of object name (see Client.read_csv).
+        """
+
+        compression = _infer_compression(uri, compression)
+        return await self._read_frames(uri, _parse_csv, (sep, header, dtype, compression), retry)
+
+    async def read_ndjson(self, uri, compression=None, retry=None):
+
+        compression = _infer_compression(uri, compression)
+        return await self._read_frames(uri, _parse_ndjson, (compression,), retry)
+
+    async def read_avro(self, uri, retry=None):
+
+        _import_fastavro()
+        return await self._read_frames(uri, _parse_avro, retry=retry)
+
+    async def read_blob(self, uri, retry=None):
+
+        return await self._run(pickle.loads, await self._read(uri, retry))
+
+    async def read_text(self, uri, retry=None):
+
+        return (await self._read(uri, retry)).decode("utf-8")
+
+    async def read_json(self, uri, retry=None):
+
+        return await self._run(json.loads, (await self._read(uri, retry)).decode("utf-8"))
+
+    async def write_csv(self, df, uri, sep=",", retry=None):
+
+        value = await self._run(lambda: df.to_csv(index=False, sep=sep).encode("utf-8"))
+        return await self._write(value, uri, "text/csv", retry)
+
+    async def write_blob(self, blob, uri, retry=None):
+
+        return await self._write(await self._run(pickle.dumps, blob), uri,
+                                 "application/octet-stream", retry)
+
+    async def write_text(self, text, uri, retry=None):
+
+        return await self._write(text.encode("utf-8"), uri, "text/plain", retry)
+
+    async def write_json(self, dic, uri, retry=None):
+
+        return await self._write(json.dumps(dic).encode("utf-8"), uri, "application/json", retry)
+
+    # Datastore
+
+    async def gql(self, query, retry=None):
+        """
+        Run GQL query and read all entities as pandas.DataFrame.
+        """
+
+        url = self._url("/v1/projects/{0}:runQuery".format(self._project_id), DATASTORE_ROOT)
+        resp = await self._request("datastore", "projects.runQuery", "POST", url,
+                                   body=_gql_body(query), retry=retry)
+        decoder = _GqlDecoder()
+        df_list = []
+        while True:
+            entities = resp["batch"].get("entityResults", [])
+            if len(entities) == 0:
+                break
+            df_list.append(await self._run(decoder.decode, entities))
+            if resp["batch"]["moreResults"] != "NOT_FINISHED":
+                break
+            resp = await self._request("datastore", "projects.runQuery", "POST", url,
+                                       body=decoder.next_body(resp), retry=retry)
+
+        if not df_list:
+            return pd.DataFrame()
+        return pd.concat(df_list)
@@ -1,63 +1,429 @@
-import httplib2
-from oauth2client.client import GoogleCredentials
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
+import os
+import time
+import threading
+import pandas as pd
 from googleapiclient.errors import HttpError
+from . cache import MetadataCache, SingleFlight
+from . credentials import CLOUD_PLATFORM_SCOPE, CredentialManager, TokenCache
+from . discovery import load_document, api_root, with_root_url
+from . errors import error_reasons
+from . metrics import MemoryCollector
+from . retry import RetryBudget, RetryPolicy
+from . transport import HttpPool
 
 
 class ClientBase(object):
 
-    def __init__(self, project_id=None, keyfile_path=None, account_email=None):
+    def __init__(self, project_id=None, keyfile_path=None, account_email=None, pool_size=10):
 
         self._project_id    = project_id
         self._keyfile_path  = keyfile_path
         self._account_email = account_email
+        self._pool_size = pool_size
+        self._pools = {}
+        self._services = {}
+        self._credentials = None
+        self._service_lock = threading.RLock()
+        self._metadata_cache = None
+        self._single_flight = None
+        self._stats_collector = MemoryCollector()
+        self._collectors = [self._stats_collector]
+        self._retry_policy = RetryPolicy(budget=RetryBudget())
 
-    def _build_service(self, api_name, api_version, scopes):
+    def set_retry_policy(self, policy):
+        """
+        Set RetryPolicy used by API calls of this client.
+
+        Methods with retry argument also take RetryPolicy for the call,
+        int retry overrides only max_attempts of client policy.
+        """
+
+        self._retry_policy = policy
+        return policy
+
+    def get_retry_policy(self):
+
+        return self._retry_policy
+
+    def _policy(self, retry=None):
+
+        if isinstance(retry, RetryPolicy):
+            return retry
+        if retry is None:
+            return self._retry_policy
+        return self._retry_policy.replace(max_attempts=retry)
+
+    def enable_metadata_cache(self, ttl=60, max_items=10000):
+        """
+        Enable in-process cache of get_table/get_dataset/get_bucket results.
+
+        create_*, delete_*, patch_* and load of this client invalidate
+        matching entries, changes by others are seen after ttl seconds.
+
+        Parameters
+        ----------
+        ttl : float
+            seconds entries are valid.
+        max_items : int
+            size limit of cache. least recently used entries are evicted.
+
+        Returns
+        -------
+        MetadataCache
+            enabled cache.
+        """
+
+        self._metadata_cache = MetadataCache(ttl, max_items)
+        return self._metadata_cache
+
+    def disable_metadata_cache(self):
+
+        self._metadata_cache = None
+
+    def metadata_cache_stats(self):
+
+        if self._metadata_cache is None:
+            return None
+        return self._metadata_cache.stats()
+
+    def enable_single_flight(self):
+        """
+        Share one call among threads making identical reads at the same time.
+
+        GET requests, get_table/get_dataset/get_bucket, read_blob/read_text/
+        read_json and instance metadata in flight with the same target are
+        sent once and all callers get the same decoded result. Mutations are
+        never shared. Returned objects are shared, do not modify them.
+
+        Returns
+        -------
+        SingleFlight
+        """
+
+        self._single_flight = SingleFlight()
+        return self._single_flight
+
+    def disable_single_flight(self):
+
+        self._single_flight = None
+
+    def single_flight_stats(self):
+
+        if self._single_flight is None:
+            return None
+        return self._single_flight.stats()
+
+    def _shared_get(self, key, get):
+
+        single_flight = self._single_flight
+        if single_flight is None:
+            return get()
+        return single_flight.do(key, get)
+
+    def _cached_get(self, key, get, use_cache=True):
+
+        if not use_cache or self._metadata_cache is None:
+            return self._shared_get(key, get)
+        found, value = self._metadata_cache.get(key)
+        if not found:
+            value = self._shared_get(key, get)
+            self._metadata_cache.put(key, value)
+        return value
+
+    def _invalidate_metadata(self, key):
+
+        if self._metadata_cache is not None:
+            self._metadata_cache.invalidate(key)
+
+    def _service(self, api_name, api_version, scopes):
+        """
+        Return (credentials, service) of API, built on first use.
+        """
+
+        key = (api_name, api_version)
+        entry = self._services.get(key)
+        if entry is None:
+            with self._service_lock:
+                entry = self._services.get(key)
+                if entry is None:
+                    entry = self._services[key] = self._build_service(api_name, api_version, scopes)
+        return entry
+
+    def _get_credentials(self, scopes):
+        """
+        Return CredentialManager shared by all services of this client.
+
+        Token of cloud-platform scope covers scopes of all services, so it
+        is requested (and refreshed) once instead of once per service.
+        """
+
+        with self._service_lock:
+            if self._credentials is None:
+                credentials = self._load_credentials([CLOUD_PLATFORM_SCOPE])
+                key = CredentialManager.make_key(
+                    type(credentials).__name__, self._keyfile_path, self._account_email,
+                    getattr(credentials, "service_account_email", None),
+                    getattr(credentials, "client_id", None),
+                    getattr(credentials, "refresh_token", None),
+                    CLOUD_PLATFORM_SCOPE)
+                # tokens are kept only in memory unless DSCLIENT_TOKEN_CACHE
+                # names directory to share them with other processes.
+                directory = os.environ.get("DSCLIENT_TOKEN_CACHE")
+                token_cache = TokenCache(directory) if directory else None
+                self._credentials = CredentialManager(credentials, key, token_cache)
+                self._credentials.load_cached()
+            return self._credentials
+
+    def _load_credentials(self, scopes):
+
+        from oauth2client.client import GoogleCredentials
+        from oauth2client.service_account import ServiceAccountCredentials
 
         if self._keyfile_path is None:
             credentials = GoogleCredentials.get_application_default()
-            service = build(api_name, api_version, credentials=credentials)
-            return credentials, service
+            if credentials.create_scoped_required():
+                credentials = credentials.create_scoped(scopes)
+            return credentials
+
+        if self._keyfile_path.lower().endswith(".json"):
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                self._keyfile_path,
+                scopes=scopes)
+        elif self._keyfile_path.lower().endswith(".p12"):
+            if self._account_email is None:
+                raise Exception("Input account email.")
+            credentials = ServiceAccountCredentials.from_p12_keyfile(
+                self._account_email,
+                self._keyfile_path,
+                scopes=scopes)
         else:
-            if self._keyfile_path.lower().endswith(".json"):
-                credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                    self._keyfile_path,
-                    scopes=scopes)
-            elif self._keyfile_path.lower().endswith(".p12"):
-                if self._account_email is None:
-                    raise Exception("Input account email.")
-                credentials = ServiceAccountCredentials.from_p12_keyfile(
-                    self._account_email,
-                    self._keyfile_path,
-                    scopes=scopes)
-            else:
-                error_message = """
-                    Key file format [{0}] is illegal.
-                    Key file must be .json or .p12.
-                """.format(self._keyfile_path)
-                raise Exception(error_message)
-
-            #http = httplib2.Http()
-            #auth_http = credentials.authorize(http)
-            #service = build(api_name, api_version, http=auth_http)
-            service = build(api_name, api_version, credentials=credentials)
-            return credentials, service
-
-    def _try_execute(self, req, retry=3):
+            error_message = """
+                Key file format [{0}] is illegal.
+                Key file must be .json or .p12.
+            """.format(self._keyfile_path)
+            raise Exception(error_message)
+        return credentials
+
+    def _build_service(self, api_name, api_version, scopes):
 
+        from googleapiclient.discovery import build_from_document
+
+        credentials = self._get_credentials(scopes)
+        # discovery document is read from packaged or on-disk cache, not fetched every time.
+        document = load_document(api_name, api_version)
+        if api_root() is not None:
+            document = with_root_url(document, api_root())
+        # requests of service share thread-safe pool of authorized http.
+        service = build_from_document(document, http=self._http_pool(credentials))
+        return credentials, service
+
+    def _http_pool(self, credentials):
+
+        key = id(credentials)
+        with self._service_lock:
+            if key not in self._pools:
+                self._pools[key] = HttpPool(credentials, self._pool_size)
+            return self._pools[key]
+
+    def _thread_http(self, credentials):
+        """
+        Return http authorized by credentials, safe to use from any thread.
+
+        It is the HttpPool shared with the discovery service: each request
+        runs on its own pooled httplib2.Http with kept-alive connections.
+        """
+
+        return self._http_pool(credentials)
+
+    def pool_stats(self):
+        """
+        Return size, created and idle connections of each service http pool.
+        """
+
+        return [pool.stats() for pool in self._pools.values()]
+
+    def _batch_execute(self, service, reqs, batch_size=100, retry=None):
+        """
+        Execute requests by batch HTTP requests of batch_size.
+
+        Items failed by retryable error of retry policy (5xx, 429, ...)
+        are sent again in next batch after backoff delay.
+
+        Returns list of (response, exception) in order of reqs.
+        """
+
+        results = [None] * len(reqs)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        policy = self._policy(retry)
+        start = time.time()
+        attempt = 0
+        indices = list(range(len(reqs)))
+        while indices:
+            attempt += 1
+            for offset in range(0, len(indices), batch_size):
+                batch = service.new_batch_http_request(callback=callback)
+                for index in indices[offset:offset+batch_size]:
+                    batch.add(reqs[index], request_id=str(index))
+                self._try_execute(batch, retry=policy)
+            indices = [index for index in indices
+                       if results[index][1] is not None and policy.retryable(results[index][1])]
+            if not indices:
+                break
+            delay = policy.next_delay(attempt, results[indices[0]][1], start)
+            if delay is None:
+                break
+            time.sleep(delay)
+        return results
+
+    def _iter_items(self, make_request, items_key, fields=None, page_size=None,
+                    max_items=None, retry=3):
+        """
+        Iterate items of list API, requesting next page only when consumed.
+
+        make_request(page_token, max_results, fields) returns list request.
+        fields (ex: "id,creationTime") restricts fields of each item by
+        partial response, iteration stops after max_items items.
+        """
+
+        if fields is not None:
+            fields = "nextPageToken,{0}({1})".format(items_key, fields)
+        count = 0
+        page_token = None
+        while max_items is None or count < max_items:
+            max_results = page_size
+            if max_items is not None:
+                max_results = min(page_size or max_items, max_items - count)
+            resp = self._try_execute(make_request(page_token, max_results, fields), retry=retry)
+            for item in resp.get(items_key, []):
+                yield item
+                count += 1
+                if max_items is not None and count >= max_items:
+                    return
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return
+
+    def _items_frame(self, items, columns, to_record, chunk_rows=10000):
+        """
+        Build pandas.DataFrame from items by chunks of chunk_rows records,
+        so no python object is kept per item beyond one chunk.
+        """
+
+        frames = []
+        records = []
+        for item in items:
+            records.append(to_record(item))
+            if len(records) >= chunk_rows:
+                frames.append(pd.DataFrame.from_records(records, columns=columns))
+                records = []
+        if records or not frames:
+            frames.append(pd.DataFrame.from_records(records, columns=columns))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _try_execute(self, req, retry=None, http=None):
+        """
+        Execute request retrying by retry (RetryPolicy, max attempts or None for client policy).
+        """
+
+        if self._single_flight is not None and getattr(req, "method", None) == "GET":
+            # identical GETs in flight share one call, others (mutations, batch) are sent as is.
+            return self._shared_get(("GET", req.uri), lambda: self._instrumented_execute(req, retry, http))
+        return self._instrumented_execute(req, retry, http)
+
+    def _instrumented_execute(self, req, retry=None, http=None):
+
+        if not self._collectors:
+            return self._execute(req, retry, http)
+
+        sizes = []
+        callbacks = getattr(req, "response_callbacks", None)
+        if callbacks is not None:
+            callback = lambda resp: sizes.append(int(resp.get("content-length", 0) or 0))
+            callbacks.append(callback)
+        start = time.time()
+        attempts = [0]
+        status, reason = 200, None
+        try:
+            return self._execute(req, retry, http, attempts)
+        except Exception as e:
+            status = e.resp.status if isinstance(e, HttpError) else 0
+            reason = (error_reasons(e) or [type(e).__name__])[0]
+            raise
+        finally:
+            latency = time.time() - start
+            if callbacks is not None:
+                callbacks.remove(callback)
+            service, method = _method_name(req)
+            bytes_out = len(getattr(req, "body", None) or "")
+            for collector in self._collectors:
+                collector.record(service, method, latency, bytes_out, sum(sizes),
+                                 max(attempts[0] - 1, 0), status, reason)
+
+    def _execute(self, req, retry=None, http=None, attempts=None):
+
+        policy = self._policy(retry)
+        start = time.time()
+        attempt = 0
         while True:
+            attempt += 1
+            if attempts is not None:
+                attempts[0] = attempt
             try:
-                resp = req.execute()
-                return resp
-            except HttpError as e:
-                if e.resp.status >= 500:
-                    retry -= 1
-                    if retry <= 0:
-                        raise
-                    continue
-                raise
-            except:
-                retry -= 1
-                if retry <= 0:
+                resp = req.execute(http=http)
+            except Exception as e:
+                if not policy.sleep(attempt, e, start):
                     raise
+                continue
+            policy.succeeded()
+            return resp
+
+    def add_collector(self, collector):
+        """
+        Add instrumentation hook (dsclient.metrics.Collector) called for every API call.
+        """
+
+        self._collectors.append(collector)
+        return collector
+
+    def remove_collector(self, collector):
+
+        self._collectors.remove(collector)
+
+    def stats(self, histogram=False):
+        """
+        Return summary of API calls of this client as pandas.DataFrame.
+
+        Parameters
+        ----------
+        histogram : boolean
+            if True, return latency histogram per service and method.
+
+        Returns
+        -------
+        pandas.DataFrame
+            calls, errors, retries, bytes and latency per service and method.
+        """
+
+        if histogram:
+            return self._stats_collector.histogram()
+        return self._stats_collector.summary()
+
+    def reset_stats(self):
+
+        self._stats_collector.reset()
+
+
+def _method_name(req):
+
+    method_id = getattr(req, "methodId", None)
+    if method_id is None:
+        # batch request, named by its first request.
+        requests = getattr(req, "_requests", None) or {}
+        method_id = next((getattr(request, "methodId", None) for request in requests.values()), None)
+        if method_id is None:
+            return "batch", "batch"
+        return method_id.split(".", 1)[0], "batch:" + method_id.split(".", 1)[-1]
+    return method_id.split(".", 1)[0], method_id.split(".", 1)[-1]
@@ -1 +1,3 @@
 from . client import Client
+from . job import Job
+from . scheduler import JobScheduler
@@ -1,15 +1,22 @@
 from __future__ import print_function
 import time
-import platform
+import logging
 import pandas as pd
-from io import BytesIO
-from io import StringIO
-from googleapiclient.http import MediaInMemoryUpload
-from googleapiclient.http import BatchHttpRequest
+from collections import deque, OrderedDict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError
+from concurrent.futures import wait as wait_futures
 from googleapiclient.errors import HttpError
 from .. base import ClientBase
 from .. schema import Schema, convert_df2bqschema
 from .. errors import BigQueryError
+from .. cache import QueryCache
+from . job import Job, as_completed, wait_all
+from . scheduler import JobScheduler
+from . streaming import json_rows, make_insert_ids, iter_batches, make_payload
+from . streaming import MAX_REQUEST_BYTES, MAX_REQUEST_ROWS, RETRYABLE_REASONS
+
+logger = logging.getLogger("dsclient")
 
 
 class Client(ClientBase):
@@ -19,16 +26,116 @@ class Client(ClientBase):
     __API_VERSION = "v2"
 
 
-    def __init__(self, project_id, keyfile_path=None, account_email=None):
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=10):
+
+        super(Client, self).__init__(project_id, keyfile_path, account_email, pool_size)
+        self._query_cache = None
+
+    @property
+    def _bqservice(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GBQ)[1]
+
+    @property
+    def _bqcredentials(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GBQ)[0]
 
-        super(Client, self).__init__(project_id, keyfile_path, account_email)
-        self._bqcredentials, self._bqservice = super(Client, self)._build_service(Client.__API_NAME,
-                                                                                  Client.__API_VERSION,
-                                                                                  Client.__ENDPOINT_GBQ)
     def get_bqservice(self):
 
         return self._bqservice
 
+    def enable_query_cache(self, path=None, max_bytes=1024**3):
+        """
+        Enable on-disk cache of query()/lquery() results.
+
+        Parameters
+        ----------
+        path : str
+            cache directory. default is ~/.cache/dsclient/query.
+        max_bytes : int
+            size limit of cache. least recently used results are evicted.
+
+        Returns
+        -------
+        QueryCache
+            enabled cache.
+        """
+
+        self._query_cache = QueryCache(path, max_bytes)
+        return self._query_cache
+
+    def disable_query_cache(self):
+
+        self._query_cache = None
+
+    def query_cache_stats(self):
+
+        if self._query_cache is None:
+            return None
+        return self._query_cache.stats()
+
+    def _referenced_tables(self, query, use_legacy=True):
+
+        body = {"configuration": {
+                  "dryRun": True,
+                  "query": {
+                    "query": query,
+                    "useLegacySql": use_legacy
+                  }
+               }}
+        jobs = self._bqservice.jobs()
+        req = jobs.insert(projectId=self._project_id, body=body)
+        resp = self._try_execute(req)
+        self._check_joberror(resp)
+        return resp["statistics"]["query"].get("referencedTables", [])
+
+    @staticmethod
+    def _result_options(categorical=None, nullable=False, **options):
+
+        # results read with other dtypes (or extract formats) are cached as different entries.
+        if categorical is not None or nullable:
+            options.update(categorical=categorical, nullable=bool(nullable))
+        return options or None
+
+    def _query_cache_key(self, query, use_legacy=True, kind="query", options=None):
+
+        # None means result can not be cached: query without referenced tables
+        # (ex: CURRENT_TIMESTAMP(), RAND()) never changes its key, and source
+        # table metadata may not be available.
+        refs = self._referenced_tables(query, use_legacy)
+        if not refs:
+            return None
+        tables = []
+        for ref in refs:
+            table_name = "{0}.{1}".format(ref["datasetId"], ref["tableId"])
+            table = self.get_table(table_name, project_id=ref["projectId"], use_cache=False)
+            if table is None or "lastModifiedTime" not in table:
+                return None
+            tables.append("{0}:{1}@{2}".format(ref["projectId"], table_name, table["lastModifiedTime"]))
+        return self._query_cache.make_key(query, use_legacy, tables, kind, options)
+
+    def _read_with_query_cache(self, read, query, use_legacy=True, use_cache=True, kind="query",
+                               options=None):
+
+        if not use_cache or self._query_cache is None:
+            return read()
+
+        try:
+            cache_key = self._query_cache_key(query, use_legacy, kind, options)
+        except Exception as e:
+            # dryRun or get_table of source table may fail (ex: 403 of table
+            # in other project), which only means result is not cached.
+            logger.warning("query cache is bypassed, key of query is not available: %r", e)
+            cache_key = None
+        if cache_key is None:
+            return read()
+        df = self._query_cache.get(cache_key)
+        if df is None:
+            df = read()
+            self._query_cache.put(cache_key, df)
+        return df
+
     def _parse_table_name(self, table_name):
 
         if not "." in table_name:
@@ -40,7 +147,8 @@ class Client(ClientBase):
         dataset_id, table_id = table_name.split(".", 1)
         return dataset_id, table_id
 
-    def _check_joberror(self, job):
+    @staticmethod
+    def _check_joberror(job):
 
         if "status" in job and "errorResult" in job["status"]:
             ereasons  = [error["reason"] for error in job["status"]["errors"]]
@@ -49,83 +157,201 @@ class Client(ClientBase):
             messages = [job["status"]["errorResult"]["message"] + ", ".join([r + ": " + m for r, m in zip(ereasons, emessages)])]
             raise BigQueryError(reasons, messages)
 
-    def _wait_job(self, job, jobname="JOB"):
+    def _get_job(self, job_id):
 
         jobs = self._bqservice.jobs()
-        job_id = job["jobReference"]["jobId"]
-        state = job["status"]["state"]
-        wait_second = 0
-        while "DONE" != state:
-            print("\r[{0}] {1} (waiting {2}s)".format(jobname, state, wait_second), end="")
-            time.sleep(1)
-            wait_second += 1
-            req = jobs.get(projectId=self._project_id, jobId=job_id)
-            resp = self._try_execute(req)
-            state = resp["status"]["state"]
-        print("\r[{0}] {1} (waited {2}s)\n".format(jobname, state, wait_second))
-        self._check_joberror(job)
+        req = jobs.get(projectId=self._project_id, jobId=job_id)
+        resp = self._try_execute(req)
+        return resp
+
+    def _get_jobs(self, job_ids):
 
-        return job
+        # hundreds of jobs are polled by a few batch requests.
+        jobs = self._bqservice.jobs()
+        reqs = [jobs.get(projectId=self._project_id, jobId=job_id) for job_id in job_ids]
+        results = self._batch_execute(self._bqservice, reqs)
+        return dict((job_id, resp) for job_id, (resp, exception) in zip(job_ids, results)
+                    if exception is None)
+
+    def _wait_query_job(self, job_id, timeout_ms):
+
+        jobs = self._bqservice.jobs()
+        req = jobs.getQueryResults(projectId=self._project_id,
+                                   jobId=job_id,
+                                   maxResults=0,
+                                   timeoutMs=timeout_ms)
+        # not retried: error of failed job (ex: backendError) is answered by
+        # 5xx, and Job reads state by jobs.get on any error.
+        resp = self._try_execute(req, retry=1)
+        return resp
 
-    def _try_execute_and_wait(self, req, jobname="BQ JOB", retry=3):
+    def _submit_job(self, req, jobname="BQ JOB", result_func=None):
 
+        resp = self._try_execute(req)
+        self._check_joberror(resp)
+        return Job(self, resp, jobname, result_func)
+
+    def _wait_job(self, job, jobname="JOB"):
+
+        return Job(self, job, jobname).result(verbose=True)
+
+    def get_job(self, job_id):
+        """
+        Return Job future of existing job.
+        """
+
+        return Job(self, self._get_job(str(job_id)))
+
+    def as_completed(self, jobs, timeout=None):
+        """
+        Iterate Job futures in order of completion.
+
+        Pending jobs are polled together by batched jobs.get calls with
+        exponential backoff, instead of one blocking loop per job.
+
+        Parameters
+        ----------
+        jobs : list of Job
+            futures returned by query/load/extract with block=False.
+        timeout : float
+            seconds. concurrent.futures.TimeoutError is raised when exceeded.
+
+        Yields
+        ------
+        Job
+            finished job. call result() to get result or raise its error.
+        """
+
+        return as_completed(jobs, timeout)
+
+    def wait_all(self, jobs, timeout=None, return_exceptions=False):
+        """
+        Wait all Job futures and return their results in order of jobs.
+
+        If return_exceptions is True, BigQueryError of failed job is returned
+        in place of its result, otherwise the first error is raised.
+        """
+
+        return wait_all(jobs, timeout, return_exceptions)
+
+    def _try_execute_and_wait(self, req, jobname="BQ JOB", retry=None):
+
+        policy = self._policy(retry)
+        start = time.time()
+        attempt = 0
         while True:
+            attempt += 1
             try:
-                resp = self._try_execute(req)
+                resp = self._try_execute(req, retry=policy)
                 resp = self._wait_job(resp, jobname)
                 return resp
             except BigQueryError as e:
-                if 503 in e.codes:
-                    print("BackendError. Trying again.")
-                    retry -= 1
-                    if retry <= 0:
-                        raise
-                    continue
-                raise
+                delay = policy.next_delay(attempt, e, start)
+                if delay is None:
+                    raise
+                print("{0} failed by {1}. Trying again.".format(jobname, ", ".join(e.reasons)))
+                time.sleep(delay)
+                self._restart_upload(req)
 
-    def _job2series(self, json_job):
+    @staticmethod
+    def _restart_upload(req):
+
+        # googleapiclient keeps session of finished resumable upload, so job
+        # inserted again needs new session sending media from first byte.
+        if getattr(req, "resumable", None) is not None:
+            req.resumable_uri = None
+            req.resumable_progress = 0
+            req._in_error_state = False
+
+    _JOB_COLUMNS = ["jobid", "state", "creationTime", "startTime", "endTime", "bsize"]
+    _JOB_FIELDS = "jobReference/jobId,state,status/state," \
+                  "statistics(creationTime,startTime,endTime,query/totalBytesProcessed)"
+
+    def _job2record(self, json_job):
 
         jtime = 9*60*60*1000
 
         jobid = json_job["jobReference"]["jobId"]
-        state = json_job["status"]["state"]
-        ctime = int(json_job["statistics"]["creationTime"]) + jtime
-        stime = int(json_job["statistics"]["startTime"]) + jtime
-        etime = int(json_job["statistics"].get("endTime", 0)) + jtime
-        bsize = json_job["statistics"].get("query", {"query":{}}).get("totalBytesProcessed", 0)
-
-        ctimes = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ctime/1000.0))
-        stimes = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(stime/1000.0))
-        etimes = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(etime/1000.0)) if etime != jtime else "-"
+        state = json_job.get("status", {}).get("state", json_job.get("state"))
+        statistics = json_job.get("statistics", {})
+        ctime = int(statistics.get("creationTime", 0)) + jtime
+        stime = int(statistics.get("startTime", 0)) + jtime
+        etime = int(statistics.get("endTime", 0)) + jtime
+        bsize = statistics.get("query", {"query":{}}).get("totalBytesProcessed", 0)
+
+        def format_time(t):
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t/1000.0)) if t != jtime else "-"
         #stimes = datetime.datetime.fromtimestamp(stime/1000.0)
 
-        return pd.Series([jobid,state,ctimes,stimes,etimes,bsize],
-                         index=["jobid","state","creationTime",
-                                "startTime","endTime","bsize"])
+        return (jobid, state, format_time(ctime), format_time(stime), format_time(etime), bsize)
+
+    def _job2series(self, json_job):
+
+        return pd.Series(list(self._job2record(json_job)), index=Client._JOB_COLUMNS)
 
     def query(self, query, table_name=None, append=True,
               write_disposition=None, allow_large_results=True,
-              use_legacy=True, max_tier=None, block=True):
+              use_legacy=True, max_tier=None, block=True,
+              workers=None, page_size=None, use_cache=True,
+              categorical=None, nullable=False):
+        """
+        Run query and read result as pandas.DataFrame or insert into table.
+
+        Parameters
+        ----------
+        query : str
+            query string.
+        table_name : str
+            dataset.table. if None, query result is returned as DataFrame.
+        workers : int
+            number of threads fetching result pages by startIndex in parallel
+            once totalRows is known. if None or 1, pages are read one by one
+            following pageToken.
+        page_size : int
+            maxResults of each result page.
+        use_cache : boolean
+            if False, query cache (see enable_query_cache) is bypassed.
+        categorical : bool, list or float
+            STRING columns read as pandas.Categorical. True for all, list of
+            column names, or ratio: columns whose unique values / rows of the
+            first page is below it.
+        nullable : bool
+            if True, INTEGER and BOOLEAN columns are pandas Int64 and boolean
+            (pandas>=1.0), so NULL does not change them to float64 or object.
+
+        Returns
+        -------
+        pandas.DataFrame or JSON job
+            query result, or query job when table_name is set
+            (Job future if block is False).
+        """
 
         if table_name is None:
-            return self._query_and_get(query, use_legacy)
+            read = lambda: self._query_and_get(query, use_legacy,
+                                               workers=workers, page_size=page_size,
+                                               categorical=categorical, nullable=nullable)
+            return self._read_with_query_cache(read, query, use_legacy, use_cache,
+                                               options=self._result_options(categorical, nullable))
 
         return self._query_and_insert(query=query, table_name=table_name,append=append,
                                       write_disposition=write_disposition, allow_large_results=allow_large_results,
                                       use_legacy=use_legacy, max_tier=max_tier, block=block)
 
-    def _query_and_get(self, query, use_legacy=True):
+    @staticmethod
+    def _check_resperror(resp):
+
+        if "errors" in resp:
+            raise Exception(":".join([error["reason"] + error["message"] for error in resp["errors"]]))
+
+    def _run_query(self, query, use_legacy=True, page_size=None):
 
         jobs = self._bqservice.jobs()
         body={'query': query, 'timeoutMs': 200000, 'useLegacySql': use_legacy}
+        if page_size is not None:
+            body['maxResults'] = page_size
         req = jobs.query(projectId=self._project_id,body=body)
         resp = self._try_execute(req)
 
-        def _check_resperror(rsp):
-            if "errors" in rsp:
-                raise Exception(":".join([error["reason"] + error["message"] for error in rsp["errors"]]))
-
-        start_sec = time.time()
         job_id = resp["jobReference"]["jobId"]
         retry_count = 100
         while retry_count > 0 and not resp["jobComplete"]:
@@ -133,38 +359,187 @@ class Client(ClientBase):
             time.sleep(3)
             req = jobs.getQueryResults(projectId=self._project_id,
                                        jobId=job_id,
+                                       maxResults=page_size,
                                        timeoutMs=200000)
             resp = self._try_execute(req)
-            _check_resperror(resp)
+            self._check_resperror(resp)
 
-        schema = Schema(resp["schema"])
+        return resp
 
+    def _get_query_range(self, job_id, schema, start_index, max_results):
+
+        # getQueryResults may return less rows than maxResults (response size limit),
+        # so keep reading until whole range is fetched.
+        http = self._thread_http(self._bqcredentials)
+        jobs = self._bqservice.jobs()
         df_list = []
-        df = schema.to_dataframe(resp["rows"])
-        df_list.append(df)
+        fetched = 0
+        while fetched < max_results:
+            req = jobs.getQueryResults(projectId=self._project_id,
+                                       jobId=job_id,
+                                       startIndex=start_index + fetched,
+                                       maxResults=max_results - fetched,
+                                       timeoutMs=100000)
+            resp = self._try_execute(req, http=http)
+            self._check_resperror(resp)
+            rows = resp.get("rows", [])
+            if not rows:
+                break
+            df_list.append(schema.to_dataframe(rows))
+            fetched += len(rows)
+
+        return schema.concat(df_list) if df_list else schema.to_dataframe([])
+
+    def _iter_query_pages(self, job_id, schema, total_rows, start_index, page_size,
+                          workers, prefetch=None):
+
+        # at most prefetch ranges are in flight (or decoded and waiting),
+        # so memory is bounded by page size, not by result size.
+        prefetch = max(prefetch or workers, 1)
+        ranges = iter([(index, min(page_size, total_rows - index))
+                       for index in range(start_index, total_rows, page_size)])
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            for index, size in islice(ranges, prefetch):
+                pending.append(executor.submit(self._get_query_range, job_id, schema, index, size))
+            while pending:
+                df = pending.popleft().result()
+                for index, size in islice(ranges, 1):
+                    pending.append(executor.submit(self._get_query_range, job_id, schema, index, size))
+                yield df
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _iter_query_token_pages(self, job_id, schema, page_token, remaining_rows, page_size):
 
-        current_row_size = len(df)
-        while current_row_size < int(resp["totalRows"]):
-            page_token = resp.get('pageToken', None)
+        jobs = self._bqservice.jobs()
+        while remaining_rows > 0:
             req = jobs.getQueryResults(projectId=self._project_id,
                                        jobId=job_id,
                                        pageToken=page_token,
+                                       maxResults=page_size,
                                        timeoutMs=100000)
             resp = self._try_execute(req)
-            _check_resperror(resp)
-            df = schema.to_dataframe(resp["rows"])
+            self._check_resperror(resp)
+            rows = resp.get("rows", [])
+            if not rows:
+                break
+            page_token = resp.get('pageToken', None)
+            remaining_rows -= len(rows)
+            yield schema.to_dataframe(rows)
+
+    def _iter_query_result(self, resp, schema, workers=None, page_size=None, prefetch=None):
+
+        job_id = resp["jobReference"]["jobId"]
+        total_rows = int(resp["totalRows"])
+
+        df = schema.to_dataframe(resp.get("rows", []))
+        current_row_size = len(df)
+        yield df
+
+        if current_row_size >= total_rows:
+            return
+        if workers is not None and workers > 1:
+            page_size = page_size or current_row_size or 100000
+            pages = self._iter_query_pages(job_id, schema, total_rows, current_row_size,
+                                           page_size, workers, prefetch)
+        else:
+            pages = self._iter_query_token_pages(job_id, schema, resp.get('pageToken', None),
+                                                 total_rows - current_row_size, page_size)
+        for df in pages:
+            yield df
+
+    def _query_and_get(self, query, use_legacy=True, workers=None, page_size=None,
+                       categorical=None, nullable=False):
+
+        resp = self._run_query(query, use_legacy, page_size)
+
+        start_sec = time.time()
+        schema = Schema(resp["schema"], categorical, nullable)
+        total_rows = int(resp["totalRows"])
+
+        df_list = []
+        current_row_size = 0
+        for df in self._iter_query_result(resp, schema, workers, page_size):
             df_list.append(df)
             current_row_size += len(df)
-            current_sec = int(time.time() - start_sec)
-            row_rate = int(100 * current_row_size / float(resp["totalRows"]))
-            print("\r rows: read {0} / total {1} ({2}%), time: {3}s".format(current_row_size, resp["totalRows"], row_rate, current_sec), end="")
+            if len(df_list) > 1:
+                current_sec = int(time.time() - start_sec)
+                row_rate = int(100 * current_row_size / float(total_rows))
+                print("\r rows: read {0} / total {1} ({2}%), time: {3}s".format(current_row_size, total_rows, row_rate, current_sec), end="")
 
-        dfs = pd.concat(df_list)
+        dfs = schema.concat(df_list)
         return dfs
 
-    def _query_and_insert(self, query, table_name=None, append=True, block=True,
-               write_disposition=None, allow_large_results=True,
-               use_legacy=True, max_tier=None):
+    def query_iter(self, query, chunk_rows=None, use_legacy=True,
+                   workers=None, page_size=None, prefetch=None,
+                   categorical=None, nullable=False):
+        """
+        Run query and iterate result as pandas.DataFrame chunks.
+
+        Only pages of current chunk and prefetched pages are held in memory,
+        so peak memory depends on chunk size, not on result size.
+        The query is started when the first chunk is requested.
+
+        Parameters
+        ----------
+        query : str
+            query string.
+        chunk_rows : int
+            number of rows of each chunk (the last chunk may be smaller).
+            if None, one DataFrame per result page is yielded.
+        workers : int
+            number of threads fetching pages in parallel (see query).
+        page_size : int
+            maxResults of each result page. defaults to chunk_rows.
+        prefetch : int
+            max number of pages fetched ahead of consumer when workers > 1.
+            defaults to workers.
+        categorical : bool, list or float
+            STRING columns read as pandas.Categorical (see query).
+            categories may differ by chunk.
+        nullable : bool
+            if True, INTEGER and BOOLEAN columns are Int64 and boolean (see query).
+
+        Yields
+        ------
+        pandas.DataFrame
+            chunk of query result, typed according to result schema.
+            INTEGER and BOOLEAN columns of chunks with NULL are float64 and object.
+        """
+
+        if page_size is None:
+            page_size = chunk_rows
+
+        resp = self._run_query(query, use_legacy, page_size)
+        schema = Schema(resp["schema"], categorical, nullable)
+        pages = self._iter_query_result(resp, schema, workers, page_size, prefetch)
+
+        if chunk_rows is None:
+            for df in pages:
+                if len(df) > 0:
+                    yield df
+            return
+
+        buffered = []
+        buffered_rows = 0
+        for df in pages:
+            buffered.append(df)
+            buffered_rows += len(df)
+            while buffered_rows >= chunk_rows:
+                chunk = schema.concat(buffered)
+                rest = chunk.iloc[chunk_rows:]
+                yield chunk.iloc[:chunk_rows]
+                buffered = [rest]
+                buffered_rows = len(rest)
+        if buffered_rows > 0:
+            yield schema.concat(buffered)
+
+    def _query_job_body(self, query, table_name, append=True, write_disposition=None,
+                        allow_large_results=True, use_legacy=True, max_tier=None):
 
         dataset_id, table_id = self._parse_table_name(table_name)
         if write_disposition is None: #WRITE_TRUNCATE, WRITE_APPEND, WRITE_EMPTY
@@ -185,41 +560,183 @@ class Client(ClientBase):
                }}
         if max_tier:
             body["configuration"]["query"]["maximumBillingTier"] = max_tier
+        return body
+
+    def _query_and_insert(self, query, table_name=None, append=True, block=True,
+               write_disposition=None, allow_large_results=True,
+               use_legacy=True, max_tier=None):
 
+        body = self._query_job_body(query, table_name, append, write_disposition,
+                                    allow_large_results, use_legacy, max_tier)
         jobs = self._bqservice.jobs()
         req = jobs.insert(projectId=self._project_id, body=body)
 
+        self._invalidate_table(table_name)
         if not block:
-            resp = self._try_execute(req)
-            self._check_joberror(resp)
-            return resp["jobReference"]["jobId"]
+            return self._submit_job(req, "BQ INSERT", self._invalidate_result(table_name))
 
         resp = self._try_execute_and_wait(req, "BQ INSERT")
+        self._invalidate_table(table_name)
 
         return resp
 
-    def insert(self, df, table_name):
+    def insert(self, df, table_name, workers=4, retry=3, max_bytes=MAX_REQUEST_BYTES,
+               max_rows=MAX_REQUEST_ROWS, skip_invalid_rows=False,
+               ignore_unknown_values=False, template_suffix=None, verbose=True):
+        """
+        Insert records of pandas.DataFrame by streaming insert (tabledata.insertAll).
+
+        Rows are serialized at once, grouped into requests under max_bytes and
+        sent by at most workers concurrent requests. Each row has generated
+        insertId, so rows sent again on retry are deduplicated by BigQuery.
+        Rows rejected with retryable reason (stopped, backendError, ...) are
+        sent again after backoff of retry policy.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+        table_name : str
+            dataset.table
+        workers : int
+            number of concurrent insertAll requests.
+        retry : int or RetryPolicy
+            retry count of failed rows or policy (None: client policy).
+        max_bytes : int
+            payload size of each request (API limit is 10MB).
+        max_rows : int
+            rows of each request.
+        skip_invalid_rows : boolean
+            insert valid rows even if request has invalid rows.
+        ignore_unknown_values : boolean
+            ignore values not matching table schema.
+        template_suffix : str
+            create table as table + template_suffix with schema of table.
+        verbose : boolean
+            print inserted rows per second.
+
+        Returns
+        -------
+        dict
+            rows, inserted, seconds, rows_per_second and errors
+            (list of {"index": row position, "errors": insertErrors}).
+        """
 
         dataset_id, table_id = self._parse_table_name(table_name)
+
+        start = time.time()
+        rows = json_rows(df)
+        insert_ids = make_insert_ids(len(rows))
+        options = (skip_invalid_rows, ignore_unknown_values, template_suffix)
+
+        # rows are sent again for reasons of insertErrors too (ex: stopped).
+        policy = self._policy(retry + 1 if isinstance(retry, int) else retry)
+        policy = policy.replace(reasons=tuple(set(policy.reasons) | set(RETRYABLE_REASONS)))
+
+        errors = {}
+        pending = list(range(len(rows)))
+        attempt = 0
+        while True:
+            attempt += 1
+            pending = self._insert_rows(dataset_id, table_id, pending, rows, insert_ids,
+                                        errors, workers, max_bytes, max_rows, options)
+            if not pending:
+                break
+            row_errors = errors[pending[0]]
+            exception = BigQueryError([error.get("reason", "") for error in row_errors],
+                                      [error.get("message", "") for error in row_errors])
+            if not policy.sleep(attempt, exception, start):
+                break
+
+        self._invalidate_table(table_name)
+        seconds = time.time() - start
+        inserted = len(rows) - len(errors)
+        rows_per_second = inserted / seconds if seconds > 0 else float(inserted)
+        if verbose:
+            print("[BQ INSERT] {0} rows inserted ({1} failed) in {2:.1f}s, {3:.0f} rows/s".format(
+                inserted, len(errors), seconds, rows_per_second))
+
+        return {"rows": len(rows),
+                "inserted": inserted,
+                "seconds": seconds,
+                "rows_per_second": rows_per_second,
+                "errors": [{"index": index, "errors": errors[index]} for index in sorted(errors)]}
+
+    def _insert_rows(self, dataset_id, table_id, indices, rows, insert_ids, errors,
+                     workers, max_bytes, max_rows, options):
+
+        # at most workers requests are in flight, payload is built just
+        # before it is sent, so memory is bounded by workers * max_bytes.
+        retryable = []
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for batch in iter_batches(indices, rows, max_bytes, max_rows):
+                if len(running) >= workers:
+                    done, _ = wait_futures(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        retryable.extend(self._collect_insert(running.pop(future), future, errors))
+                payload = make_payload(batch, rows, insert_ids, *options)
+                future = executor.submit(self._insert_payload, dataset_id, table_id, payload)
+                running[future] = batch
+            for future in wait_futures(running).done:
+                retryable.extend(self._collect_insert(running.pop(future), future, errors))
+        finally:
+            executor.shutdown(wait=True)
+        return sorted(retryable)
+
+    def _insert_payload(self, dataset_id, table_id, payload):
+
         tabledata = self._bqservice.tabledata()
+        req = tabledata.insertAll(projectId=self._project_id,
+                                  datasetId=dataset_id,
+                                  tableId=table_id,
+                                  body={})
+        # rows are serialized already, so body is not encoded again.
+        req.body = payload
+        req.body_size = len(payload)
+        return self._try_execute(req, http=self._thread_http(self._bqcredentials))
 
-        for i in range(0, len(df), 5000):
+    def _collect_insert(self, batch, future, errors):
 
-            rows = [{"json": dict(record)} for ix, record in df[i:i+5000].iterrows()]
-            req = tabledata.insertAll(projectId=self._project_id,
-                                      datasetId=dataset_id,
-                                      tableId=table_id,
-                                      body={'rows': rows}).execute()
-            resp = self._try_execute(req)
-            time.sleep(0.05)
+        for index in batch:
+            errors.pop(index, None)
+
+        try:
+            resp = future.result()
+        except HttpError as e:
+            status = e.resp.status
+            retryable = status >= 500 or status == 429
+            reason = "backendError" if retryable else "invalid"
+            for index in batch:
+                errors[index] = [{"reason": reason, "message": str(e)}]
+            return batch if retryable else []
+        except Exception as e:
+            for index in batch:
+                errors[index] = [{"reason": "backendError", "message": str(e)}]
+            return batch
+
+        retryable = []
+        for item in resp.get("insertErrors", []):
+            index = batch[int(item["index"])]
+            errors[index] = item["errors"]
+            if all(error.get("reason") in RETRYABLE_REASONS for error in item["errors"]):
+                retryable.append(index)
+        return retryable
 
     def load(self, df, table_name, append=True, block=True, job_id=None,
-             write_disposition=None, create_disposition="CREATE_IF_NEEDED"):
+             write_disposition=None, create_disposition="CREATE_IF_NEEDED",
+             source_format=None, chunk_rows=100000, chunk_size=8*1024*1024):
         """
-        Upload local pandas.DataFrame to BigQuery table.
+        Upload local pandas.DataFrame (or local file) to BigQuery table.
+
+        DataFrame is serialized chunk by chunk into resumable upload, so it is
+        never held as one whole serialized body in memory.
+        Local file is uploaded as it is (not parsed by pandas).
 
         Parameters
         ----------
+        df : pandas.DataFrame or str
+            DataFrame or local file path.
         table_name : str
             dataset.table
         append : boolean
@@ -229,23 +746,193 @@ class Client(ClientBase):
             WRITE_TRUNCATE, WRITE_APPEND, WRITE_EMPTY.
         create_disposition : str
             CREATE_NEVER, CREATE_IF_NEEDED
+        source_format : str
+            CSV, NEWLINE_DELIMITED_JSON, AVRO or PARQUET.
+            default is CSV for DataFrame, inferred from extension for file.
+        chunk_rows : int
+            rows serialized at once.
+        chunk_size : int
+            bytes of each upload request (multiple of 256KB).
 
         Returns
         -------
         JSON job
-            load job as JSON format.
+            load job as JSON format (Job future if block is False).
         """
 
-        dataset_id, table_id = self._parse_table_name(table_name)
         table = self.get_table(table_name)
+        req = self._load_request(df, table_name, table, append, job_id, write_disposition,
+                                 create_disposition, source_format, chunk_rows, chunk_size)
+
+        self._invalidate_table(table_name)
+        if not block:
+            return self._submit_job(req, "BQ LOAD", self._invalidate_result(table_name))
+
+        resp = self._try_execute_and_wait(req, "BQ LOAD")
+        self._invalidate_table(table_name)
+
+        return resp
+
+    def _invalidate_result(self, table_name):
+
+        # result_func of Job, table is changed when job is done.
+        def invalidate(job):
+            self._invalidate_table(table_name)
+            return job
+        return invalidate
+
+    def load_partitioned(self, df, table_name, partition_col, append=True, workers=4,
+                         source_format=None, chunk_rows=100000, chunk_size=8*1024*1024,
+                         timeout=None):
+        """
+        Upload local pandas.DataFrame to day partitions (table$YYYYMMDD) of table.
+
+        DataFrame is grouped by day of partition_col and one load job is
+        inserted for each partition. At most workers partitions are uploading
+        or running at once, uploads (serialization) run in parallel threads
+        and running jobs are polled together by batched requests.
+        Failed partition does not cancel other partitions.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+        table_name : str
+            dataset.table (without partition decorator).
+            if table does not exist, day partitioned table is created.
+        partition_col : str
+            column of date, datetime or date string.
+        append : boolean
+            if True, append records to partitions.
+            if False, replace each partition by records.
+        workers : int
+            number of partitions uploading or running at once.
+        source_format : str
+            CSV, NEWLINE_DELIMITED_JSON, AVRO or PARQUET.
+        timeout : float
+            seconds to wait all partitions.
+
+        Returns
+        -------
+        pandas.DataFrame
+            partition, rows, job_id, state and error of each partition.
+        """
+
+        if "$" in table_name:
+            raise Exception("table name({0}) must not have partition decorator".format(table_name))
+
+        table = self.get_table(table_name)
+        keys = pd.to_datetime(df[partition_col]).dt.strftime("%Y%m%d")
+        if keys.isnull().any():
+            raise Exception("column {0} has null, which has no partition".format(partition_col))
+        partitions = deque(df.groupby(keys.values, sort=True))
+
+        time_partitioning = {"type": "DAY"}
+        if table is None and partition_col in df.columns \
+           and str(df[partition_col].dtype).startswith("datetime"):
+            time_partitioning["field"] = partition_col
+
+        def upload(partition, group):
+            req = self._load_request(group, "{0}${1}".format(table_name, partition), table,
+                                     append=append, source_format=source_format,
+                                     chunk_rows=chunk_rows, chunk_size=chunk_size,
+                                     time_partitioning=time_partitioning)
+            resp = self._try_execute(req, http=self._thread_http(self._bqcredentials))
+            return Job(self, resp, "BQ LOAD " + partition)
+
+        results = {}
+        uploading = {}
+        running = {}
+        start = time.time()
+        interval = Job.MIN_INTERVAL
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while partitions or uploading or running:
+                while partitions and len(uploading) + len(running) < workers:
+                    partition, group = partitions.popleft()
+                    future = executor.submit(upload, partition, group)
+                    uploading[future] = (partition, len(group))
+                    results[partition] = {"partition": partition, "rows": len(group),
+                                          "job_id": None, "state": "UPLOADING", "error": None}
+
+                done = wait_futures(uploading, timeout=0 if running else interval,
+                                    return_when=FIRST_COMPLETED).done
+                for future in done:
+                    partition, rows = uploading.pop(future)
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        results[partition].update(state="FAILED", error=str(e))
+                        continue
+                    results[partition]["job_id"] = job.job_id
+                    running[job.job_id] = (partition, job)
+
+                if running:
+                    resources = self._get_jobs(list(running))
+                    finished = 0
+                    for job_id, (partition, job) in list(running.items()):
+                        job._update(resources.get(job_id))
+                        results[partition]["state"] = job.state
+                        if job.state != "DONE":
+                            continue
+                        finished += 1
+                        del running[job_id]
+                        try:
+                            self._check_joberror(job.resource)
+                        except BigQueryError as e:
+                            results[partition].update(state="FAILED", error=str(e))
+                    if finished == 0 and running:
+                        # wait for next upload, or just sleep when nothing is uploading
+                        # (wait of no futures returns at once).
+                        if uploading:
+                            wait_futures(uploading, timeout=interval, return_when=FIRST_COMPLETED)
+                        else:
+                            time.sleep(interval)
+                        interval = min(interval * Job.BACKOFF, Job.MAX_INTERVAL)
+                    else:
+                        interval = Job.MIN_INTERVAL
+
+                if timeout is not None and time.time() - start > timeout:
+                    raise TimeoutError("{0} partitions are not finished in {1}s".format(
+                        len(partitions) + len(uploading) + len(running), timeout))
+        finally:
+            for future in uploading:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        self._invalidate_table(table_name)
+        result = pd.DataFrame([results[partition] for partition in sorted(results)],
+                              columns=["partition", "rows", "job_id", "state", "error"])
+        failed = (result["state"] == "FAILED").sum()
+        print("[BQ LOAD] {0} partitions loaded ({1} failed) in {2}s".format(
+            len(result) - failed, failed, int(time.time() - start)))
+        return result
+
+    def _load_request(self, df, table_name, table, append=True, job_id=None,
+                      write_disposition=None, create_disposition="CREATE_IF_NEEDED",
+                      source_format=None, chunk_rows=100000, chunk_size=8*1024*1024,
+                      time_partitioning=None):
+
+        # upload module (and googleapiclient.http) is imported only when loading.
+        from googleapiclient.http import MediaFileUpload
+        from . upload import DataFrameUpload, SOURCE_FORMATS, infer_source_format
+
+        dataset_id, table_id = self._parse_table_name(table_name)
 
         if write_disposition is None:
             write_disposition  = "WRITE_APPEND" if append else "WRITE_TRUNCATE"
 
+        is_file = isinstance(df, str)
+        if source_format is None:
+            source_format = infer_source_format(df) if is_file else "CSV"
+        source_format = source_format.upper()
+        if source_format == "JSON":
+            source_format = "NEWLINE_DELIMITED_JSON"
+        if source_format not in SOURCE_FORMATS:
+            raise Exception("source_format must be one of {0}".format(", ".join(SOURCE_FORMATS)))
+
         body = {"configuration": {
                   "load": {
-                    "sourceFormat": "CSV",
-                    "skipLeadingRows": 1,
+                    "sourceFormat": source_format,
                     "createDisposition": create_disposition,
                     "writeDisposition": write_disposition,
                     "destinationTable": {
@@ -255,42 +942,60 @@ class Client(ClientBase):
                     }
                   }
                }}
+        load = body["configuration"]["load"]
 
         if job_id is not None:
             body["jobReference"] = {"jobId": job_id, "projectId": self._project_id}
 
-        if isinstance(df, str):
-            df = pd.read_csv(df)
-
-        if table is None or (not append and "$" not in table.get("tableReference",{"tableId": ""})["tableId"]):
-            schema = convert_df2bqschema(df)
-            body["configuration"]["load"]["schema"] = schema
-
-        if platform.python_version_tuple()[0] == "3":
-            buf = StringIO()
-            df.to_csv(buf, index=False)
-            value = str.encode(buf.getvalue())
+        if time_partitioning is not None and table is None:
+            load["timePartitioning"] = time_partitioning
+
+        if source_format == "CSV":
+            load["skipLeadingRows"] = 1
+        elif source_format == "AVRO":
+            load["useAvroLogicalTypes"] = True
+
+        # avro and parquet carry their own schema.
+        new_table = table is None or (not append and "$" not in table.get("tableReference",{"tableId": ""})["tableId"])
+        if new_table and source_format in ["CSV", "NEWLINE_DELIMITED_JSON"]:
+            if is_file:
+                load["autodetect"] = True
+            else:
+                load["schema"] = convert_df2bqschema(df)
+
+        if is_file:
+            media_body = MediaFileUpload(df, mimetype='application/octet-stream',
+                                         chunksize=chunk_size, resumable=True)
         else:
-            buf = BytesIO()
-            df.to_csv(buf, index=False)
-            value = buf.getvalue()
+            media_body = DataFrameUpload(df, source_format, chunk_rows, chunk_size)
+
         jobs = self._bqservice.jobs()
         req = jobs.insert(projectId=self._project_id,
                           body=body,
-                          media_body=MediaInMemoryUpload(value,
-                                                         mimetype='application/octet-stream',
-                                                         resumable=True))
-
-        if not block:
-            resp = self._try_execute(req)
-            self._check_joberror(resp)
-            return resp["jobReference"]["jobId"]
+                          media_body=media_body)
+        return req
 
-        resp = self._try_execute_and_wait(req, "BQ LOAD")
+    def extract(self, table_name, uri, block=True, destination_format=None, compression=None):
+        """
+        Extract table to Cloud Storage.
 
-        return resp
+        Parameters
+        ----------
+        table_name : str
+            dataset.table
+        uri : str or list of str
+            destination gs:// uri. uri including wildcard (*) or list of uris
+            is set as destinationUris, and BigQuery writes table in shards.
+        destination_format : str
+            CSV (default), NEWLINE_DELIMITED_JSON or AVRO.
+        compression : str
+            GZIP (CSV, NEWLINE_DELIMITED_JSON), DEFLATE or SNAPPY (AVRO).
 
-    def extract(self, table_name, uri, block=True):
+        Returns
+        -------
+        JSON table
+            extracted table as JSON format (Job future if block is False).
+        """
 
         dataset_id, table_id = self._parse_table_name(table_name)
         body = {"configuration": {
@@ -299,36 +1004,127 @@ class Client(ClientBase):
                             "projectId": self._project_id,
                             "datasetId": dataset_id,
                             "tableId": table_id
-                        },
-                        "destinationUri": uri,
-                        #"destinationUris": [string],
-                        "printHeader": True
+                        }
                         #"fieldDelimiter": string,
-                        #"destinationFormat": string,
-                        #"compression": string
                     }
                }}
+        if destination_format is None or destination_format == "CSV":
+            body["configuration"]["extract"]["printHeader"] = True
+        if destination_format is not None:
+            body["configuration"]["extract"]["destinationFormat"] = destination_format
+        if compression is not None:
+            body["configuration"]["extract"]["compression"] = compression
+        if isinstance(uri, (list, tuple)):
+            body["configuration"]["extract"]["destinationUris"] = list(uri)
+        elif "*" in uri:
+            body["configuration"]["extract"]["destinationUris"] = [uri]
+        else:
+            body["configuration"]["extract"]["destinationUri"] = uri
         jobs = self._bqservice.jobs()
         req = jobs.insert(projectId=self._project_id, body=body)
 
         if not block:
-            resp = self._try_execute(req)
-            self._check_joberror(resp)
-            return resp["jobReference"]["jobId"]
+            return self._submit_job(req, "BQ EXTRACT",
+                                    lambda job: self.get_table(table_name))
 
         resp = self._try_execute_and_wait(req, "BQ EXTRACT")
 
         table = self.get_table(table_name)
         return table
 
+    def copy(self, source_table, table_name, append=True, block=True,
+             write_disposition=None, create_disposition="CREATE_IF_NEEDED"):
+        """
+        Copy table into table_name.
+
+        Parameters
+        ----------
+        source_table : str or list of str
+            dataset.table
+        table_name : str
+            dataset.table
+        append : boolean
+            if True, append records to existing table.
+            if False, replace table by records of source_table.
+
+        Returns
+        -------
+        JSON job
+            copy job as JSON format (Job future if block is False).
+        """
+
+        if write_disposition is None:
+            write_disposition = "WRITE_APPEND" if append else "WRITE_TRUNCATE"
+
+        sources = source_table if isinstance(source_table, (list, tuple)) else [source_table]
+        source_tables = []
+        for source in sources:
+            dataset_id, table_id = self._parse_table_name(source)
+            source_tables.append({"projectId": self._project_id,
+                                  "datasetId": dataset_id,
+                                  "tableId": table_id})
+        dataset_id, table_id = self._parse_table_name(table_name)
+        body = {"configuration": {
+                  "copy": {
+                    "sourceTables": source_tables,
+                    "destinationTable": {
+                      "projectId": self._project_id,
+                      "datasetId": dataset_id,
+                      "tableId": table_id
+                    },
+                    "createDisposition": create_disposition,
+                    "writeDisposition": write_disposition
+                  }
+               }}
+        jobs = self._bqservice.jobs()
+        req = jobs.insert(projectId=self._project_id, body=body)
+
+        self._invalidate_table(table_name)
+        if not block:
+            return self._submit_job(req, "BQ COPY", self._invalidate_result(table_name))
+
+        resp = self._try_execute_and_wait(req, "BQ COPY")
+        self._invalidate_table(table_name)
+
+        return resp
+
+    def scheduler(self, max_running=10, max_retries=5, backoff=1.0, max_backoff=64.0):
+        """
+        Return JobScheduler running query/load/extract/copy jobs of this
+        client with at most max_running jobs at once.
+
+        Parameters
+        ----------
+        max_running : int
+            number of jobs running at once.
+        max_retries : int
+            insert count of the same job after rateLimitExceeded,
+            resourcesExceeded or backendError.
+        backoff : float
+            first delay (seconds) of backoff after rate limited.
+        max_backoff : float
+            max delay (seconds) of backoff.
+
+        Returns
+        -------
+        JobScheduler
+        """
+
+        return JobScheduler(self, max_running, max_retries, backoff, max_backoff)
+
     def cancel(self, job_id):
 
         jobs = self._bqservice.jobs()
-        req = jobs.cancel(projectId=self._project_id, jobId=job_id)
+        req = jobs.cancel(projectId=self._project_id, jobId=str(job_id))
         resp = self._try_execute(req)
         return resp
 
-    def get_dataset(self, dataset_id):
+    def get_dataset(self, dataset_id, use_cache=True):
+
+        return self._cached_get(("dataset", self._project_id, dataset_id),
+                                lambda: self._get_dataset(dataset_id), use_cache)
+
+    def _get_dataset(self, dataset_id):
 
         datasets = self._bqservice.datasets()
         try:
@@ -341,6 +1137,21 @@ class Client(ClientBase):
 
         return resp
 
+    def get_datasets(self, dataset_ids, batch_size=100):
+        """
+        Get datasets by batch HTTP requests.
+
+        Returns
+        -------
+        OrderedDict
+            dataset_id: (JSON dataset or None if not exist, exception or None)
+        """
+
+        datasets = self._bqservice.datasets()
+        reqs = [datasets.get(projectId=self._project_id, datasetId=dataset_id)
+                for dataset_id in dataset_ids]
+        return self._batch_results(dataset_ids, reqs, batch_size, not_found=True)
+
     def list_dataset(self, all=None, page_token=None, max_results=None):
 
         datasets = self._bqservice.datasets()
@@ -357,6 +1168,33 @@ class Client(ClientBase):
 
         return resp
 
+    def iter_datasets(self, all=None, fields=None, page_size=1000, max_items=None):
+        """
+        Iterate datasets of project, requesting next page only when needed.
+
+        Parameters
+        ----------
+        all : boolean
+            include hidden datasets.
+        fields : str
+            fields of each dataset (ex: "datasetReference/datasetId").
+        page_size : int
+            datasets of each page.
+        max_items : int
+            stop after max_items datasets.
+        """
+
+        datasets = self._bqservice.datasets()
+
+        def make_request(page_token, max_results, partial):
+            return datasets.list(projectId=self._project_id,
+                                 all=all,
+                                 pageToken=page_token,
+                                 maxResults=max_results,
+                                 fields=partial)
+
+        return self._iter_items(make_request, "datasets", fields, page_size, max_items)
+
     def create_dataset(self, dataset_id, location=None, expiration_ms=None):
 
         body = {
@@ -371,10 +1209,15 @@ class Client(ClientBase):
         if expiration_ms is not None:
             body["defaultTableExpirationMs"] = expiration_ms
 
+        self._invalidate_dataset(dataset_id)
         datasets = self._bqservice.datasets()
         req = datasets.insert(projectId=self._project_id,
                               body=body)
-        resp = self._try_execute(req)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            # get_dataset running during the call may have cached old value.
+            self._invalidate_dataset(dataset_id)
         return resp
 
     def delete_dataset(self, dataset_id, delete_contents=False):
@@ -383,14 +1226,72 @@ class Client(ClientBase):
         req = datasets.delete(projectId=self._project_id,
                               datasetId=dataset_id,
                               deleteContents=delete_contents)
-        resp = self._try_execute(req)
+        self._invalidate_dataset(dataset_id)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            self._invalidate_dataset(dataset_id)
 
-    def get_table(self, table_name):
+    def delete_datasets(self, dataset_ids, delete_contents=False, batch_size=100):
+        """
+        Delete datasets by batch HTTP requests.
+
+        Returns
+        -------
+        OrderedDict
+            dataset_id: (response, exception or None)
+        """
+
+        datasets = self._bqservice.datasets()
+        reqs = [datasets.delete(projectId=self._project_id,
+                                datasetId=dataset_id,
+                                deleteContents=delete_contents)
+                for dataset_id in dataset_ids]
+        for dataset_id in dataset_ids:
+            self._invalidate_dataset(dataset_id)
+        try:
+            return self._batch_results(dataset_ids, reqs, batch_size)
+        finally:
+            for dataset_id in dataset_ids:
+                self._invalidate_dataset(dataset_id)
+
+    def _batch_results(self, names, reqs, batch_size, not_found=False):
+
+        # BigQuery accepts at most 1000 calls in one batch request.
+        results = self._batch_execute(self._bqservice, reqs, min(batch_size, 1000))
+        items = OrderedDict()
+        for name, (resp, exception) in zip(names, results):
+            if not_found and isinstance(exception, HttpError) and exception.resp.status == 404:
+                exception = None
+            items[name] = (resp, exception)
+        return items
+
+    def get_table(self, table_name, project_id=None, use_cache=True):
+
+        return self._cached_get(self._table_key(table_name, project_id),
+                                lambda: self._get_table(table_name, project_id), use_cache)
+
+    def _table_key(self, table_name, project_id=None):
+
+        # partitions (table$YYYYMMDD) are under key of their table.
+        dataset_id, table_id = self._parse_table_name(table_name)
+        return ("table", project_id or self._project_id, dataset_id, table_id.split("$")[0], table_id)
+
+    def _invalidate_table(self, table_name):
+
+        self._invalidate_metadata(self._table_key(table_name)[:4])
+
+    def _invalidate_dataset(self, dataset_id):
+
+        self._invalidate_metadata(("dataset", self._project_id, dataset_id))
+        self._invalidate_metadata(("table", self._project_id, dataset_id))
+
+    def _get_table(self, table_name, project_id=None):
 
         dataset_id, table_id = self._parse_table_name(table_name)
         tables = self._bqservice.tables()
         try:
-            req = tables.get(projectId=self._project_id,
+            req = tables.get(projectId=project_id or self._project_id,
                              datasetId=dataset_id,
                              tableId=table_id)
             resp = self._try_execute(req)
@@ -401,6 +1302,32 @@ class Client(ClientBase):
 
         return resp
 
+    def get_tables(self, table_names, project_id=None, batch_size=100):
+        """
+        Get tables by batch HTTP requests (split into batch_size calls).
+
+        Parameters
+        ----------
+        table_names : list of str
+            dataset.table
+        batch_size : int
+            calls in one batch request (at most 1000).
+
+        Returns
+        -------
+        OrderedDict
+            table_name: (JSON table or None if not exist, exception or None)
+        """
+
+        tables = self._bqservice.tables()
+        reqs = []
+        for table_name in table_names:
+            dataset_id, table_id = self._parse_table_name(table_name)
+            reqs.append(tables.get(projectId=project_id or self._project_id,
+                                   datasetId=dataset_id,
+                                   tableId=table_id))
+        return self._batch_results(table_names, reqs, batch_size, not_found=True)
+
     def list_table(self, dataset_id, page_token=None, max_results=None):
 
         tables = self._bqservice.tables()
@@ -411,6 +1338,48 @@ class Client(ClientBase):
         resp = self._try_execute(req)
         return resp
 
+    def iter_tables(self, dataset_id, fields=None, page_size=1000, max_items=None):
+        """
+        Iterate tables of dataset, requesting next page only when needed.
+
+        Parameters
+        ----------
+        dataset_id : str
+        fields : str
+            fields of each table (ex: "tableReference/tableId,creationTime").
+        page_size : int
+            tables of each page.
+        max_items : int
+            stop after max_items tables.
+        """
+
+        tables = self._bqservice.tables()
+
+        def make_request(page_token, max_results, partial):
+            return tables.list(projectId=self._project_id,
+                               datasetId=dataset_id,
+                               pageToken=page_token,
+                               maxResults=max_results,
+                               fields=partial)
+
+        return self._iter_items(make_request, "tables", fields, page_size, max_items)
+
+    def tables_frame(self, dataset_id, page_size=1000, max_items=None):
+        """
+        Return tables of dataset as pandas.DataFrame (table_name, type, creationTime).
+        """
+
+        def to_record(table):
+            reference = table["tableReference"]
+            return ("{0}.{1}".format(reference["datasetId"], reference["tableId"]),
+                    table.get("type"),
+                    pd.Timestamp(int(table.get("creationTime", 0)), unit="ms"))
+
+        items = self.iter_tables(dataset_id,
+                                 "tableReference(datasetId,tableId),type,creationTime",
+                                 page_size, max_items)
+        return self._items_frame(items, ["table_name", "type", "creationTime"], to_record)
+
     def create_table(self, table_name, body):
         """
         Create table.
@@ -429,12 +1398,20 @@ class Client(ClientBase):
         """
 
         dataset_id, table_id = self._parse_table_name(table_name)
+        body = dict(body)
+        body.setdefault("tableReference", {"projectId": self._project_id,
+                                           "datasetId": dataset_id,
+                                           "tableId": table_id})
         tables = self._bqservice.tables()
         req = tables.insert(projectId=self._project_id,
                             datasetId=dataset_id,
-                            tableId=table_id,
                             body=body)
-        resp = self._try_execute(req)
+        self._invalidate_table(table_name)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            # get_table running during the call may have cached old value.
+            self._invalidate_table(table_name)
         return resp
 
     def create_table_from(self, table_name, source, timePartitioning=None):
@@ -448,7 +1425,11 @@ class Client(ClientBase):
                             datasetId=dataset_id,
                             tableId=table_id,
                             body=body)
-        resp = self._try_execute(req)
+        self._invalidate_table(table_name)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            self._invalidate_table(table_name)
         return resp
 
     def delete_table(self, table_name):
@@ -458,7 +1439,11 @@ class Client(ClientBase):
         req = tables.delete(projectId=self._project_id,
                             datasetId=dataset_id,
                             tableId=table_id)
-        resp = self._try_execute(req)
+        self._invalidate_table(table_name)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            self._invalidate_table(table_name)
 
     def patch_table(self, table_name, body):
 
@@ -468,24 +1453,117 @@ class Client(ClientBase):
                            datasetId=dataset_id,
                            tableId=table_id,
                            body=body)
-        resp = self._try_execute(req)
+        self._invalidate_table(table_name)
+        try:
+            resp = self._try_execute(req)
+        finally:
+            self._invalidate_table(table_name)
         return resp
 
-    def show_jobs(self):
+    def delete_tables(self, table_names, batch_size=100):
+        """
+        Delete tables by batch HTTP requests.
+
+        Returns
+        -------
+        OrderedDict
+            table_name: (response, exception or None)
+        """
+
+        tables = self._bqservice.tables()
+        reqs = []
+        for table_name in table_names:
+            dataset_id, table_id = self._parse_table_name(table_name)
+            reqs.append(tables.delete(projectId=self._project_id,
+                                      datasetId=dataset_id,
+                                      tableId=table_id))
+            self._invalidate_table(table_name)
+        try:
+            return self._batch_results(table_names, reqs, batch_size)
+        finally:
+            for table_name in table_names:
+                self._invalidate_table(table_name)
+
+    def patch_tables(self, bodies, batch_size=100):
+        """
+        Patch tables by batch HTTP requests.
+
+        Parameters
+        ----------
+        bodies : dict
+            table_name: patch body (ex: {"expirationTime": ...}).
+
+        Returns
+        -------
+        OrderedDict
+            table_name: (JSON table, exception or None)
+        """
+
+        table_names = list(bodies)
+        tables = self._bqservice.tables()
+        reqs = []
+        for table_name in table_names:
+            dataset_id, table_id = self._parse_table_name(table_name)
+            reqs.append(tables.patch(projectId=self._project_id,
+                                     datasetId=dataset_id,
+                                     tableId=table_id,
+                                     body=bodies[table_name]))
+            self._invalidate_table(table_name)
+        try:
+            return self._batch_results(table_names, reqs, batch_size)
+        finally:
+            for table_name in table_names:
+                self._invalidate_table(table_name)
+
+    def iter_jobs(self, all_users=None, state_filter=None, projection=None,
+                  fields=None, page_size=1000, max_items=None):
+        """
+        Iterate jobs (newest first), requesting next page only when needed.
+
+        Parameters
+        ----------
+        all_users : boolean
+            list jobs of all users in project.
+        state_filter : str or list
+            done, pending, running.
+        fields : str
+            fields of each job (ex: "jobReference/jobId,state").
+        page_size : int
+            jobs of each page.
+        max_items : int
+            stop after max_items jobs.
+        """
 
         jobs = self._bqservice.jobs()
-        req = jobs.list(projectId=self._project_id)
-        resp = self._try_execute(req)
-        job_list = []
-        for json_job in resp["jobs"]:
-            job = self._job2series(json_job)
-            job_list.append(job)
-        print(pd.DataFrame(job_list))
+
+        def make_request(page_token, max_results, partial):
+            return jobs.list(projectId=self._project_id,
+                             allUsers=all_users,
+                             stateFilter=state_filter,
+                             projection=projection,
+                             pageToken=page_token,
+                             maxResults=max_results,
+                             fields=partial)
+
+        return self._iter_items(make_request, "jobs", fields, page_size, max_items)
+
+    def jobs_frame(self, all_users=None, state_filter=None, page_size=1000, max_items=None):
+        """
+        Return jobs as pandas.DataFrame (jobid, state, times and bytes processed).
+        """
+
+        items = self.iter_jobs(all_users, state_filter, fields=Client._JOB_FIELDS,
+                               page_size=page_size, max_items=max_items)
+        return self._items_frame(items, Client._JOB_COLUMNS, self._job2record)
+
+    def show_jobs(self, max_items=100, all_users=None, state_filter=None):
+
+        print(self.jobs_frame(all_users, state_filter, max_items=max_items))
 
     def show_job(self, job_id):
 
         jobs = self._bqservice.jobs()
-        req = jobs.get(projectId=self._project_id, jobId=job_id)
+        req = jobs.get(projectId=self._project_id, jobId=str(job_id))
         resp = self._try_execute(req)
         job = self._job2series(resp)
         print(resp)
@@ -493,20 +1571,4 @@ class Client(ClientBase):
 
     def _streaming_insert(self, df, dataset_id, table_id):
 
-        tabledata = self._bqservice.tabledata()
-
-        def insert():
-            resp = tabledata.insertAll(projectId=self._project_id,
-                                       datasetId=dataset_id,
-                                       tableId=table_id,
-                                       body=insert_data).execute()
-            return resp
-
-        for i in range(0, len(df), 5000):
-            rows = []
-            for ix, record in df[i:i+5000].iterrows():
-                rows.append({"json": dict(record)})
-
-            insert_data={'rows': rows}
-            resp = insert()
-            time.sleep(0.05)
+        return self.insert(df, dataset_id + "." + table_id, verbose=False)
@@ -0,0 +1,222 @@
+from __future__ import print_function
+import time
+from concurrent.futures import TimeoutError
+from googleapiclient.errors import HttpError
+from .. errors import BigQueryError
+
+
+class Job(object):
+    """
+    Future of BigQuery job (query, load, extract, copy).
+
+    Job is polled adaptively: query jobs wait on server side with
+    getQueryResults(timeoutMs), other jobs are polled by jobs.get with
+    exponential backoff.
+
+    Parameters
+    ----------
+    client : dsclient.bigquery.Client
+        client which inserted the job.
+    job : dict
+        job resource returned by jobs.insert.
+    jobname : str
+        name shown in progress.
+    result_func : callable
+        converts finished job resource into result (ex: extracted table).
+    """
+
+    MIN_INTERVAL = 0.5
+    MAX_INTERVAL = 10.0
+    BACKOFF = 1.5
+    LONG_POLL_MS = 10000
+
+    def __init__(self, client, job, jobname="BQ JOB", result_func=None):
+
+        self._client = client
+        self._job = job
+        self._jobname = jobname
+        self._result_func = result_func
+        self._result = None
+        self._has_result = False
+
+    @property
+    def job_id(self):
+
+        return self._job["jobReference"]["jobId"]
+
+    @property
+    def job_type(self):
+
+        configuration = self._job.get("configuration", {})
+        for job_type in ["query", "load", "extract", "copy"]:
+            if job_type in configuration:
+                return job_type
+        return None
+
+    @property
+    def state(self):
+
+        return self._job.get("status", {}).get("state")
+
+    @property
+    def resource(self):
+
+        return self._job
+
+    def __repr__(self):
+
+        return "<Job {0} {1}>".format(self.job_id, self.state)
+
+    def __str__(self):
+
+        return self.job_id
+
+    def _update(self, job):
+
+        if job is not None:
+            self._job = job
+
+    def done(self):
+        """
+        Return True if job is finished (one jobs.get call if not yet).
+        """
+
+        if self.state != "DONE":
+            self._update(self._client._get_job(self.job_id))
+        return self.state == "DONE"
+
+    def _poll(self, timeout_ms):
+
+        if self.job_type == "query":
+            # server side long-poll, returns as soon as the job is complete.
+            # getQueryResults of failed job answers by HTTP error of the job,
+            # so its state and errorResult are read by jobs.get.
+            try:
+                resp = self._client._wait_query_job(self.job_id, timeout_ms)
+            except HttpError:
+                return self.done()
+            if not resp.get("jobComplete", False):
+                return False
+        return self.done()
+
+    def exception(self, timeout=None):
+
+        try:
+            self.result(timeout)
+        except BigQueryError as e:
+            return e
+        return None
+
+    def result(self, timeout=None, verbose=False):
+        """
+        Wait job and return result.
+
+        Parameters
+        ----------
+        timeout : float
+            seconds. concurrent.futures.TimeoutError is raised if job is not
+            finished in time.
+        verbose : boolean
+            print progress while waiting.
+
+        Returns
+        -------
+        JSON job or result of result_func
+        """
+
+        if self._has_result:
+            return self._result
+
+        start = time.time()
+        interval = Job.MIN_INTERVAL
+        while self.state != "DONE":
+            elapsed = time.time() - start
+            if verbose:
+                print("\r[{0}] {1} (waiting {2}s)".format(self._jobname, self.state, int(elapsed)), end="")
+            if timeout is not None and elapsed >= timeout:
+                raise TimeoutError("job {0} is not finished in {1}s".format(self.job_id, timeout))
+            remaining_ms = Job.LONG_POLL_MS if timeout is None else int(1000 * (timeout - elapsed))
+            if self._poll(min(remaining_ms, Job.LONG_POLL_MS)):
+                break
+            if self.job_type != "query":
+                time.sleep(interval if timeout is None else min(interval, max(timeout - elapsed, 0)))
+                interval = min(interval * Job.BACKOFF, Job.MAX_INTERVAL)
+        if verbose:
+            print("\r[{0}] {1} (waited {2}s)\n".format(self._jobname, self.state, int(time.time() - start)))
+
+        self._client._check_joberror(self._job)
+        result = self._job
+        if self._result_func is not None:
+            result = self._result_func(self._job)
+        self._result = result
+        self._has_result = True
+        return result
+
+    def cancel(self):
+        """
+        Request cancellation of job. Return False if job is already finished.
+        """
+
+        if self.state == "DONE":
+            return False
+        resp = self._client.cancel(self.job_id)
+        self._update(resp.get("job"))
+        return True
+
+
+def as_completed(jobs, timeout=None):
+    """
+    Iterate jobs in order of completion.
+
+    All pending jobs are polled together by batched jobs.get calls
+    (see dsclient.bigquery.Client.as_completed).
+    """
+
+    jobs = list(jobs)
+    if not jobs:
+        return
+    client = jobs[0]._client
+    start = time.time()
+    interval = Job.MIN_INTERVAL
+    pending = [job for job in jobs]
+    while pending:
+        finished = [job for job in pending if job.state == "DONE"]
+        if not finished:
+            resources = client._get_jobs([job.job_id for job in pending])
+            for job in pending:
+                job._update(resources.get(job.job_id))
+            finished = [job for job in pending if job.state == "DONE"]
+        for job in finished:
+            pending.remove(job)
+            yield job
+        if finished:
+            interval = Job.MIN_INTERVAL
+            continue
+        elapsed = time.time() - start
+        if timeout is not None and elapsed >= timeout:
+            raise TimeoutError("{0} jobs are not finished in {1}s".format(len(pending), timeout))
+        time.sleep(interval if timeout is None else min(interval, timeout - elapsed))
+        interval = min(interval * Job.BACKOFF, Job.MAX_INTERVAL)
+
+
+def wait_all(jobs, timeout=None, return_exceptions=False):
+    """
+    Wait all jobs and return their results in order of jobs.
+
+    If return_exceptions is True, BigQueryError of failed job is returned
+    in place of its result, otherwise the first error is raised.
+    """
+
+    jobs = list(jobs)
+    for job in as_completed(jobs, timeout):
+        pass
+
+    results = []
+    for job in jobs:
+        try:
+            results.append(job.result())
+        except BigQueryError as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
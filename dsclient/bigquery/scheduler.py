@@ -0,0 +1,267 @@
+from __future__ import print_function
+import time
+import random
+from collections import deque
+from concurrent.futures import TimeoutError
+from .. errors import error_reasons
+from . job import Job
+
+
+# reasons meaning project is over quota of concurrent jobs, start later.
+THROTTLE_REASONS = ["rateLimitExceeded", "resourcesExceeded"]
+# reasons of transient failure, insert same job again.
+RETRY_REASONS = ["backendError", "internalError"]
+
+
+class ScheduledJob(object):
+    """
+    Job accepted by JobScheduler, inserted when a running slot is free.
+
+    job is Job future of current attempt (None while waiting to start).
+    """
+
+    def __init__(self, scheduler, kind, start, name):
+
+        self._scheduler = scheduler
+        self.kind = kind
+        self.name = name
+        self._start = start
+        self.job = None
+        self.attempts = 0
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    def __repr__(self):
+
+        state = "DONE" if self._done else (self.job.state if self.job is not None else "WAITING")
+        return "<ScheduledJob {0} {1} {2}>".format(self.kind, self.name, state)
+
+    def done(self):
+
+        return self._done
+
+    def result(self, timeout=None):
+        """
+        Wait job (running scheduler) and return result, raise error of failed job.
+        """
+
+        if not self._done:
+            self._scheduler._run(lambda: self._done, timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+
+        if not self._done:
+            self._scheduler._run(lambda: self._done, timeout)
+        return self._exception
+
+    def _finish(self, result=None, exception=None):
+
+        self._done = True
+        self._result = result
+        self._exception = exception
+
+
+class JobScheduler(object):
+    """
+    Run many BigQuery jobs keeping at most max_running jobs at once.
+
+    Jobs are inserted when running slot is free, running jobs are polled
+    together by batched jobs.get. When jobs.insert or job fails with
+    rateLimitExceeded / resourcesExceeded, the job is queued again and
+    next inserts are delayed by exponential backoff. Jobs failed with
+    backendError are inserted again up to max_retries times.
+
+    Scheduler does not use background thread: it runs while caller waits
+    by as_completed(), wait_all() or ScheduledJob.result().
+
+    Parameters
+    ----------
+    client : dsclient.bigquery.Client
+    max_running : int
+        number of jobs running at once.
+    max_retries : int
+        insert count of the same job after throttled or backendError.
+    backoff : float
+        first delay (seconds) of backoff.
+    max_backoff : float
+        max delay (seconds) of backoff.
+    """
+
+    def __init__(self, client, max_running=10, max_retries=5, backoff=1.0, max_backoff=64.0):
+
+        self._client = client
+        self._max_running = max_running
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._delay = 0.0
+        self._next_start = 0.0
+        self._waiting = deque()
+        self._running = {}
+        self._finished = deque()
+
+    def __len__(self):
+
+        return len(self._waiting) + len(self._running) + len(self._finished)
+
+    def _add(self, kind, start, name):
+
+        scheduled = ScheduledJob(self, kind, start, name)
+        self._waiting.append(scheduled)
+        return scheduled
+
+    def submit_query(self, query, table_name, **kwargs):
+        """
+        Add query job writing result into table_name (see Client.query).
+        """
+
+        if table_name is None:
+            raise Exception("table_name is required to schedule query.")
+        start = lambda: self._client.query(query, table_name=table_name, block=False, **kwargs)
+        return self._add("query", start, table_name)
+
+    def submit_load(self, df, table_name, **kwargs):
+        """
+        Add load job of DataFrame or local file (see Client.load).
+        """
+
+        start = lambda: self._client.load(df, table_name, block=False, **kwargs)
+        return self._add("load", start, table_name)
+
+    def submit_extract(self, table_name, uri, **kwargs):
+        """
+        Add extract job of table into Cloud Storage (see Client.extract).
+        """
+
+        start = lambda: self._client.extract(table_name, uri, block=False, **kwargs)
+        return self._add("extract", start, table_name)
+
+    def submit_copy(self, source_table, table_name, **kwargs):
+        """
+        Add copy job of source_table into table_name (see Client.copy).
+        """
+
+        start = lambda: self._client.copy(source_table, table_name, block=False, **kwargs)
+        return self._add("copy", start, table_name)
+
+    def _throttle(self):
+
+        self._delay = min(max(self._delay * 2, self._backoff), self._max_backoff)
+        self._next_start = time.time() + self._delay * (0.5 + random.random() / 2)
+
+    def _relax(self):
+
+        self._delay = self._delay / 2 if self._delay > self._backoff else 0.0
+
+    def _failed(self, scheduled, exception):
+
+        reasons = error_reasons(exception)
+        throttled = any(reason in THROTTLE_REASONS for reason in reasons)
+        transient = all(reason in RETRY_REASONS for reason in reasons) and len(reasons) > 0
+        if (throttled or transient) and scheduled.attempts <= self._max_retries:
+            if throttled:
+                self._throttle()
+            scheduled.job = None
+            self._waiting.appendleft(scheduled)
+            return
+        scheduled._finish(exception=exception)
+        self._finished.append(scheduled)
+
+    def _start_jobs(self):
+
+        while self._waiting and len(self._running) < self._max_running \
+              and time.time() >= self._next_start:
+            scheduled = self._waiting.popleft()
+            scheduled.attempts += 1
+            try:
+                job = scheduled._start()
+            except Exception as e:
+                # any error (ex: serializing DataFrame of load) fails only this
+                # job, transient and throttled errors start it again later.
+                self._failed(scheduled, e)
+                continue
+            scheduled.job = job
+            self._running[job.job_id] = scheduled
+
+    def _poll(self):
+
+        if not self._running:
+            return 0
+        resources = self._client._get_jobs(list(self._running))
+        finished = 0
+        for job_id, scheduled in list(self._running.items()):
+            scheduled.job._update(resources.get(job_id))
+            if scheduled.job.state != "DONE":
+                continue
+            finished += 1
+            del self._running[job_id]
+            try:
+                result = scheduled.job.result()
+            except Exception as e:
+                # job error, or error of result_func (ex: get_table of extract).
+                self._failed(scheduled, e)
+                continue
+            self._relax()
+            scheduled._finish(result)
+            self._finished.append(scheduled)
+        return finished
+
+    def _step(self, interval):
+
+        finished = len(self._finished)
+        self._start_jobs()
+        self._poll()
+        if len(self._finished) > finished:
+            return Job.MIN_INTERVAL
+        wait = interval
+        if self._waiting and len(self._running) < self._max_running:
+            wait = min(wait, max(self._next_start - time.time(), 0))
+        time.sleep(wait)
+        return min(interval * Job.BACKOFF, Job.MAX_INTERVAL)
+
+    def _run(self, until, timeout=None):
+
+        start = time.time()
+        interval = Job.MIN_INTERVAL
+        while not until():
+            if not self._waiting and not self._running:
+                break
+            if timeout is not None and time.time() - start >= timeout:
+                raise TimeoutError("jobs are not finished in {0}s".format(timeout))
+            interval = self._step(interval)
+
+    def as_completed(self, timeout=None):
+        """
+        Run scheduler and iterate ScheduledJob in order of completion
+        (succeeded or failed after retries).
+        """
+
+        start = time.time()
+        interval = Job.MIN_INTERVAL
+        while self._waiting or self._running or self._finished:
+            while self._finished:
+                yield self._finished.popleft()
+            if not self._waiting and not self._running:
+                break
+            if timeout is not None and time.time() - start >= timeout:
+                raise TimeoutError("{0} jobs are not finished in {1}s".format(
+                    len(self._waiting) + len(self._running), timeout))
+            interval = self._step(interval)
+
+    def wait_all(self, timeout=None, return_exceptions=False):
+        """
+        Run scheduler until all jobs are finished and return ScheduledJob
+        list in order of completion. If return_exceptions is False,
+        the first error is raised after all jobs are finished.
+        """
+
+        finished = list(self.as_completed(timeout))
+        if not return_exceptions:
+            for scheduled in finished:
+                if scheduled.exception() is not None:
+                    raise scheduled.exception()
+        return finished
@@ -0,0 +1,68 @@
+import json
+import uuid
+
+
+# tabledata.insertAll accepts 10MB per request, 50000 rows at most.
+MAX_REQUEST_BYTES = 9 * 1024 * 1024
+MAX_REQUEST_ROWS = 10000
+
+# insertErrors reasons worth retrying. "stopped" rows were valid but not
+# inserted because other row in the same request was invalid.
+RETRYABLE_REASONS = ["stopped", "backendError", "internalError", "timeout", "rateLimitExceeded"]
+
+
+def json_rows(df):
+    """
+    Serialize rows of DataFrame into list of JSON object strings.
+
+    DataFrame.to_json encodes whole frame at once (NaN/NaT as null,
+    timestamps as ISO format), so no python object per cell is built.
+    """
+
+    if len(df) == 0:
+        return []
+    text = df.to_json(orient="records", lines=True, date_format="iso", date_unit="us",
+                      double_precision=15)
+    return text.rstrip("\n").split("\n")
+
+
+def make_insert_ids(size, prefix=None):
+
+    prefix = prefix or uuid.uuid4().hex
+    return ["{0}-{1}".format(prefix, i) for i in range(size)]
+
+
+def iter_batches(indices, rows, max_bytes=MAX_REQUEST_BYTES, max_rows=MAX_REQUEST_ROWS):
+    """
+    Group row indices into batches whose JSON payload is under max_bytes.
+    """
+
+    # {"insertId":"<32+>","json":} and separator.
+    overhead = 64
+    batch = []
+    batch_bytes = overhead
+    for index in indices:
+        row_bytes = len(rows[index]) + overhead
+        if batch and (batch_bytes + row_bytes > max_bytes or len(batch) >= max_rows):
+            yield batch
+            batch = []
+            batch_bytes = overhead
+        batch.append(index)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+
+def make_payload(batch, rows, insert_ids, skip_invalid_rows=False,
+                 ignore_unknown_values=False, template_suffix=None):
+    """
+    Build insertAll request body as JSON string from serialized rows.
+    """
+
+    head = {"kind": "bigquery#tableDataInsertAllRequest",
+            "skipInvalidRows": skip_invalid_rows,
+            "ignoreUnknownValues": ignore_unknown_values}
+    if template_suffix is not None:
+        head["templateSuffix"] = template_suffix
+    parts = ['{{"insertId":"{0}","json":{1}}}'.format(insert_ids[index], rows[index]) for index in batch]
+    return json.dumps(head)[:-1] + ',"rows":[' + ",".join(parts) + "]}"
@@ -0,0 +1,238 @@
+import pandas as pd
+from googleapiclient.http import MediaUpload
+
+
+SOURCE_FORMATS = ["CSV", "NEWLINE_DELIMITED_JSON", "AVRO", "PARQUET"]
+
+_EXTENSIONS = [(".csv", "CSV"), (".csv.gz", "CSV"),
+               (".json", "NEWLINE_DELIMITED_JSON"), (".json.gz", "NEWLINE_DELIMITED_JSON"),
+               (".ndjson", "NEWLINE_DELIMITED_JSON"), (".jsonl", "NEWLINE_DELIMITED_JSON"),
+               (".avro", "AVRO"), (".parquet", "PARQUET")]
+
+
+def infer_source_format(path):
+
+    lower = path.lower()
+    for ext, source_format in _EXTENSIONS:
+        if lower.endswith(ext):
+            return source_format
+    return "CSV"
+
+
+class _DrainBuffer(object):
+    """
+    Write-only file object whose written bytes are taken out by drain().
+
+    tell() returns total bytes written, so writers recording file offsets
+    (parquet footer) see one continuous file.
+    """
+
+    def __init__(self):
+
+        self._chunks = []
+        self._written = 0
+        self.closed = False
+
+    def write(self, data):
+
+        data = bytes(data)
+        self._chunks.append(data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+
+        return self._written
+
+    def flush(self):
+
+        pass
+
+    def close(self):
+
+        self.closed = True
+
+    def writable(self):
+
+        return True
+
+    def seekable(self):
+
+        return False
+
+    def drain(self):
+
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _encode(text):
+
+    return text if isinstance(text, bytes) else text.encode("utf-8")
+
+def _iter_chunks(df, chunk_rows):
+
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start+chunk_rows]
+
+def _records(df):
+
+    df = df.astype(object).where(pd.notnull(df), None)
+    return df.to_dict("records")
+
+def _avro_type(dtype):
+
+    name = str(dtype).lower()
+    if "datetime" in name:
+        avro_type = {"type": "long", "logicalType": "timestamp-micros"}
+    elif "float" in name:
+        avro_type = "double"
+    elif "int" in name:
+        avro_type = "long"
+    elif "bool" in name:
+        avro_type = "boolean"
+    else:
+        avro_type = "string"
+    return ["null", avro_type]
+
+def serialize_csv(df, chunk_rows):
+
+    for i, chunk in enumerate(_iter_chunks(df, chunk_rows)):
+        yield _encode(chunk.to_csv(index=False, header=(i == 0)))
+
+def serialize_ndjson(df, chunk_rows):
+
+    for chunk in _iter_chunks(df, chunk_rows):
+        text = chunk.to_json(orient="records", lines=True, date_format="iso", date_unit="us")
+        yield _encode(text if text.endswith("\n") else text + "\n")
+
+def serialize_avro(df, chunk_rows):
+
+    try:
+        import fastavro
+    except ImportError:
+        raise Exception("fastavro is required to load avro.")
+    schema = {"type": "record", "name": "Row",
+              "fields": [{"name": str(name), "type": _avro_type(df[name].dtype)} for name in df.columns]}
+    buf = _DrainBuffer()
+    writer = fastavro.write.Writer(buf, fastavro.parse_schema(schema))
+    for chunk in _iter_chunks(df, chunk_rows):
+        for record in _records(chunk):
+            writer.write(record)
+        writer.flush()
+        yield buf.drain()
+    writer.flush()
+    yield buf.drain()
+
+def serialize_parquet(df, chunk_rows):
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("pyarrow is required to load parquet.")
+    buf = _DrainBuffer()
+    arrow_schema = pyarrow.Schema.from_pandas(df, preserve_index=False)
+    writer = pyarrow.parquet.ParquetWriter(buf, arrow_schema,
+                                           coerce_timestamps="us",
+                                           allow_truncated_timestamps=True)
+    for chunk in _iter_chunks(df, chunk_rows):
+        table = pyarrow.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False)
+        writer.write_table(table)
+        yield buf.drain()
+    writer.close()
+    yield buf.drain()
+
+SERIALIZERS = {
+    "CSV": serialize_csv,
+    "NEWLINE_DELIMITED_JSON": serialize_ndjson,
+    "AVRO": serialize_avro,
+    "PARQUET": serialize_parquet,
+}
+
+
+class DataFrameUpload(MediaUpload):
+    """
+    Resumable media upload serializing DataFrame chunk by chunk.
+
+    Size is unknown to googleapiclient, which requests bytes chunk by chunk
+    by getbytes() and finishes upload on short read. Only bytes not yet
+    acknowledged by server are kept, so peak memory is about one upload
+    chunk plus one serialized row chunk.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+    source_format : str
+        CSV, NEWLINE_DELIMITED_JSON, AVRO or PARQUET.
+    chunk_rows : int
+        rows serialized at once.
+    chunksize : int
+        bytes of each upload request (multiple of 256KB).
+    """
+
+    def __init__(self, df, source_format="CSV", chunk_rows=100000, chunksize=8*1024*1024):
+
+        if source_format not in SERIALIZERS:
+            raise Exception("source format must be one of {0}".format(", ".join(SOURCE_FORMATS)))
+        self._df = df
+        self._source_format = source_format
+        self._chunk_rows = chunk_rows
+        self._chunksize = chunksize
+        # text formats can end with extra newline, so upload never ends on
+        # exact chunk boundary (which needs empty final request).
+        self._pad = b"\n" if source_format in ["CSV", "NEWLINE_DELIMITED_JSON"] else None
+        self._restart()
+
+    def _restart(self):
+
+        self._chunks = SERIALIZERS[self._source_format](self._df, self._chunk_rows)
+        self._buffer = bytearray()
+        self._offset = 0
+        self._exhausted = False
+
+    def _read(self):
+
+        try:
+            self._buffer.extend(next(self._chunks))
+            return True
+        except StopIteration:
+            self._exhausted = True
+            return False
+
+    def chunksize(self):
+
+        return self._chunksize
+
+    def mimetype(self):
+
+        return "application/octet-stream"
+
+    def size(self):
+
+        return None
+
+    def resumable(self):
+
+        return True
+
+    def has_stream(self):
+
+        return False
+
+    def getbytes(self, begin, length):
+
+        if begin < self._offset:
+            # acknowledged bytes are dropped, so upload sent again (ex: job
+            # inserted again on retry) serializes DataFrame again from first row.
+            self._restart()
+        while len(self._buffer) < begin - self._offset and not self._exhausted:
+            self._read()
+        del self._buffer[:begin - self._offset]
+        self._offset = begin
+
+        while len(self._buffer) <= length and not self._exhausted:
+            if not self._read() and len(self._buffer) == length and self._pad is not None:
+                self._buffer.extend(self._pad)
+        return bytes(self._buffer[:length])
@@ -0,0 +1,333 @@
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import pandas as pd
+from collections import OrderedDict
+
+logger = logging.getLogger("dsclient")
+
+_PARQUET = None
+
+
+def _parquet_available():
+
+    # checked on first use, importing pyarrow is slow.
+    global _PARQUET
+    if _PARQUET is None:
+        try:
+            import pyarrow
+            _PARQUET = True
+        except ImportError:
+            try:
+                import fastparquet
+                _PARQUET = True
+            except ImportError:
+                _PARQUET = False
+    return _PARQUET
+
+
+def normalize_query(query):
+
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class QueryCache(object):
+    """
+    On-disk cache of query results as pandas.DataFrame.
+
+    Entries are keyed by normalized query string and lastModifiedTime of
+    tables referenced by the query, so any change of source tables makes
+    a new key. Results are stored as Parquet (or pickle when neither
+    pyarrow nor fastparquet is installed) and least recently used entries
+    are evicted when total size exceeds max_bytes.
+
+    Parameters
+    ----------
+    path : str
+        cache directory. default is ~/.cache/dsclient/query.
+    max_bytes : int
+        size limit of cache directory.
+    """
+
+    def __init__(self, path=None, max_bytes=1024**3):
+
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".cache", "dsclient", "query")
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._path = path
+        self._max_bytes = max_bytes
+        self._ext = ".parquet" if _parquet_available() else ".pkl"
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def make_key(self, query, use_legacy, tables, kind="query", options=None):
+
+        source = {"kind": kind,
+                  "query": normalize_query(query),
+                  "legacy": bool(use_legacy),
+                  "tables": sorted(tables)}
+        if options:
+            source["options"] = options
+        source = json.dumps(source, sort_keys=True)
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+
+        return os.path.join(self._path, key + self._ext)
+
+    def _entries(self):
+
+        entries = []
+        for name in os.listdir(self._path):
+            if name.startswith(".tmp_") or not name.endswith(self._ext):
+                continue
+            path = os.path.join(self._path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        """
+        Return cached DataFrame of key, or None if it is not cached.
+        Unreadable (truncated or corrupt) entries are deleted.
+        """
+
+        path = self._entry_path(key)
+        try:
+            if self._ext == ".parquet":
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_pickle(path)
+        except Exception as e:
+            if os.path.exists(path):
+                logger.warning("deleting unreadable query cache entry %s: %r", path, e)
+                self._remove(path)
+            with self._lock:
+                self._misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self._hits += 1
+        return df
+
+    def put(self, key, df):
+        """
+        Save df as entry of key. Return False (and log warning) if df can not
+        be saved (ex: object column of mixed types), the result is not cached.
+        """
+
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(suffix=self._ext, dir=self._path, prefix=".tmp_")
+            os.close(fd)
+            if self._ext == ".parquet":
+                df.to_parquet(tmp_path)
+            else:
+                df.to_pickle(tmp_path)
+            os.rename(tmp_path, self._entry_path(key))
+        except Exception as e:
+            logger.warning("query result is not cached: %r", e)
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return False
+        self._evict()
+        return True
+
+    def _remove(self, path):
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+
+        entries = sorted(self._entries())
+        total = sum(entry[1] for entry in entries)
+        for mtime, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._evictions += 1
+
+    def clear(self):
+
+        for mtime, size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+
+        entries = self._entries()
+        with self._lock:
+            return {"hits": self._hits,
+                    "misses": self._misses,
+                    "evictions": self._evictions,
+                    "entries": len(entries),
+                    "bytes": sum(entry[1] for entry in entries),
+                    "max_bytes": self._max_bytes}
+
+
+class MetadataCache(object):
+    """
+    In-process cache of resource metadata (table, dataset, bucket).
+
+    Entries expire after ttl seconds and least recently used entries are
+    evicted over max_items. Missing resources (None of 404) are cached too.
+    Keys are tuples, so all entries under a key prefix (ex: tables of a
+    dataset) can be invalidated at once.
+
+    Parameters
+    ----------
+    ttl : float
+        seconds entries are valid.
+    max_items : int
+        size limit of cache.
+    """
+
+    def __init__(self, ttl=60, max_items=10000):
+
+        self._ttl = ttl
+        self._max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        """
+        Return (True, value) if key is cached and not expired, otherwise (False, None).
+        """
+
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and time.time() - entry[0] < self._ttl:
+                # move to end as most recently used.
+                del self._items[key]
+                self._items[key] = entry
+                self._hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._items[key]
+            self._misses += 1
+            return False, None
+
+    def put(self, key, value):
+
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (time.time(), value)
+            while len(self._items) > self._max_items:
+                self._items.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """
+        Remove key and all keys starting with key.
+        """
+
+        size = len(key)
+        with self._lock:
+            for cached in [cached for cached in self._items if cached[:size] == key]:
+                del self._items[cached]
+
+    def clear(self):
+
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+
+        with self._lock:
+            return {"hits": self._hits,
+                    "misses": self._misses,
+                    "evictions": self._evictions,
+                    "entries": len(self._items),
+                    "max_items": self._max_items,
+                    "ttl": self._ttl}
+
+
+class _Flight(object):
+
+    def __init__(self):
+
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Share one call among threads asking for the same key at the same time.
+
+    The first caller of key runs the call, callers arriving while it is in
+    flight wait and get the same result (or error). Nothing is kept after
+    the call finishes, so later callers run a new call. Shared results are
+    the same object, callers must not modify them.
+    """
+
+    def __init__(self):
+
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._shared = 0
+
+    def do(self, key, func):
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._calls += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+        return flight.value
+
+    def stats(self):
+
+        with self._lock:
+            return {"calls": self._calls,
+                    "shared": self._shared,
+                    "in_flight": len(self._flights)}
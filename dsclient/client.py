@@ -1,19 +1,267 @@
 import os
 import time
+import shutil
+import logging
+import tempfile
+import pandas as pd
 from . import bigquery
 from . import storage
 from . import datastore
 from . import compute
 from . import schema
 
+logger = logging.getLogger("dsclient")
+
+# extract format: (destinationFormat, compression, file extension)
+EXTRACT_FORMATS = {
+    "csv":          ("CSV", None, ".csv"),
+    "csv.gz":       ("CSV", "GZIP", ".csv.gz"),
+    "json":         ("NEWLINE_DELIMITED_JSON", None, ".json"),
+    "json.gz":      ("NEWLINE_DELIMITED_JSON", "GZIP", ".json.gz"),
+    "avro":         ("AVRO", None, ".avro"),
+    "avro.deflate": ("AVRO", "DEFLATE", ".avro"),
+    "avro.snappy":  ("AVRO", "SNAPPY", ".avro"),
+}
+
 class Client(bigquery.Client, storage.Client, datastore.Client, compute.Client):
 
-    def __init__(self, project_id, keyfile_path=None, account_email=None):
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=10):
+        """
+        Parameters
+        ----------
+        project_id : str
+        keyfile_path : str
+            service account key file (.json or .p12). application default
+            credentials are used if None.
+        account_email : str
+            service account email (required for .p12 key file).
+        pool_size : int
+            max connections of each service, shared by all threads using this client.
+        """
+
+        super(Client, self).__init__(project_id, keyfile_path, account_email, pool_size)
+
+    def lquery(self, query, dataset_id=None, bucket=None, use_legacy=True, use_cache=True,
+               workers=8, processes=1, extract_format="csv", categorical=None, nullable=False):
+        """
+        Run query and read large result through sharded extract to Cloud Storage.
+
+        Parameters
+        ----------
+        query : str
+            query string.
+        dataset_id : str
+            dataset of temporary result table. if None, temporary dataset is created.
+        bucket : str
+            bucket of extracted shards. if None, temporary bucket is created.
+        workers : int
+            number of threads downloading shards.
+        processes : int
+            number of processes parsing shards (1: parse in download threads,
+            None: cpu count). see read_csv for main module guard.
+        extract_format : str
+            csv, csv.gz, json, json.gz, avro, avro.deflate or avro.snappy.
+            avro requires fastavro and its values are read without string conversion.
+        categorical : bool, list or float
+            STRING columns read as pandas.Categorical (see query).
+        nullable : bool
+            if True, INTEGER and BOOLEAN columns are Int64 and boolean (see query).
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        extract_read = lambda table_name, gs_uri: self._extract_read(table_name, gs_uri, workers,
+                                                                     processes, extract_format,
+                                                                     categorical, nullable)
+        read = lambda: self._run_lquery(query, extract_read, dataset_id, bucket,
+                                        use_legacy, extract_format)
+        return self._read_with_query_cache(read, query, use_legacy, use_cache, kind="lquery",
+                                           options=self._result_options(categorical, nullable,
+                                                                       extract_format=extract_format))
+
+    def _check_extract_format(self, extract_format):
+
+        if extract_format not in EXTRACT_FORMATS:
+            raise Exception("extract format must be one of {0}".format(", ".join(sorted(EXTRACT_FORMATS))))
+        if EXTRACT_FORMATS[extract_format][0] == "AVRO":
+            storage.client._import_fastavro()
+
+    def _extract_uri(self, bucket, name, extract_format):
+
+        return "gs://{0}/{1}-*{2}".format(bucket, name, EXTRACT_FORMATS[extract_format][2])
+
+    def _extract_read(self, table_name, gs_uri, workers=8, processes=1, extract_format="csv",
+                      categorical=None, nullable=False):
+
+        destination_format, compression, ext = EXTRACT_FORMATS[extract_format]
+        table = self.extract(table_name, gs_uri,
+                             destination_format=destination_format, compression=compression)
+        s = schema.Schema(table["schema"], categorical, nullable)
+
+        # avro values are typed already, but they are converted by the same
+        # plan, so that dtypes (categorical, nullable) do not depend on format.
+        if destination_format == "CSV":
+            dtype = s.get_object_dtype()
+            df = self.read_csv(gs_uri, dtype=dtype, workers=workers, processes=processes)
+        elif destination_format == "AVRO":
+            df = self.read_avro(gs_uri, workers=workers, processes=processes)
+        else:
+            df = self.read_ndjson(gs_uri, workers=workers, processes=processes)
+        if destination_format != "CSV":
+            df = df.reindex(columns=s.get_columns())
+        df = s.update_dtype(df)
+        return df
+
+    def _extract_spill(self, table_name, gs_uri, directory, workers=8, extract_format="csv",
+                       categorical=None, nullable=False):
+
+        destination_format, compression, ext = EXTRACT_FORMATS[extract_format]
+        table = self.extract(table_name, gs_uri,
+                             destination_format=destination_format, compression=compression)
+        s = schema.Schema(table["schema"], categorical, nullable)
+        paths = self.download_files(gs_uri, directory, workers=workers)
+        return s, paths
+
+    def _iter_local_frames(self, path, s, chunk_rows, extract_format="csv"):
+
+        if os.path.getsize(path) == 0:
+            return
+
+        destination_format, compression, ext = EXTRACT_FORMATS[extract_format]
+        if destination_format == "AVRO":
+            with open(path, "rb") as fileobj:
+                for df in storage.client._iter_avro_frames(fileobj, chunk_rows):
+                    yield s.update_dtype(df.reindex(columns=s.get_columns()))
+            return
+
+        compression = "gzip" if compression == "GZIP" else None
+        if destination_format == "CSV":
+            reader = pd.read_csv(path, dtype=s.get_object_dtype(), chunksize=chunk_rows,
+                                 compression=compression, memory_map=compression is None)
+        else:
+            reader = pd.read_json(path, lines=True, dtype=False, chunksize=chunk_rows,
+                                  compression=compression)
+        for df in reader:
+            if len(df) == 0:
+                continue
+            if destination_format != "CSV":
+                df = df.reindex(columns=s.get_columns())
+            yield s.update_dtype(df)
+
+    def _iter_spilled(self, run, chunk_rows, extract_format="csv", workers=8, scratch_dir=None,
+                      categorical=None, nullable=False):
+
+        # shards are downloaded to local scratch directory first, so temporary
+        # table and objects are deleted before chunks are parsed from local disk.
+        self._check_extract_format(extract_format)
+        directory = tempfile.mkdtemp(prefix="dsclient_", dir=scratch_dir)
+        try:
+            spill = lambda table_name, gs_uri: self._extract_spill(table_name, gs_uri, directory,
+                                                                   workers, extract_format,
+                                                                   categorical, nullable)
+            s, paths = run(spill)
+            for path in paths:
+                for df in self._iter_local_frames(path, s, chunk_rows, extract_format):
+                    yield s, df
+                os.remove(path)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def lquery_iter(self, query, chunk_rows=1000000, dataset_id=None, bucket=None,
+                    use_legacy=True, workers=8, extract_format="csv", scratch_dir=None,
+                    categorical=None, nullable=False):
+        """
+        Run query and iterate large result as pandas.DataFrame chunks.
+
+        Result is extracted to Cloud Storage, downloaded to local scratch
+        files and parsed chunk by chunk (plain csv is memory mapped), so
+        result larger than memory can be processed.
 
-        super(Client, self).__init__(project_id, keyfile_path, account_email)
+        Parameters
+        ----------
+        chunk_rows : int
+            max number of rows of each chunk.
+        scratch_dir : str
+            directory of local scratch files. default is system temp directory.
+        (see lquery for other parameters.)
 
-    def lquery(self, query, dataset_id=None, bucket=None):
+        Yields
+        ------
+        pandas.DataFrame
+            chunk of query result, typed according to result schema.
+            categories of categorical columns may differ by chunk.
+        """
 
+        run = lambda read: self._run_lquery(query, read, dataset_id, bucket,
+                                            use_legacy, extract_format)
+        for s, df in self._iter_spilled(run, chunk_rows, extract_format, workers, scratch_dir,
+                                        categorical, nullable):
+            yield df
+
+    def extract_read_iter(self, table_name, chunk_rows=1000000, bucket=None,
+                          workers=8, extract_format="csv", scratch_dir=None):
+        """
+        Iterate table as pandas.DataFrame chunks through local scratch files.
+
+        See lquery_iter for parameters.
+        """
+
+        run = lambda read: self._run_extract(table_name, read, bucket, extract_format)
+        for s, df in self._iter_spilled(run, chunk_rows, extract_format, workers, scratch_dir):
+            yield df
+
+    def lquery_to_parquet(self, query, path, chunk_rows=1000000, dataset_id=None, bucket=None,
+                          use_legacy=True, workers=8, extract_format="csv", scratch_dir=None):
+        """
+        Run query and write large result to local Parquet file (requires pyarrow).
+
+        Result is written chunk by chunk, so it can be larger than memory.
+        The file can be opened lazily (ex: pyarrow.parquet.ParquetFile, or
+        pandas.read_parquet with columns).
+
+        Returns
+        -------
+        str
+            path of Parquet file.
+        """
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception("pyarrow is required to write parquet files.")
+
+        arrow_types = {"integer": pyarrow.int64(), "float": pyarrow.float64(),
+                       "boolean": pyarrow.bool_(), "string": pyarrow.string()}
+
+        run = lambda read: self._run_lquery(query, read, dataset_id, bucket,
+                                            use_legacy, extract_format)
+        writer = None
+        try:
+            for s, df in self._iter_spilled(run, chunk_rows, extract_format, workers, scratch_dir):
+                if writer is None:
+                    # null in integer/boolean column changes pandas dtype by chunk,
+                    # so column types are fixed by BigQuery schema.
+                    types = s.get_types()
+                    inferred = pyarrow.Schema.from_pandas(df, preserve_index=False)
+                    arrow_schema = pyarrow.schema([
+                        (field.name, arrow_types.get(types.get(field.name), field.type))
+                        for field in inferred])
+                    writer = pyarrow.parquet.ParquetWriter(path, arrow_schema)
+                table = pyarrow.Table.from_pandas(df, schema=arrow_schema, preserve_index=False)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return path
+
+    def _run_lquery(self, query, read, dataset_id=None, bucket=None, use_legacy=True,
+                    extract_format="csv"):
+
+        self._check_extract_format(extract_format)
         table_id = "tmp_{0}_{1}_{2}".format(os.uname()[1].replace("-","_"), os.getpid(), int(time.time()))
 
         if dataset_id is None:
@@ -21,53 +269,65 @@ class Client(bigquery.Client, storage.Client, datastore.Client, compute.Client):
             self.create_dataset(dataset_id=dataset_id, expiration_ms=3600000)
         table_name = "{0}.{1}".format(dataset_id, table_id)
         try:
-            self.query(query, table_name=table_name)
+            self.query(query, table_name=table_name, use_legacy=use_legacy)
         except:
             if dataset_id == table_id:
-                self.delete_dataset(dataset_id)
+                self._cleanup(self.delete_dataset, dataset_id, True)
             raise
 
         #expirationTime = int(time.time()) * 1000 + 360000
-        if bucket is None:
-            bucket = table_id
-            self.create_bucket(bucket)
-        gs_uri = "gs://{0}/{1}.csv".format(bucket, table_id)
+        created_bucket = False
+        gs_uri = None
         try:
-            table = self.extract(table_name, gs_uri)
-            s = schema.Schema(table["schema"])
-            dtype = s.get_object_dtype()
-            df = self.read_csv(gs_uri, dtype=dtype)
-            df = s.update_dtype(df)
+            if bucket is None:
+                bucket = table_id
+                self.create_bucket(bucket)
+                created_bucket = True
+            gs_uri = self._extract_uri(bucket, table_id, extract_format)
+            result = read(table_name, gs_uri)
         finally:
             if dataset_id == table_id:
-                self.delete_dataset(dataset_id)
+                self._cleanup(self.delete_dataset, dataset_id, True)
             else:
-                self.delete_table(table_name)
-            if bucket == table_id:
-                self.delete_bucket(bucket)
-            else:
-                self.delete_object(gs_uri)
+                self._cleanup(self.delete_table, table_name)
+            if gs_uri is not None:
+                self._cleanup(self.delete_object, gs_uri)
+            if created_bucket:
+                self._cleanup(self.delete_bucket, bucket)
 
-        return df
+        return result
+
+    def _cleanup(self, delete, *args):
 
-    def extract_read_csv(self, table_name, bucket=None):
+        # each temporary resource is deleted even if others fail, and failures
+        # are logged so that they do not replace error of query or extract.
+        try:
+            delete(*args)
+        except Exception as e:
+            logger.warning("failed to delete temporary resource by %s%r: %r",
+                           delete.__name__, args, e)
+
+    def extract_read_csv(self, table_name, bucket=None, workers=8, processes=1,
+                         extract_format="csv"):
+
+        read = lambda table_name, gs_uri: self._extract_read(table_name, gs_uri, workers,
+                                                             processes, extract_format)
+        return self._run_extract(table_name, read, bucket, extract_format)
+
+    def _run_extract(self, table_name, read, bucket=None, extract_format="csv"):
 
+        self._check_extract_format(extract_format)
         tmp_bucket = "tmp_{0}_{1}_{2}".format(os.uname()[1].replace("-","_"), os.getpid(), int(time.time()))
 
         if bucket is None:
             bucket = tmp_bucket
             self.create_bucket(bucket)
-        gs_uri = "gs://{0}/{1}.csv".format(bucket, tmp_bucket)
+        gs_uri = self._extract_uri(bucket, tmp_bucket, extract_format)
         try:
-            table = self.extract(table_name, gs_uri)
-            s = schema.Schema(table["schema"])
-            dtype = s.get_object_dtype()
-            df = self.read_csv(gs_uri, dtype=dtype)
-            df = s.update_dtype(df)
+            result = read(table_name, gs_uri)
         finally:
+            self._cleanup(self.delete_object, gs_uri)
             if bucket == tmp_bucket:
-                self.delete_bucket(bucket)
-            else:
-                self.delete_object(gs_uri)
+                self._cleanup(self.delete_bucket, bucket)
 
-        return df
+        return result
@@ -2,9 +2,7 @@ from __future__ import print_function
 import os
 import sys
 import time
-import requests
 import pandas as pd
-from googleapiclient.http import BatchHttpRequest
 from googleapiclient.errors import HttpError
 from .. base import ClientBase
 
@@ -17,27 +15,31 @@ class Client(ClientBase):
 
     __API_URI = "https://www.googleapis.com/{0}/{1}/".format(__API_NAME, __API_VERSION)
 
-    def __init__(self, project_id, keyfile_path=None, account_email=None):
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=10):
 
-        super(Client, self).__init__(project_id, keyfile_path, account_email)
-        self._cecredentials, self._ceservice = super(Client, self)._build_service(Client.__API_NAME,
-                                                                                  Client.__API_VERSION,
-                                                                                  Client.__ENDPOINT_GCE)
+        super(Client, self).__init__(project_id, keyfile_path, account_email, pool_size)
+
+    @property
+    def _ceservice(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GCE)[1]
+
+    @property
+    def _cecredentials(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GCE)[0]
 
     def get_ceservice(self):
 
         return self._ceservice
 
-    def _try_batch_execute(self, batch, retry=3):
+    def _try_batch_execute(self, reqs, retry=None):
 
-        while retry > 0:
-            try:
-                batch.execute()
-                return
-            except TypeError:
-                from httplib2 import Http
-                self._cecredentials.refresh(Http())
-                retry -= 1
+        # only items failed by retryable error (429, 5xx) are sent again,
+        # so succeeded items of the batch (ex: insert) are not repeated.
+        results = self._batch_execute(self._ceservice, reqs, retry=retry)
+        for resp, exception in results:
+            Client._check_exception(None, resp, exception)
 
     @staticmethod
     def _check_exception(request_id, response, exception):
@@ -56,6 +58,12 @@ class Client(ClientBase):
 
     def get_current_instance_metadata(self, param):
 
+        return self._shared_get(("metadata", param), lambda: self._get_metadata(param))
+
+    def _get_metadata(self, param):
+
+        import requests
+
         gh_url = 'http://metadata.google.internal/computeMetadata/v1/instance/{0}'.format(param)
         resp = requests.get(gh_url, headers={"Metadata-Flavor": "Google"})
         return resp.text
@@ -165,7 +173,7 @@ class Client(ClientBase):
                 raise Exception(exception)
 
         #batch = BatchHttpRequest()
-        batch = self._ceservice.new_batch_http_request(callback=Client._check_exception)
+        reqs = []
         instances = self._ceservice.instances()
 
         if disks is not None:
@@ -178,16 +186,16 @@ class Client(ClientBase):
                 body.update({"name": name})
                 body["disks"][0]["source"] = "zones/{0}/disks/{1}".format(zone, disk)
                 req = instances.insert(project=self._project_id, zone=zone, body=body)
-                batch.add(req)
+                reqs.append(req)
         elif image is not None:
             init_config["disks"][0]["initializeParams"] = {'diskSizeGb': sizegb, 'sourceImage': image}
             for name in names:
                 body = init_config.copy()
                 body.update({"name": name})
                 req = instances.insert(project=self._project_id, zone=zone, body=body)
-                batch.add(req)
+                reqs.append(req)
 
-        self._try_batch_execute(batch)
+        self._try_batch_execute(reqs)
 
         check_names  = list(names)
         failed_names = []
@@ -195,7 +203,7 @@ class Client(ClientBase):
         wait_second = 0
         while check_names:
             for check_name in check_names:
-                resp = instances.get(project=self._project_id, zone=zone, instance=check_name).execute()
+                resp = self._try_execute(instances.get(project=self._project_id, zone=zone, instance=check_name))
                 if resp["status"] in ["RUNNING", "SUSPENDED", "TERMINATED"]:
                     check_names.remove(check_name)
                     if resp["status"] == "SUSPENDED":
@@ -213,41 +221,41 @@ class Client(ClientBase):
         if isinstance(names, str):
             names = [names]
 
-        batch = self._ceservice.new_batch_http_request(callback=Client._check_exception)
+        reqs = []
         instances = self._ceservice.instances()
         for name in names:
             req = instances.delete(project=self._project_id,
                                    zone=zone, instance=name)
-            batch.add(req)
-        self._try_batch_execute(batch)
+            reqs.append(req)
+        self._try_batch_execute(reqs)
 
     def stop_instance(self, zone, names):
 
         if isinstance(names, str):
             names = [names]
 
-        batch = self._ceservice.new_batch_http_request(callback=Client._check_exception)
+        reqs = []
         instances = self._ceservice.instances()
         for name in names:
             req = instances.stop(project=self._project_id,
                                  zone=zone,
                                  instance=name)
-            batch.add(req)
-        self._try_batch_execute(batch)
+            reqs.append(req)
+        self._try_batch_execute(reqs)
 
     def start_instance(self, zone, names):
 
         if isinstance(names, str):
             names = [names]
 
-        batch = self._ceservice.new_batch_http_request(callback=Client._check_exception)
+        reqs = []
         instances = self._ceservice.instances()
         for name in names:
             req = instances.insert(project=self._project_id,
                                    zone=zone,
                                    instance=name)
-            batch.add(req)
-        self._try_batch_execute(batch)
+            reqs.append(req)
+        self._try_batch_execute(reqs)
 
     def create_disk(self, zone, names, snapshot=None, image=None):
 
@@ -273,14 +281,14 @@ class Client(ClientBase):
             if exception is not None:
                 raise Exception(exception)
 
-        batch = self._ceservice.new_batch_http_request(callback=Client._check_exception)
+        reqs = []
         disks = self._ceservice.disks()
         for name in names:
             body = config.copy()
             body.update({"name": name})
             job = disks.insert(project=self._project_id, zone=zone, body=body)
-            batch.add(job)
-        self._try_batch_execute(batch)
+            reqs.append(job)
+        self._try_batch_execute(reqs)
 
         check_names = list(names)
         nall = len(check_names)
@@ -288,7 +296,7 @@ class Client(ClientBase):
         wait_second = 0
         while check_names:
             for check_name in check_names:
-                resp = disks.get(project=self._project_id, zone=zone, disk=check_name).execute()
+                resp = self._try_execute(disks.get(project=self._project_id, zone=zone, disk=check_name))
                 if resp["status"] in ["DONE","FAILED","READY"]:
                     check_names.remove(check_name)
                     if resp["status"] == "FAILED":
@@ -334,7 +342,7 @@ class Client(ClientBase):
             print("\r[CREATE IMAGE] {0} (waiting second: {1}s, {2}%)".format(status, wait_second, resp["progress"]), end="")
             time.sleep(5)
             wait_second += 5
-            resp = images.get(project=self._project_id, image=name).execute()
+            resp = self._try_execute(images.get(project=self._project_id, image=name))
             status = resp["status"]
         print("\r[CREATE IMAGE] DONE (waited second: {0}s)\n".format(wait_second))
         if 'error' in resp:
@@ -366,7 +374,7 @@ class Client(ClientBase):
             print("\r[CREATE SNAPSHOT] {0} (waiting {1}s)".format(status, wait_second), end="")
             time.sleep(1)
             wait_second += 1
-            resp = snapshots.get(project=self._project_id, snapshot=name).execute()
+            resp = self._try_execute(snapshots.get(project=self._project_id, snapshot=name))
             status = resp["status"]
         print("\r[CREATE SNAPSHOT] {0} (waited {1}s)\n".format(status, wait_second), end="")
         if status == "FAILED":
@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import hashlib
+import calendar
+import tempfile
+import threading
+
+
+# one token of this scope is used by BigQuery, Storage, Datastore and Compute.
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+# token is refreshed in background when it expires within REFRESH_MARGIN seconds.
+REFRESH_MARGIN = 300
+# token is refreshed before use when it expires within EXPIRY_MARGIN seconds.
+EXPIRY_MARGIN = 30
+# lifetime assumed when credentials do not tell expiry.
+DEFAULT_LIFETIME = 3600
+
+
+def default_cache_dir():
+
+    return os.path.join(os.path.expanduser("~"), ".cache", "dsclient", "token")
+
+
+def _open_private(path, flags):
+
+    # created with mode 0600 (not umask), token must not be readable by others.
+    fd = os.open(path, flags, 0o600)
+    os.chmod(path, 0o600)
+    return fd
+
+
+class _FileLock(object):
+    """
+    Advisory lock between processes (no-op where fcntl is not available).
+    """
+
+    def __init__(self, path):
+
+        self._path = path
+        self._file = None
+
+    def __enter__(self):
+
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        try:
+            fd = _open_private(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+            self._file = os.fdopen(fd, "a")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except (IOError, OSError):
+            self._close()
+        return self
+
+    def __exit__(self, *args):
+
+        self._close()
+
+    def _close(self):
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TokenCache(object):
+    """
+    Access tokens saved on disk, shared by processes of the same user.
+
+    Files are written atomically with mode 0600 into directory (mode 0700),
+    one file per credential identity (hash of key file, account and scopes).
+    Anyone who can read the files can use the tokens until they expire.
+    """
+
+    def __init__(self, directory=None):
+
+        self._directory = os.path.expanduser(directory or default_cache_dir())
+
+    def _path(self, key):
+
+        return os.path.join(self._directory, key + ".json")
+
+    def lock(self, key):
+
+        self._makedirs()
+        return _FileLock(self._path(key) + ".lock")
+
+    def _makedirs(self):
+
+        if not os.path.isdir(self._directory):
+            try:
+                os.makedirs(self._directory, 0o700)
+                os.chmod(self._directory, 0o700)
+            except OSError:
+                pass
+
+    def get(self, key):
+        """
+        Return (access_token, expiry epoch seconds) or (None, None).
+        """
+
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            return entry["access_token"], float(entry["expiry"])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def put(self, key, access_token, expiry):
+
+        self._makedirs()
+        try:
+            # mkstemp creates file with mode 0600.
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix=".tmp_")
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"access_token": access_token, "expiry": expiry}, f)
+            os.rename(tmp_path, self._path(key))
+        except (IOError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class CredentialManager(object):
+    """
+    Credentials shared by all services of a Client, refreshing token once
+    for all threads.
+
+    Requests take the current token without lock. When it expires within
+    refresh_margin seconds, one background thread refreshes it while other
+    threads keep using the still valid token. Only when token is missing
+    or (nearly) expired callers wait, and the first of them refreshes while
+    the others wait for its result instead of refreshing again.
+
+    Refreshed tokens are saved into token_cache (if given), so new
+    processes with the same key file skip the token request while it is
+    valid.
+
+    It has the interface of oauth2client credentials used by
+    googleapiclient (authorize, apply, refresh, access_token).
+
+    Parameters
+    ----------
+    credentials : oauth2client.client.Credentials
+    key : str
+        identity of credentials in token_cache.
+    token_cache : TokenCache
+        None to keep token only in memory.
+    refresh_margin : float
+        seconds before expiry background refresh starts.
+    """
+
+    def __init__(self, credentials, key, token_cache=None, refresh_margin=REFRESH_MARGIN):
+
+        self.credentials = credentials
+        self._key = key
+        self._token_cache = token_cache
+        self._refresh_margin = refresh_margin
+        self._token = None
+        self._expiry = 0.0
+        self._cond = threading.Condition()
+        self._refreshing = False
+        self._refresh_error = None
+        self.refresh_count = 0
+
+    @staticmethod
+    def make_key(*parts):
+
+        return hashlib.sha1("\n".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    @property
+    def access_token(self):
+
+        return self._token
+
+    @property
+    def access_token_expired(self):
+
+        return self._token is None or time.time() >= self._expiry - EXPIRY_MARGIN
+
+    def get_token(self):
+        """
+        Return valid access token, refreshing it if needed.
+        """
+
+        token, expiry = self._token, self._expiry
+        now = time.time()
+        if token is not None and now < expiry - EXPIRY_MARGIN:
+            if now >= expiry - self._refresh_margin:
+                self._refresh_async()
+            return token
+        return self._refresh_sync(token)
+
+    def invalidate(self, token):
+        """
+        Mark token rejected by server (401), next get_token refreshes it.
+        """
+
+        with self._cond:
+            if self._token == token:
+                self._expiry = 0.0
+
+    def _begin_refresh(self):
+
+        # caller holds self._cond
+        if self._refreshing:
+            return False
+        self._refreshing = True
+        self._refresh_error = None
+        return True
+
+    def _refresh_async(self):
+
+        with self._cond:
+            if not self._begin_refresh():
+                return
+        thread = threading.Thread(target=self._run_refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _refresh_sync(self, stale):
+
+        with self._cond:
+            if self._token != stale and not self.access_token_expired:
+                return self._token
+            owner = self._begin_refresh()
+        if owner:
+            self._run_refresh()
+        with self._cond:
+            while self._refreshing:
+                self._cond.wait()
+            if self.access_token_expired:
+                raise self._refresh_error or Exception("Failed to refresh access token.")
+            return self._token
+
+    def _run_refresh(self):
+
+        error = None
+        try:
+            token, expiry = self._fetch()
+        except Exception as e:
+            error = e
+        with self._cond:
+            if error is None:
+                self._token, self._expiry = token, expiry
+            self._refresh_error = error
+            self._refreshing = False
+            self._cond.notify_all()
+
+    def _fetch(self):
+
+        if self._token_cache is None:
+            return self._request_token()
+        with self._token_cache.lock(self._key):
+            # another process may have refreshed while waiting the lock.
+            token, expiry = self._token_cache.get(self._key)
+            if token is not None and token != self._token and \
+               time.time() < expiry - self._refresh_margin:
+                return token, expiry
+            token, expiry = self._request_token()
+            self._token_cache.put(self._key, token, expiry)
+        return token, expiry
+
+    def _request_token(self):
+
+        from googleapiclient.http import build_http
+
+        self.credentials.refresh(build_http())
+        self.refresh_count += 1
+        token_expiry = getattr(self.credentials, "token_expiry", None)
+        if token_expiry is None:
+            expiry = time.time() + DEFAULT_LIFETIME
+        else:
+            expiry = float(calendar.timegm(token_expiry.timetuple()))
+        return self.credentials.access_token, expiry
+
+    def load_cached(self):
+        """
+        Use token of token_cache if it is valid (no request).
+        """
+
+        if self._token_cache is None:
+            return
+        token, expiry = self._token_cache.get(self._key)
+        if token is not None and time.time() < expiry - EXPIRY_MARGIN:
+            with self._cond:
+                if self._token is None or expiry > self._expiry:
+                    self._token, self._expiry = token, expiry
+
+    def apply(self, headers):
+
+        headers["Authorization"] = "Bearer " + self.get_token()
+
+    def refresh(self, http=None):
+
+        self._refresh_sync(self._token)
+
+    def authorize(self, http):
+        """
+        Make http add Authorization header of shared token to requests,
+        and retry once with refreshed token on 401.
+        """
+
+        request = http.request
+        manager = self
+
+        def authorized_request(uri, method="GET", body=None, headers=None, *args, **kwargs):
+            headers = dict(headers or {})
+            headers.pop("authorization", None)
+            token = manager.get_token()
+            headers["Authorization"] = "Bearer " + token
+            resp, content = request(uri, method, body, headers, *args, **kwargs)
+            if resp.status == 401:
+                manager.invalidate(token)
+                headers["Authorization"] = "Bearer " + manager.get_token()
+                if hasattr(body, "seek"):
+                    body.seek(0)
+                resp, content = request(uri, method, body, headers, *args, **kwargs)
+            return resp, content
+
+        http.request = authorized_request
+        http.credentials = self
+        return http
+
+
+class StaticCredentials(object):
+    """
+    Credentials of fixed access token that never expires
+    (ex: local stand-in server or token obtained elsewhere).
+    """
+
+    access_token_expired = False
+
+    def __init__(self, token="dummy"):
+
+        self.access_token = token
+
+    def get_token(self):
+
+        return self.access_token
+
+    def invalidate(self, token):
+
+        pass
+
+    def apply(self, headers):
+
+        headers["Authorization"] = "Bearer " + self.access_token
+
+    def refresh(self, http=None):
+
+        pass
+
+    def authorize(self, http):
+
+        request = http.request
+
+        def authorized_request(uri, method="GET", body=None, headers=None, *args, **kwargs):
+            headers = dict(headers or {})
+            self.apply(headers)
+            return request(uri, method, body, headers, *args, **kwargs)
+
+        http.request = authorized_request
+        http.credentials = self
+        return http
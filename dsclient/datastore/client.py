@@ -3,139 +3,161 @@ import pandas as pd
 from .. base import ClientBase
 
 
-class Client(ClientBase):
+# response decoding is shared with dsclient.aio.AsyncClient.
 
-    __ENDPOINT_GDS = "https://www.googleapis.com/auth/datastore"
-    __API_NAME = "datastore"
-    __API_VERSION = "v1"
+def _gql_body(query):
 
-    def __init__(self, project_id, keyfile_path=None, account_email=None):
+    return {
+        "gqlQuery": {
+            "queryString": query,
+            "allowLiterals": True
+        }
+    }
+
+def _extract_cols_value(k, v):
+    if "stringValue" in v:
+        return (k, "s", v["stringValue"])
+    elif "integerValue" in v:
+        return (k, "i", v["integerValue"])
+    elif "doubleValue" in v:
+        return (k, "f", v["doubleValue"])
+    elif "booleanValue" in v:
+        return (k, "b", v["booleanValue"])
+    elif "timestampValue" in v:
+        return (k, "d", v["timestampValue"])
+    elif "nullValue" in v:
+        return (k, "n", None)
+    elif "keyValue" in v:
+        keypath = v["keyValue"]["path"][0]
+        value = keypath["name"] if keypath["id"] is None else keypath["id"]
+        dtype = "s" if keypath["id"] is None else "i"
+        return (k, dtype, value)
+    else:
+        return (k, "z", None)
+
+def _judge_type(t):
+    dtype = object
+
+    if "z" in t:
+        return (object, "z")
+    np.delete(t, np.where(t=="n"))
+    if len(t) == 0:
+        return (object, "s")
+    if len(t) == 1:
+        if "i" in t:
+            return (np.int64, "i")
+        elif "f" in t:
+            return (np.float64, "f")
+        elif "b" in t:
+            return (np.bool_, "b")
+        elif "d" in t:
+            return (object, "d")
+        else:
+            return (object, "s")
 
-        super(Client, self).__init__(project_id, keyfile_path, account_email)
-        self._dscredentials, self._dsservice = super(Client, self)._build_service(Client.__API_NAME,
-                                                                                  Client.__API_VERSION,
-                                                                                  Client.__ENDPOINT_GDS)
-    def get_dsservice(self):
+    if len(t) == 2 and "i" in t and "f" in t:
+        return (np.float64, "f")
 
-        return self._dsservice
+    return (object, "s")
 
-    def gql(self, query):
+def _convert_dataframe(entities, calc_dtype=False):
 
-        projects = self._dsservice.projects()
-        body = {
-            "gqlQuery": {
-                "queryString": query,
-                "allowLiterals": True
+    rows = [[_extract_cols_value(k, v) for k, v in entity["entity"]["properties"].items()] for entity in entities]
+    #vals = [[col[2] for col in row] for row in rows]
+    vals = [[col[2] for col in row] for row in rows]
+    cols = entities[0]["entity"]["properties"].keys()
+    df = pd.DataFrame(vals, columns=cols)
+
+    if calc_dtype:
+        types = [[col[1] for col in row] for row in rows]
+        df_types = pd.DataFrame(types, columns=cols)
+        dtypes = [(col, _judge_type(df_types[col].unique())) for col in cols]
+        return df, dtypes
+
+    return df
+
+
+class _GqlDecoder(object):
+    """
+    Convert entityResults pages of one GQL query into DataFrames,
+    columns of later pages are converted by types of the first page.
+    """
+
+    def __init__(self):
+
+        self._kind_names = None
+        self._columns = None
+
+    def decode(self, entities):
+
+        if self._columns is None:
+            self._kind_names = [{"name": kind} for kind in set([p["kind"] for entity in entities for p in entity["entity"]["key"]["path"]])]
+            df, dtypes = _convert_dataframe(entities, True)
+            self._columns = dict((code, [d[0] for d in dtypes if d[1][1] in code]) for code in ["s", "if", "b", "d"])
+        else:
+            df = _convert_dataframe(entities)
+
+        #df[scols] = df[scols].astype(str)
+        df[self._columns["b"]] = df[self._columns["b"]].astype(bool)
+        df[self._columns["if"]] = df[self._columns["if"]].apply(pd.to_numeric)
+        df[self._columns["d"]] = df[self._columns["d"]].apply(pd.to_datetime)
+        return df
+
+    def next_body(self, resp):
+
+        return {
+            "query": {
+                "startCursor": resp["batch"]["endCursor"],
+                "kind": self._kind_names
             }
         }
-        req = projects.runQuery(projectId=self._project_id, body=body)
-        resp = self._try_execute(req)
 
-        entities = resp["batch"]["entityResults"]
-        if len(entities) == 0:
-            return pd.DataFrame()
 
-        def extract_cols_value(k, v):
-            if "stringValue" in v:
-                return (k, "s", v["stringValue"])
-            elif "integerValue" in v:
-                return (k, "i", v["integerValue"])
-            elif "doubleValue" in v:
-                return (k, "f", v["doubleValue"])
-            elif "booleanValue" in v:
-                return (k, "b", v["booleanValue"])
-            elif "timestampValue" in v:
-                return (k, "d", v["datetimeValue"])
-            elif "nullValue" in v:
-                return (k, "n", None)
-            elif "keyValue" in v:
-                keypath = v["keyValue"]["path"][0]
-                value = keypath["name"] if keypath["id"] is None else keypath["id"]
-                dtype = "s" if keypath["id"] is None else "i"
-                return (k, dtype, value)
-            else:
-                return (k, "z", None)
-
-        def judge_type(t):
-            dtype = object
-
-            if "z" in t:
-                return (object, "z")
-            np.delete(t, np.where(t=="n"))
-            if len(t) == 0:
-                return (object, "s")
-            if len(t) == 1:
-                if "i" in t:
-                    return (np.int64, "i")
-                elif "f" in t:
-                    return (np.float64, "f")
-                elif "b" in t:
-                    return (np.bool, "b")
-                elif "d" in t:
-                    return (object, "d")
-                else:
-                    return (object, "s")
-
-            if len(t) == 2 and "i" in t and "f" in t:
-                return (np.float64, "f")
+class Client(ClientBase):
 
-            return (object, "s")
+    __ENDPOINT_GDS = "https://www.googleapis.com/auth/datastore"
+    __API_NAME = "datastore"
+    __API_VERSION = "v1"
 
-        def convert_dataframe(entities, calc_dtype=False):
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=10):
 
-            rows = [[extract_cols_value(k, v) for k, v in entity["entity"]["properties"].items()] for entity in entities]
-            #vals = [[col[2] for col in row] for row in rows]
-            vals = [[col[2] for col in row] for row in rows]
-            cols = entities[0]["entity"]["properties"].keys()
-            df = pd.DataFrame(vals, columns=cols)
+        super(Client, self).__init__(project_id, keyfile_path, account_email, pool_size)
 
-            if calc_dtype:
-                types = [[col[1] for col in row] for row in rows]
-                df_types = pd.DataFrame(types, columns=cols)
-                dtypes = [(col, judge_type(df_types[col].unique())) for col in cols]
-                return df, dtypes
+    @property
+    def _dsservice(self):
 
-            return df
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GDS)[1]
 
-        kind_names = [{"name": kind} for kind in set([p["kind"]  for entity in entities for p in entity["entity"]["key"]["path"]])]
+    @property
+    def _dscredentials(self):
 
-        df, dtypes = convert_dataframe(entities, True)
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GDS)[0]
 
-        scols = [d[0] for d in dtypes if d[1][1] == "s"]
-        ncols = [d[0] for d in dtypes if d[1][1] == "i" or d[1][1] == "f"]
-        bcols = [d[0] for d in dtypes if d[1][1] == "b"]
-        tcols = [d[0] for d in dtypes if d[1][1] == "d"]
+    def get_dsservice(self):
 
-        #df[scols] = df[scols].astype(str)
-        df[bcols] = df[bcols].astype(bool)
-        df[ncols] = df[ncols].apply(pd.to_numeric)
-        df[tcols] = df[tcols].apply(pd.to_datetime)
-
-        df_list = [df]
-        while resp["batch"]["moreResults"] == "NOT_FINISHED":
-            body = {
-                "query": {
-                    "startCursor": resp["batch"]["endCursor"],
-                    "kind": kind_names
-                }
-            }
-            req = projects.runQuery(projectId=self._project_id, body=body)
-            resp = self._try_execute(req)
-            entities = resp["batch"]["entityResults"]
-            if len(entities) == 0:
-                return pd.concat(df_list)
+        return self._dsservice
 
-            df = convert_dataframe(entities)
+    def gql(self, query):
 
-            #df[scols] = df[scols].astype(str)
-            df[bcols] = df[bcols].astype(bool)
-            df[ncols] = df[ncols].apply(pd.to_numeric)
-            df[tcols] = df[tcols].apply(pd.to_datetime)
+        projects = self._dsservice.projects()
+        req = projects.runQuery(projectId=self._project_id, body=_gql_body(query))
+        resp = self._try_execute(req)
 
-            df_list.append(df)
+        decoder = _GqlDecoder()
+        df_list = []
+        while True:
+            entities = resp["batch"].get("entityResults", [])
+            if len(entities) == 0:
+                break
+            df_list.append(decoder.decode(entities))
+            if resp["batch"]["moreResults"] != "NOT_FINISHED":
+                break
+            req = projects.runQuery(projectId=self._project_id, body=decoder.next_body(resp))
+            resp = self._try_execute(req)
 
-        dfs = pd.concat(df_list)
-        return dfs
+        if not df_list:
+            return pd.DataFrame()
+        return pd.concat(df_list)
 
     def get(self, keys):
 
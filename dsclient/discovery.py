@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import tempfile
+
+
+DISCOVERY_URI = "https://www.googleapis.com/discovery/v1/apis/{0}/{1}/rest"
+
+# documents fetched over network are fetched again after max_age seconds.
+MAX_AGE = 7 * 24 * 60 * 60
+
+
+def default_cache_dir():
+
+    return os.environ.get("DSCLIENT_DISCOVERY_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cache", "dsclient", "discovery"))
+
+
+def api_root():
+
+    # all APIs are sent to DSCLIENT_API_ROOT (ex: http://localhost:8080 of local stand-in server).
+    return os.environ.get("DSCLIENT_API_ROOT") or None
+
+
+def with_root_url(document, root_url):
+    """
+    Return discovery document whose requests are sent to root_url.
+    """
+
+    service = json.loads(document)
+    root_url = root_url.rstrip("/") + "/"
+    service["rootUrl"] = root_url
+    if "mtlsRootUrl" in service:
+        service["mtlsRootUrl"] = root_url
+    return json.dumps(service)
+
+
+def _packaged_path(api_name, api_version):
+
+    # google-api-python-client>=2.0 ships discovery documents of all APIs.
+    try:
+        import googleapiclient
+    except ImportError:
+        return None
+    path = os.path.join(os.path.dirname(googleapiclient.__file__), "discovery_cache",
+                        "documents", "{0}.{1}.json".format(api_name, api_version))
+    return path if os.path.exists(path) else None
+
+
+def _read(path):
+
+    with open(path) as f:
+        content = f.read()
+    json.loads(content)
+    return content
+
+
+def _write(path, content):
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _fetch(api_name, api_version):
+
+    from googleapiclient.http import build_http
+
+    resp, content = build_http().request(DISCOVERY_URI.format(api_name, api_version))
+    if resp.status != 200:
+        raise Exception("Failed to fetch discovery document of {0} {1} (status {2})".format(
+            api_name, api_version, resp.status))
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    json.loads(content)
+    return content
+
+
+def load_document(api_name, api_version, cache_dir=None, max_age=MAX_AGE):
+    """
+    Return discovery document (JSON string) of API without network if possible.
+
+    Documents packaged in google-api-python-client are used first, then
+    documents cached on disk (cache_dir). Otherwise document is fetched
+    and saved into cache_dir. Expired cache is still used when fetch fails
+    (ex: offline).
+    """
+
+    packaged = _packaged_path(api_name, api_version)
+    if packaged is not None:
+        return _read(packaged)
+
+    path = os.path.join(cache_dir or default_cache_dir(), "{0}.{1}.json".format(api_name, api_version))
+    stale = None
+    if os.path.exists(path):
+        try:
+            content = _read(path)
+        except (IOError, OSError, ValueError):
+            content = None
+        if content is not None and time.time() - os.path.getmtime(path) < max_age:
+            return content
+        stale = content
+
+    try:
+        content = _fetch(api_name, api_version)
+    except Exception:
+        if stale is not None:
+            return stale
+        raise
+    try:
+        _write(path, content)
+    except (IOError, OSError):
+        pass
+    return content
@@ -1,3 +1,7 @@
+import json
+from googleapiclient.errors import HttpError
+
+
 class GCPError(Exception):
 
     def __init__(self, message, code=None):
@@ -42,3 +46,23 @@ class BigQueryError(GCPError):
         return ", ".join(messages)
 
     __str__ = __repr__
+
+
+def error_reasons(exception):
+    """
+    Return list of error reasons (ex: rateLimitExceeded) of BigQueryError or HttpError.
+    """
+
+    if isinstance(exception, BigQueryError):
+        return exception.reasons
+    if isinstance(exception, HttpError):
+        try:
+            content = exception.content
+            if isinstance(content, bytes):
+                content = content.decode("utf-8")
+            error = json.loads(content)["error"]
+            reasons = [e.get("reason") for e in error.get("errors", [])]
+            return reasons or [error.get("status")]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return ["backendError"] if exception.resp.status >= 500 else []
+    return []
@@ -0,0 +1,158 @@
+import logging
+import threading
+import pandas as pd
+
+
+# upper bounds (ms) of latency histogram buckets.
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf")]
+
+
+class Collector(object):
+    """
+    Interface of instrumentation hook called by ClientBase._try_execute
+    once for every API call (after retries).
+
+    Subclass and override record(), then add by client.add_collector().
+    """
+
+    def record(self, service, method, latency, bytes_out, bytes_in, retries, status, reason):
+        """
+        Parameters
+        ----------
+        service : str
+            bigquery, storage, datastore, compute or batch.
+        method : str
+            API method (ex: jobs.insert, objects.get).
+        latency : float
+            seconds including retries.
+        bytes_out : int
+            request body size.
+        bytes_in : int
+            response body size (0 if not known).
+        retries : int
+            attempts - 1.
+        status : int
+            HTTP status of last attempt (0 for non HTTP error).
+        reason : str
+            error reason (ex: rateLimitExceeded) or None.
+        """
+
+        pass
+
+
+class _Stat(object):
+
+    def __init__(self):
+
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+        self.reasons = {}
+
+    def percentile(self, q):
+
+        rank = q * self.calls
+        count = 0
+        for bound, size in zip(LATENCY_BUCKETS, self.histogram):
+            count += size
+            if count >= rank and size > 0:
+                return min(bound, 1000 * self.max_latency)
+        return 1000 * self.max_latency
+
+
+class MemoryCollector(Collector):
+    """
+    Aggregate calls per (service, method) in memory: calls, errors,
+    retries, bytes and latency histogram. Memory does not grow with calls.
+    """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, service, method, latency, bytes_out, bytes_in, retries, status, reason):
+
+        ms = 1000 * latency
+        bucket = 0
+        while ms > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        with self._lock:
+            stat = self._stats.get((service, method))
+            if stat is None:
+                stat = self._stats[(service, method)] = _Stat()
+            stat.calls += 1
+            stat.retries += retries
+            stat.bytes_out += bytes_out
+            stat.bytes_in += bytes_in
+            stat.latency += latency
+            stat.max_latency = max(stat.max_latency, latency)
+            stat.histogram[bucket] += 1
+            if reason is not None:
+                stat.errors += 1
+                stat.reasons[reason] = stat.reasons.get(reason, 0) + 1
+
+    def reset(self):
+
+        with self._lock:
+            self._stats = {}
+
+    def summary(self):
+        """
+        Return pandas.DataFrame of calls per (service, method), slowest total time first.
+        """
+
+        columns = ["service", "method", "calls", "errors", "retries", "bytes_out", "bytes_in",
+                   "total_s", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms", "reasons"]
+        records = []
+        with self._lock:
+            for (service, method), stat in self._stats.items():
+                reasons = ",".join("{0}:{1}".format(reason, count) for reason, count
+                                   in sorted(stat.reasons.items(), key=lambda item: -item[1]))
+                records.append((service, method, stat.calls, stat.errors, stat.retries,
+                                stat.bytes_out, stat.bytes_in, stat.latency,
+                                1000 * stat.latency / stat.calls,
+                                stat.percentile(0.5), stat.percentile(0.9), stat.percentile(0.99),
+                                1000 * stat.max_latency, reasons))
+        df = pd.DataFrame.from_records(records, columns=columns)
+        return df.sort_values("total_s", ascending=False).reset_index(drop=True)
+
+    def histogram(self):
+        """
+        Return latency histogram as pandas.DataFrame (rows: service/method, columns: bucket upper bound ms).
+        """
+
+        with self._lock:
+            index = sorted(self._stats)
+            rows = [list(self._stats[key].histogram) for key in index]
+        return pd.DataFrame(rows, columns=["<={0}".format(bound) for bound in LATENCY_BUCKETS],
+                            index=pd.MultiIndex.from_tuples(index, names=["service", "method"])
+                            if index else None)
+
+
+class LoggingCollector(Collector):
+    """
+    Log every call to logger (default: dsclient) with level.
+    Calls slower than slow_seconds or failed are logged with WARNING.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG, slow_seconds=None):
+
+        self._logger = logger or logging.getLogger("dsclient")
+        self._level = level
+        self._slow_seconds = slow_seconds
+
+    def record(self, service, method, latency, bytes_out, bytes_in, retries, status, reason):
+
+        level = self._level
+        if reason is not None or (self._slow_seconds is not None and latency >= self._slow_seconds):
+            level = max(level, logging.WARNING)
+        if not self._logger.isEnabledFor(level):
+            return
+        self._logger.log(level, "%s %s status=%s latency=%.1fms out=%d in=%d retries=%d reason=%s",
+                         service, method, status, 1000 * latency, bytes_out, bytes_in, retries, reason)
@@ -0,0 +1,219 @@
+import time
+import random
+import threading
+import calendar
+from email.utils import parsedate
+from googleapiclient.errors import HttpError
+from . errors import BigQueryError, error_reasons
+
+
+# HTTP status retried by default.
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# error reasons retried by default (BigQuery answers rate limit by 403).
+RETRY_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "backendError", "internalError")
+
+
+def _transport_errors():
+
+    # connection reset, timeout and DNS errors raised under httplib2.
+    # socket.error is OSError on python3, which includes file errors, so
+    # only ConnectionError (reset, refused, broken pipe) is used there.
+    import socket
+    import httplib2
+    try:
+        from http.client import HTTPException
+    except ImportError:
+        from httplib import HTTPException
+    try:
+        connection_error = ConnectionError
+    except NameError:
+        connection_error = socket.error
+    return (connection_error, socket.timeout, HTTPException, httplib2.HttpLib2Error)
+
+
+def retry_after(exception):
+    """
+    Return seconds of Retry-After header of HttpError (None if not set).
+    """
+
+    if not isinstance(exception, HttpError):
+        return None
+    value = exception.resp.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        date = parsedate(value)
+        if date is None:
+            return None
+        return max(calendar.timegm(date) - time.time(), 0.0)
+
+
+class RetryBudget(object):
+    """
+    Token bucket limiting retries to a ratio of successful calls.
+
+    Each retry takes one token and each success puts ratio tokens back
+    (up to tokens). When the bucket is empty calls fail at once instead
+    of retrying, so a failing backend is not flooded by retries of all
+    threads.
+
+    Parameters
+    ----------
+    tokens : float
+        size of bucket (retries allowed in a burst).
+    ratio : float
+        tokens put back by one successful call.
+    """
+
+    def __init__(self, tokens=10.0, ratio=0.1):
+
+        self._max_tokens = float(tokens)
+        self._tokens = float(tokens)
+        self._ratio = ratio
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+
+        return self._tokens
+
+    def withdraw(self):
+
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def deposit(self):
+
+        with self._lock:
+            self._tokens = min(self._tokens + self._ratio, self._max_tokens)
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before API calls are sent again.
+
+    Errors are retried if HTTP status is in statuses, any error reason is
+    in reasons, or it is a transport error (connection reset, timeout).
+    Delay of n-th retry is initial * multiplier ** (n - 1) limited by
+    max_delay, randomized by jitter, and at least Retry-After of response.
+    Retries stop after max_attempts calls, when the next delay passes
+    deadline, or when budget is exhausted.
+
+    Parameters
+    ----------
+    max_attempts : int
+        max number of calls including the first one.
+    initial : float
+        delay (seconds) before first retry.
+    max_delay : float
+        max delay (seconds) between calls.
+    multiplier : float
+        growth of delay per retry.
+    jitter : float
+        0 to 1, fraction of delay randomized (1: uniform in [0, delay]).
+    deadline : float
+        seconds from the first call after which no retry starts (None: no limit).
+    statuses : tuple of int
+    reasons : tuple of str
+    budget : RetryBudget
+        shared by all calls using this policy (None: no limit).
+    """
+
+    def __init__(self, max_attempts=5, initial=1.0, max_delay=32.0, multiplier=2.0,
+                 jitter=1.0, deadline=None, statuses=RETRY_STATUSES,
+                 reasons=RETRY_REASONS, budget=None):
+
+        self.max_attempts = max_attempts
+        self.initial = initial
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.statuses = tuple(statuses)
+        self.reasons = tuple(reasons)
+        self.budget = budget
+
+    def __repr__(self):
+
+        return "RetryPolicy(max_attempts={0}, initial={1}, max_delay={2}, deadline={3})".format(
+            self.max_attempts, self.initial, self.max_delay, self.deadline)
+
+    def replace(self, **kwargs):
+        """
+        Return copy of policy with some parameters changed (budget is shared).
+        """
+
+        params = dict(max_attempts=self.max_attempts, initial=self.initial,
+                      max_delay=self.max_delay, multiplier=self.multiplier,
+                      jitter=self.jitter, deadline=self.deadline, statuses=self.statuses,
+                      reasons=self.reasons, budget=self.budget)
+        params.update(kwargs)
+        return RetryPolicy(**params)
+
+    def retryable(self, exception):
+
+        if isinstance(exception, HttpError):
+            if exception.resp.status in self.statuses:
+                return True
+            return any(reason in self.reasons for reason in error_reasons(exception))
+        if isinstance(exception, BigQueryError):
+            return len(exception.reasons) > 0 and \
+                   any(reason in self.reasons for reason in exception.reasons)
+        return isinstance(exception, _transport_errors())
+
+    def backoff(self, attempt, exception=None):
+        """
+        Return delay (seconds) before call of attempt + 1 (attempt >= 1).
+        """
+
+        delay = min(self.initial * self.multiplier ** (attempt - 1), self.max_delay)
+        delay -= delay * self.jitter * random.random()
+        after = retry_after(exception)
+        if after is not None:
+            delay = max(delay, after)
+        return delay
+
+    def next_delay(self, attempt, exception, start):
+        """
+        Return delay before next call, or None if exception should be raised.
+
+        Parameters
+        ----------
+        attempt : int
+            number of calls done.
+        exception : Exception
+            error of last call.
+        start : float
+            time.time() of the first call.
+        """
+
+        if attempt >= self.max_attempts or not self.retryable(exception):
+            return None
+        delay = self.backoff(attempt, exception)
+        if self.deadline is not None and time.time() + delay - start > self.deadline:
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+        return delay
+
+    def succeeded(self):
+
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def sleep(self, attempt, exception, start):
+        """
+        Wait before next call and return True, or return False if exception should be raised.
+        """
+
+        delay = self.next_delay(attempt, exception, start)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
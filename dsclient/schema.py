@@ -1,9 +1,11 @@
+import threading
 import numpy as np
 import pandas as pd
 
 
 def convert_dtype2bqfield(column_dtype):
 
+    column_dtype = column_dtype.lower()
     if "float" in column_dtype:
         return "float"
     elif "int" in column_dtype:
@@ -23,48 +25,161 @@ def convert_df2bqschema(df):
     return {"fields": fields}
 
 
+_NULLABLE = hasattr(pd, "arrays") and hasattr(pd, "BooleanDtype")
+_NAT = np.iinfo(np.int64).min
+_TRUE_VALUES = ["true", "True", "TRUE", True]
+
+
+def _as_array(values):
+
+    if isinstance(values, list):
+        return np.array(values, dtype=object)
+    return np.asarray(values)
+
+def _convert_float(values):
+
+    if isinstance(values, list):
+        return np.array(values, dtype=np.float64)
+    return np.asarray(values).astype(np.float64)
+
+def _convert_integer(values, nullable=False):
+
+    # with nullable, dtype is always Int64 so that all pages/chunks have same dtype.
+    values = _as_array(values)
+    if values.dtype.kind in "iu":
+        data = values.astype(np.int64)
+        mask = np.zeros(len(data), dtype=bool)
+    else:
+        mask = pd.isnull(values)
+        if not mask.any():
+            data = values.astype(np.int64)
+        elif not nullable:
+            return _convert_float(values)
+        else:
+            data = np.zeros(len(values), dtype=np.int64)
+            data[~mask] = values[~mask].astype(np.int64)
+
+    if nullable:
+        return pd.arrays.IntegerArray(data, mask)
+    return data
+
+def _convert_boolean(values, nullable=False):
+
+    values = _as_array(values)
+    if values.dtype.kind == "b":
+        mask = np.zeros(len(values), dtype=bool)
+        data = values
+    else:
+        mask = pd.isnull(values)
+        data = pd.Series(values).isin(_TRUE_VALUES).values
+    if nullable:
+        return pd.arrays.BooleanArray(data, mask)
+    if mask.any():
+        data = data.astype(object)
+        data[mask] = None
+    return data
+
+def _convert_timestamp(values):
+
+    values = _as_array(values)
+    if values.dtype.kind == "M":
+        # same unit as parsed values (ex: avro may be read as datetime64[us]).
+        return values.astype("datetime64[ns]", copy=False)
+
+    if values.dtype.kind == "O":
+        mask = pd.isnull(values)
+        if mask.all():
+            return np.full(len(values), _NAT, dtype=np.int64).view("datetime64[ns]")
+        try:
+            float(values[~mask][0])
+        except (TypeError, ValueError):
+            # formatted timestamp (ex: "2017-01-01 00:00:00 UTC" of csv extract)
+            # or datetime objects.
+            return pd.to_datetime(values)
+
+    # epoch seconds (ex: "1.4835168E9" of tabledata) are converted by
+    # arithmetic on microseconds, not by parsing each value.
+    seconds = _convert_float(values)
+    mask = np.isnan(seconds)
+    nanos = np.round(np.where(mask, 0.0, seconds) * 1e6).astype(np.int64) * 1000
+    nanos[mask] = _NAT
+    return nanos.view("datetime64[ns]")
+
+
 class Schema(object):
+    """
+    Conversion plan from BigQuery schema to pandas dtypes.
+
+    The plan (one converter per column) is built once and used for every
+    page of query result and every chunk of extracted files.
+
+    Parameters
+    ----------
+    schema : dict
+        BigQuery table schema ({"fields": [{"name": ..., "type": ...}]}).
+    categorical : bool, list or float
+        STRING columns converted to pandas.Categorical. True for all, list
+        of column names, or float ratio: columns whose number of unique
+        values / rows is below it in the first converted frame (decision is
+        made once, before any column of that frame is converted, and kept
+        for later frames, so all frames have identical dtypes).
+        Categories differ by frame, so frames are joined by concat.
+    nullable : bool
+        if True, INTEGER and BOOLEAN columns are pandas nullable Int64 and
+        boolean (pandas>=1.0), so NULL does not change them to float or object.
+        default is False (int64/bool, float64/object when column has NULL).
+    """
 
-    def __init__(self, schema):
+    def __init__(self, schema, categorical=None, nullable=False):
+
+        if nullable and not _NULLABLE:
+            raise Exception("nullable dtypes require pandas>=1.0")
 
         dtype = {}
         stype = {}
+        types = {}
         cols  = []
+        plan  = []
         scols = []
-        ncols = []
-        bcols = []
-        tcols = []
 
         for field in schema["fields"]:
             name = field["name"]
             rtype = field["type"].lower()
-            if rtype == "string":
-                dtype[name] = object
-                stype[name] = object
-                scols.append(name)
-            elif rtype == "integer":
+            types[name] = rtype
+            if rtype == "integer":
                 dtype[name] = np.int64
-                ncols.append(name)
+                convert = lambda values: _convert_integer(values, nullable)
             elif rtype == "float":
                 dtype[name] = np.float64
-                ncols.append(name)
+                convert = _convert_float
             elif rtype == "boolean":
-                dtype[name] = np.bool
-                bcols.append(name)
+                dtype[name] = np.bool_
+                convert = lambda values: _convert_boolean(values, nullable)
             elif rtype == "timestamp":
-                tcols.append(name)
+                convert = _convert_timestamp
             else:
                 dtype[name] = object
+                stype[name] = object
                 scols.append(name)
+                convert = (lambda name: lambda values: self._convert_string(name, values))(name)
             cols.append(name)
+            plan.append((name, convert))
+
+        self._ratio = None
+        self._lock = threading.Lock()
+        if categorical is True:
+            categorical = list(scols)
+        elif isinstance(categorical, float):
+            self._ratio = categorical
+            categorical = None
 
         self._dtype = dtype
         self._stype = stype
+        self._types = types
         self._cols  = cols
+        self._plan  = plan
         self._scols = scols
-        self._ncols = ncols
-        self._bcols = bcols
-        self._tcols = tcols
+        self._ccols = frozenset(categorical or [])
 
     def get_dtype(self):
 
@@ -74,25 +189,105 @@ class Schema(object):
 
         return self._stype
 
-    def update_dtype(self, df):
+    def get_types(self):
+
+        return self._types
+
+    def get_columns(self):
+
+        return list(self._cols)
+
+    def _convert_string(self, name, values):
+
+        values = _as_array(values)
+        if values.dtype.kind != "O":
+            values = values.astype(object)
+        # "NaN" string is missing value (as df.replace('NaN', np.nan) of old update_dtype).
+        nan = values == "NaN"
+        if np.any(nan):
+            values = np.where(nan, np.nan, values)
+        if name in self._ccols:
+            return pd.Categorical(values)
+        return values
+
+    def _decide_categorical(self, data, size):
 
-        df = df.replace('NaN', np.nan)
+        # frames may be converted by several threads, so the first non-empty
+        # frame decides categorical columns once and others wait for it.
+        if self._ratio is None or size == 0:
+            return
+        with self._lock:
+            if self._ratio is None:
+                return
+            ccols = set(self._ccols)
+            for name in self._scols:
+                if name in data and len(pd.unique(_as_array(data[name]))) < self._ratio * size:
+                    ccols.add(name)
+            self._ccols = frozenset(ccols)
+            self._ratio = None
 
-        if self._scols:
-            df[self._scols] = df[self._scols].astype(str)
-        if self._bcols:
-            df[self._bcols] = df[self._bcols].astype(bool)
-        if self._ncols:
-            df[self._ncols] = df[self._ncols].apply(pd.to_numeric)
-        if self._tcols:
-            df[self._tcols] = df[self._tcols].apply(pd.to_datetime)
-        #df[num_clmns] = df[num_clmns].convert_objects(convert_numeric=True)
-        #df[tim_clmns] = df[tim_clmns].convert_objects(convert_dates=True)
-        return df
+    def concat(self, df_list):
+        """
+        Concatenate converted frames keeping categorical columns categorical.
+
+        Categories of each frame are extended to union of all frames, as
+        pandas.concat changes categorical columns with different categories
+        to object.
+
+        Parameters
+        ----------
+        df_list : list
+            DataFrames converted by this schema.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        if len(df_list) == 1:
+            return df_list[0]
+        for name in self._ccols:
+            if not all(name in df and str(df[name].dtype) == "category" for df in df_list):
+                continue
+            categories = pd.unique(np.concatenate([np.asarray(df[name].cat.categories, dtype=object)
+                                                   for df in df_list]))
+            df_list = [df.assign(**{name: df[name].cat.set_categories(categories)})
+                       for df in df_list]
+        return pd.concat(df_list)
+
+    def update_dtype(self, df):
+
+        columns = df.columns
+        data = dict((name, df[name].values) for name in columns)
+        self._decide_categorical(data, len(df))
+        for name, convert in self._plan:
+            if name in data:
+                data[name] = convert(data[name])
+        return pd.DataFrame(data, columns=columns, index=df.index)
 
     def to_dataframe(self, bq_rows):
+        """
+        Decode rows of tabledata/getQueryResults response into DataFrame.
+
+        Values are gathered column by column straight from the response JSON
+        and converted by the plan into one typed array per column, so no
+        intermediate row lists or whole-frame dtype passes are needed.
+
+        Parameters
+        ----------
+        bq_rows : list
+            "rows" of BigQuery response ({"f": [{"v": value}, ...]}).
+
+        Returns
+        -------
+        pandas.DataFrame
+            DataFrame whose columns are typed according to the schema.
+        """
 
-        rows = [[col["v"] for col in row["f"]] for row in bq_rows]
-        df = pd.DataFrame(rows, columns=self._cols)
-        df = self.update_dtype(df)
-        return df
+        data = {}
+        for i, (name, convert) in enumerate(self._plan):
+            data[name] = [row["f"][i]["v"] for row in bq_rows]
+        self._decide_categorical(data, len(bq_rows))
+        for name, convert in self._plan:
+            data[name] = convert(data[name])
+        return pd.DataFrame(data, columns=self._cols)
@@ -1,27 +1,131 @@
+import os
 import time
 import json
+import gzip
+import mmap
+import fnmatch
 import platform
 import pickle
+import tempfile
+import multiprocessing
 import pandas as pd
+from collections import deque
+from itertools import islice
 from io import BytesIO
 from io import StringIO
-from googleapiclient.http import MediaInMemoryUpload
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 from googleapiclient.errors import HttpError
 from .. base import ClientBase
 
 
+# parsers are executed in worker processes, so they must be module level functions.
+# data is bytes (shards sent to worker processes) or downloaded file object.
+
+def _is_empty(data):
+
+    if isinstance(data, bytes):
+        return len(data) == 0
+    position = data.tell()
+    data.seek(0, 2)
+    size = data.tell()
+    data.seek(position)
+    return size == 0
+
+def _open_buffer(data, compression=None):
+
+    fileobj = BytesIO(data) if isinstance(data, bytes) else data
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    return fileobj
+
+def _parse_csv(data, sep=",", header="infer", dtype=None, compression=None):
+
+    if _is_empty(data):
+        return None
+    return pd.read_csv(_open_buffer(data, compression), sep=sep, header=header, dtype=dtype)
+
+def _parse_ndjson(data, compression=None):
+
+    if _is_empty(data):
+        return None
+    return pd.read_json(_open_buffer(data, compression), lines=True, dtype=False)
+
+def _process_pool(processes):
+
+    # parser processes are spawned, not forked, so they inherit no sockets of
+    # connection pools nor locks held by download threads.
+    try:
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=processes, mp_context=context)
+    except (AttributeError, TypeError):
+        # python<3.7 has no mp_context.
+        return ProcessPoolExecutor(max_workers=processes)
+
+def _import_fastavro():
+
+    try:
+        import fastavro
+    except ImportError:
+        raise Exception("fastavro is required to read avro files.")
+    return fastavro
+
+def _iter_avro_frames(fileobj, chunk_rows=None):
+
+    reader = _import_fastavro().reader(fileobj)
+    schema = getattr(reader, "writer_schema", None) or reader.schema
+    names = [field["name"] for field in schema["fields"]]
+    records = iter(reader)
+    while True:
+        columns = dict((name, []) for name in names)
+        appends = [(name, columns[name].append) for name in names]
+        count = 0
+        for record in islice(records, chunk_rows):
+            for name, append in appends:
+                append(record[name])
+            count += 1
+        if count == 0:
+            return
+        yield pd.DataFrame(columns, columns=names)
+        if chunk_rows is None:
+            return
+
+def _parse_avro(data):
+
+    if _is_empty(data):
+        return None
+    dfs = list(_iter_avro_frames(_open_buffer(data)))
+    return dfs[0] if dfs else None
+
+def _infer_compression(uri, compression):
+
+    if compression is None and uri.lower().endswith(".gz"):
+        return "gzip"
+    return compression
+
+
 class Client(ClientBase):
 
     __ENDPOINT_GCS = "https://www.googleapis.com/auth/devstorage.read_write"
     __API_NAME = "storage"
     __API_VERSION = "v1"
 
-    def __init__(self, project_id, keyfile_path=None, account_email=None):
+    DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+    SPOOL_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, project_id, keyfile_path=None, account_email=None, pool_size=10):
+
+        super(Client, self).__init__(project_id, keyfile_path, account_email, pool_size)
+
+    @property
+    def _gsservice(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GCS)[1]
 
-        super(Client, self).__init__(project_id, keyfile_path, account_email)
-        self._gscredentials, self._gsservice = super(Client, self)._build_service(Client.__API_NAME,
-                                                                                  Client.__API_VERSION,
-                                                                                  Client.__ENDPOINT_GCS)
+    @property
+    def _gscredentials(self):
+
+        return self._service(Client.__API_NAME, Client.__API_VERSION, Client.__ENDPOINT_GCS)[0]
 
     def get_gsservice(self):
 
@@ -36,16 +140,183 @@ class Client(ClientBase):
         bucket, obj = path.split("/", 1)
         return bucket, obj
 
-    def _read(self, uri, retry=3):
+    def _download(self, uri, fileobj, chunk_size=None, retry=3, http=None):
 
         bucket, file_path = self._parse_uri(uri)
         objects = self._gsservice.objects()
-        req = objects.get_media(bucket=bucket, object=file_path)
-        resp = self._try_execute(req, retry=retry)
-        return resp
+        chunk_size = chunk_size or Client.DOWNLOAD_CHUNK_SIZE
+        start, total, generation = 0, None, None
+        while total is None or start < total:
+            # each chunk is ranged request retried by itself by client retry policy,
+            # and recorded by collectors. not shared by single flight, as requests
+            # of different ranges have same uri. chunks after the first are read
+            # from generation of the first, so they are not mixed with overwrite.
+            req = objects.get_media(bucket=bucket, object=file_path, generation=generation)
+            req.headers["range"] = "bytes={0}-{1}".format(start, start + chunk_size - 1)
+            headers = {}
+            req.add_response_callback(headers.update)
+            try:
+                content = self._instrumented_execute(req, retry, http)
+            except HttpError as e:
+                if e.resp.status == 416 and start == 0:
+                    # empty object has no range.
+                    break
+                if e.resp.status == 404 and generation is not None:
+                    raise Exception("{0} was overwritten or deleted during download "
+                                    "(generation {1}).".format(uri, generation))
+                raise
+            fileobj.write(content)
+            start += len(content)
+            generation = generation or headers.get("x-goog-generation")
+            content_range = headers.get("content-range")
+            if content_range is None or len(content) == 0:
+                # whole object in one response (range is ignored).
+                break
+            total = int(content_range.rsplit("/", 1)[1])
+        return fileobj
+
+    def download(self, uri, fileobj=None, chunk_size=None, retry=3,
+                 spool_size=None, use_mmap=False):
+        """
+        Download object on Cloud Storage in chunks.
+
+        Parameters
+        ----------
+        uri : str
+            gs://bucket/path
+        fileobj : file-like object
+            destination, written from current position. if None, temporary
+            file is used and returned rewound to the beginning.
+        chunk_size : int
+            bytes of each ranged request. each chunk is retried by itself.
+            all chunks are read from the same generation, exception is
+            raised if object is overwritten during download.
+        retry : int or RetryPolicy
+            max attempts of each chunk or policy (None: client policy).
+        spool_size : int
+            temporary file is kept in memory up to this size, then on disk.
+        use_mmap : boolean
+            if True (and fileobj is None), object is downloaded to temporary
+            file on disk and returned as read-only mmap.
+
+        Returns
+        -------
+        file-like object
+            fileobj, temporary file or mmap.
+        """
+
+        if fileobj is not None:
+            return self._download(uri, fileobj, chunk_size, retry)
+
+        if use_mmap:
+            with tempfile.TemporaryFile() as tmp:
+                self._download(uri, tmp, chunk_size, retry)
+                tmp.flush()
+                if tmp.tell() == 0:
+                    return BytesIO()
+                return mmap.mmap(tmp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        spool_size = Client.SPOOL_SIZE if spool_size is None else spool_size
+        tmp = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        try:
+            self._download(uri, tmp, chunk_size, retry)
+        except:
+            tmp.close()
+            raise
+        tmp.seek(0)
+        return tmp
+
+    def download_files(self, uri, directory, workers=8, chunk_size=None, retry=3):
+        """
+        Download object(s) to local directory in parallel.
+
+        Parameters
+        ----------
+        uri : str
+            gs://bucket/path. may contain wildcard (*).
+        directory : str
+            local directory. files are named after object names.
+
+        Returns
+        -------
+        list of str
+            local file paths in order of object name.
+        """
+
+        uris = self.list_object(uri) if "*" in uri else [uri]
+        paths = [os.path.join(directory, self._parse_uri(u)[1].replace("/", "_")) for u in uris]
+
+        def download(u, path):
+            http = self._thread_http(self._gscredentials)
+            with open(path, "wb") as fileobj:
+                self._download(u, fileobj, chunk_size, retry, http)
+            return path
+
+        with ThreadPoolExecutor(max_workers=workers) as downloader:
+            futures = [downloader.submit(download, u, path) for u, path in zip(uris, paths)]
+            return [future.result() for future in futures]
+
+    def _read(self, uri, retry=3, http=None, chunk_size=None):
+
+        buf = BytesIO()
+        self._download(uri, buf, chunk_size, retry, http)
+        return buf.getvalue()
+
+    def _map_shards(self, uris, parse, args=(), retry=3, workers=8, processes=1):
+
+        # downloads run on threads (each with own connection); results are
+        # returned in the order of uris. With processes=1 each thread parses
+        # the shard it downloaded, otherwise parsing runs on process pool.
+        # At most workers + processes shards are downloading or waiting for
+        # parser, so bytes of all shards are never held at once.
+        def read(uri):
+            http = self._thread_http(self._gscredentials)
+            return self._read(uri, retry=retry, http=http)
+
+        def read_parse(uri):
+            return parse(read(uri), *args)
+
+        if processes == 1:
+            with ThreadPoolExecutor(max_workers=workers) as downloader:
+                uris = iter(uris)
+                pending = deque()
+                results = []
+                while True:
+                    for uri in islice(uris, workers - len(pending)):
+                        pending.append(downloader.submit(read_parse, uri))
+                    if not pending:
+                        return results
+                    results.append(pending.popleft().result())
+
+        slots = processes or multiprocessing.cpu_count()
+        parser = _process_pool(slots)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as downloader:
+                uris = iter(uris)
+                downloads = deque()
+                parses = deque()
+                results = []
+                while True:
+                    while len(downloads) + len(parses) < workers + slots:
+                        uri = next(uris, None)
+                        if uri is None:
+                            break
+                        downloads.append(downloader.submit(read, uri))
+                    if not downloads and not parses:
+                        return results
+                    if downloads and len(parses) < slots:
+                        data = downloads.popleft().result()
+                        parses.append(parser.submit(parse, data, *args))
+                        del data
+                    else:
+                        results.append(parses.popleft().result())
+        finally:
+            parser.shutdown()
 
     def _write(self, obj, uri, mimetype=None, retry=3):
 
+        from googleapiclient.http import MediaInMemoryUpload
+
         bucket, file_path = self._parse_uri(uri)
         objects = self._gsservice.objects()
         req = objects.insert(bucket=bucket,
@@ -54,11 +325,79 @@ class Client(ClientBase):
         resp = self._try_execute(req, retry=retry)
         return resp
 
-    def read_csv(self, uri, sep=",", header="infer", dtype=None, retry=3):
-
-        resp = self._read(uri=uri, retry=retry)
-        df = pd.read_csv(BytesIO(resp), sep=sep, header=header, dtype=dtype)
-        return df
+    def _read_frames(self, uri, parse, args=(), retry=3, workers=8, processes=1,
+                     chunk_size=None):
+
+        if "*" in uri:
+            uris = self.list_object(uri)
+            dfs = self._map_shards(uris, parse, args,
+                                   retry=retry, workers=workers, processes=processes)
+            dfs = [df for df in dfs if df is not None]
+            if not dfs:
+                return pd.DataFrame()
+            return pd.concat(dfs, ignore_index=True)
+
+        with self.download(uri, chunk_size=chunk_size, retry=retry) as fileobj:
+            df = parse(fileobj, *args)
+        return df if df is not None else pd.DataFrame()
+
+    def read_csv(self, uri, sep=",", header="infer", dtype=None, retry=3,
+                 workers=8, processes=1, compression=None, chunk_size=None):
+        """
+        Read csv file on Cloud Storage as pandas.DataFrame.
+
+        Parameters
+        ----------
+        uri : str
+            gs://bucket/path. If it contains wildcard (*), all matching
+            objects are downloaded and parsed in parallel and concatenated
+            in order of object name.
+        workers : int
+            number of download threads for wildcard uri.
+        processes : int
+            number of parser processes for wildcard uri (1: parse in download
+            threads, None: cpu count). Processes are spawned and import the
+            main module, so a script using processes other than 1 must guard
+            its top level code by if __name__ == "__main__".
+        compression : str
+            "gzip" or None. inferred from ".gz" suffix of uri if None.
+        chunk_size : int
+            bytes of each download request (see download).
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+
+        compression = _infer_compression(uri, compression)
+        return self._read_frames(uri, _parse_csv, (sep, header, dtype, compression),
+                                 retry=retry, workers=workers, processes=processes,
+                                 chunk_size=chunk_size)
+
+    def read_ndjson(self, uri, retry=3, workers=8, processes=1, compression=None,
+                    chunk_size=None):
+        """
+        Read newline delimited json file(s) on Cloud Storage as pandas.DataFrame.
+
+        Values are not converted (dtype=False). See read_csv for parameters.
+        """
+
+        compression = _infer_compression(uri, compression)
+        return self._read_frames(uri, _parse_ndjson, (compression,),
+                                 retry=retry, workers=workers, processes=processes,
+                                 chunk_size=chunk_size)
+
+    def read_avro(self, uri, retry=3, workers=8, processes=1, chunk_size=None):
+        """
+        Read avro file(s) on Cloud Storage as pandas.DataFrame (requires fastavro).
+
+        Avro types are mapped to DataFrame columns directly. See read_csv for parameters.
+        """
+
+        _import_fastavro()
+        return self._read_frames(uri, _parse_avro,
+                                 retry=retry, workers=workers, processes=processes,
+                                 chunk_size=chunk_size)
 
     def write_csv(self, df, uri, sep=",", retry=3):
 
@@ -73,10 +412,15 @@ class Client(ClientBase):
         resp = self._write(obj=value, uri=uri, mimetype='text/csv', retry=retry)
         return resp
 
-    def read_blob(self, uri, retry=3):
+    def read_blob(self, uri, retry=3, chunk_size=None):
+
+        return self._shared_get(("read_blob", uri),
+                                lambda: self._read_blob(uri, retry, chunk_size))
+
+    def _read_blob(self, uri, retry=3, chunk_size=None):
 
-        resp = self._read(uri=uri, retry=retry)
-        blob = pickle.loads(resp)
+        with self.download(uri, chunk_size=chunk_size, retry=retry) as fileobj:
+            blob = pickle.load(fileobj)
         return blob
 
     def write_blob(self, blob, uri, retry=3):
@@ -85,9 +429,15 @@ class Client(ClientBase):
         resp = self._write(obj=dump, uri=uri, mimetype='application/octet-stream', retry=retry)
         return resp
 
-    def read_text(self, uri, retry=3):
+    def read_text(self, uri, retry=3, chunk_size=None):
 
-        resp = self._read(uri=uri, retry=retry)
+        return self._shared_get(("read_text", uri),
+                                lambda: self._read_text(uri, retry, chunk_size))
+
+    def _read_text(self, uri, retry=3, chunk_size=None):
+
+        with self.download(uri, chunk_size=chunk_size, retry=retry) as fileobj:
+            resp = fileobj.read()
         if platform.python_version_tuple()[0] == "3":
             resp = resp.decode('utf-8')
         return resp
@@ -99,9 +449,15 @@ class Client(ClientBase):
         resp = self._write(obj=text, uri=uri, mimetype='text/plain', retry=retry)
         return resp
 
-    def read_json(self, uri, retry=3):
+    def read_json(self, uri, retry=3, chunk_size=None):
+
+        return self._shared_get(("read_json", uri),
+                                lambda: self._read_json(uri, retry, chunk_size))
+
+    def _read_json(self, uri, retry=3, chunk_size=None):
 
-        resp = self._read(uri=uri, retry=retry)
+        with self.download(uri, chunk_size=chunk_size, retry=retry) as fileobj:
+            resp = fileobj.read()
         if platform.python_version_tuple()[0] == "3":
             s = resp.decode('utf-8')
             dic = json.load(StringIO(s))
@@ -125,15 +481,87 @@ class Client(ClientBase):
         resp = self._write(obj=buf.getvalue(), uri=uri, mimetype='image/'+image_type, retry=retry)
         return resp
 
+    def iter_objects(self, uri, fields="name", page_size=1000, max_items=None, retry=3):
+        """
+        Iterate objects matching uri (gs://bucket/prefix*) in order of name,
+        requesting next page only when needed.
+
+        Parameters
+        ----------
+        uri : str
+            gs://bucket/prefix or gs://bucket/pattern with wildcard.
+        fields : str
+            fields of each object (name is always included).
+        page_size : int
+            objects of each page.
+        max_items : int
+            stop after max_items matching objects.
+        """
+
+        bucket, pattern = self._parse_uri(uri)
+        prefix = pattern.split("*", 1)[0]
+        if fields is not None and "name" not in fields.split(","):
+            fields = "name," + fields
+        objects = self._gsservice.objects()
+
+        def make_request(page_token, max_results, partial):
+            return objects.list(bucket=bucket, prefix=prefix,
+                                pageToken=page_token, maxResults=max_results,
+                                fields=partial)
+
+        # filtered items are not counted by _iter_items, so limit here.
+        count = 0
+        for item in self._iter_items(make_request, "items", fields, page_size, retry=retry):
+            if "*" in pattern and not fnmatch.fnmatchcase(item["name"], pattern):
+                continue
+            yield item
+            count += 1
+            if max_items is not None and count >= max_items:
+                return
+
+    def objects_frame(self, uri, page_size=1000, max_items=None):
+        """
+        Return objects matching uri as pandas.DataFrame (uri, size, updated).
+        """
+
+        bucket, pattern = self._parse_uri(uri)
+
+        def to_record(item):
+            return ("gs://{0}/{1}".format(bucket, item["name"]),
+                    int(item.get("size", 0)),
+                    pd.Timestamp(item["updated"]) if "updated" in item else pd.NaT)
+
+        items = self.iter_objects(uri, "name,size,updated", page_size, max_items)
+        return self._items_frame(items, ["uri", "size", "updated"], to_record)
+
+    def list_object(self, uri, retry=3):
+        """
+        List objects matching uri (gs://bucket/prefix*) in order of name.
+        """
+
+        bucket, pattern = self._parse_uri(uri)
+        uris = ["gs://{0}/{1}".format(bucket, item["name"])
+                for item in self.iter_objects(uri, retry=retry)]
+        return sorted(uris)
+
     def delete_object(self, uri, retry=3):
 
+        if "*" in uri:
+            for shard_uri in self.list_object(uri, retry=retry):
+                self.delete_object(shard_uri, retry=retry)
+            return
+
         bucket, file_path = self._parse_uri(uri)
         objects = self._gsservice.objects()
         req = objects.delete(bucket=bucket, object=file_path)
         resp = self._try_execute(req, retry=retry)
         return resp
 
-    def get_bucket(self, bucket):
+    def get_bucket(self, bucket, use_cache=True):
+
+        return self._cached_get(("bucket", bucket), lambda: self._get_bucket(bucket), use_cache)
+
+    def _get_bucket(self, bucket):
 
         buckets = self._gsservice.buckets()
         req = buckets.get(bucket=bucket)
@@ -149,10 +577,41 @@ class Client(ClientBase):
     def list_bucket(self, projection=None, pageToken=None, prefix=None, maxResults=None):
 
         buckets = self._gsservice.buckets()
-        req = buckets.list(project=self._project_id)
+        req = buckets.list(project=self._project_id,
+                           projection=projection,
+                           pageToken=pageToken,
+                           prefix=prefix,
+                           maxResults=maxResults)
         resp = self._try_execute(req)
         return resp
 
+    def iter_buckets(self, prefix=None, fields=None, page_size=1000, max_items=None):
+        """
+        Iterate buckets of project, requesting next page only when needed.
+
+        Parameters
+        ----------
+        prefix : str
+            list buckets whose names begin with prefix.
+        fields : str
+            fields of each bucket (ex: "name,location").
+        page_size : int
+            buckets of each page.
+        max_items : int
+            stop after max_items buckets.
+        """
+
+        buckets = self._gsservice.buckets()
+
+        def make_request(page_token, max_results, partial):
+            return buckets.list(project=self._project_id,
+                                prefix=prefix,
+                                pageToken=page_token,
+                                maxResults=max_results,
+                                fields=partial)
+
+        return self._iter_items(make_request, "items", fields, page_size, max_items)
+
     def create_bucket(self, bucket, location=None, storage_class=None, projection=None, retry=3):
 
         body = {
@@ -164,11 +623,20 @@ class Client(ClientBase):
 
         buckets = self._gsservice.buckets()
         req = buckets.insert(project=self._project_id, body=body, projection=projection)
-        resp = self._try_execute(req, retry=retry)
+        self._invalidate_metadata(("bucket", bucket))
+        try:
+            resp = self._try_execute(req, retry=retry)
+        finally:
+            # get_bucket running during the call may have cached old value.
+            self._invalidate_metadata(("bucket", bucket))
         return resp
 
     def delete_bucket(self, bucket, retry=3):
 
         buckets = self._gsservice.buckets()
         req = buckets.delete(bucket=bucket)
-        resp = self._try_execute(req, retry=retry)
+        self._invalidate_metadata(("bucket", bucket))
+        try:
+            resp = self._try_execute(req, retry=retry)
+        finally:
+            self._invalidate_metadata(("bucket", bucket))
@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+
+
+class HttpPool(object):
+    """
+    Thread-safe pool of authorized httplib2.Http used as http of discovery service.
+
+    httplib2.Http is not thread-safe, so each request takes one Http out of
+    the pool, runs on it alone, and gives it back. Http objects keep their
+    connections alive, and the most recently used one is handed out first,
+    so concurrent threads reuse TCP/TLS connections instead of opening one
+    per request. At most size Http objects are created, more threads wait.
+
+    Parameters
+    ----------
+    credentials : dsclient.credentials.CredentialManager
+    size : int
+        max number of Http (connections per host).
+    timeout : float
+        socket timeout seconds (default of googleapiclient if None).
+    """
+
+    def __init__(self, credentials, size=10, timeout=None):
+
+        # googleapiclient reads credentials of http to refresh token in batch.
+        self.credentials = credentials
+        self._size = max(size, 1)
+        self._timeout = timeout
+        self._idle = deque()
+        self._created = 0
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+
+        return self._size
+
+    def _new_http(self):
+
+        from googleapiclient.http import build_http
+
+        http = build_http()
+        if self._timeout is not None:
+            http.timeout = self._timeout
+        return self.credentials.authorize(http)
+
+    def _acquire(self):
+
+        with self._cond:
+            while not self._idle and self._created >= self._size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._new_http()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, http):
+
+        with self._cond:
+            self._idle.append(http)
+            self._cond.notify()
+
+    def request(self, *args, **kwargs):
+
+        http = self._acquire()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            self._release(http)
+
+    def close(self):
+
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._created -= len(idle)
+        for http in idle:
+            for connection in list(http.connections.values()):
+                connection.close()
+            http.connections.clear()
+
+    def stats(self):
+
+        with self._cond:
+            return {"size": self._size, "created": self._created, "idle": len(self._idle)}
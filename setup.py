@@ -13,6 +13,7 @@ install_requires = [
     'requests>=2',
     'google-api-python-client>=1.5',
     'ipyparallel>=5.1',
+    'futures>=3.0; python_version<"3"',
 ]
 
 setup(
@@ -23,6 +24,10 @@ setup(
     author="Yoichi NAGAI",
     url="http://github.com/orfeon/gcp-python-dsclient",
     install_requires=install_requires,
+    extras_require={
+        'avro': ['fastavro>=0.17'],
+        'async': ['aiohttp>=3.0'],
+    },
     packages=find_packages(),
     package_data={},
     license="Apache 2.0",
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmark"))
+
+import dsclient
+from dsclient.credentials import StaticCredentials
+from dsclient.retry import RetryPolicy, RetryBudget
+from fakegcp import FakeServer, DEFAULT_CONFIG
+
+
+@pytest.fixture(scope="session")
+def server():
+
+    server = FakeServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake(server, monkeypatch):
+
+    server.fake.reset()
+    server.fake.config.clear()
+    server.fake.config.update(DEFAULT_CONFIG)
+    monkeypatch.setenv("DSCLIENT_API_ROOT", server.url)
+    monkeypatch.setenv("DSCLIENT_TOKEN_CACHE", "")
+    return server.fake
+
+
+@pytest.fixture
+def client(fake):
+
+    client = dsclient.Client("test-project")
+    client._credentials = StaticCredentials()
+    client.set_retry_policy(RetryPolicy(initial=0.001, max_delay=0.01,
+                                        budget=RetryBudget(tokens=100)))
+    return client
+
@@ -0,0 +1,127 @@
+import pandas as pd
+
+
+def make_table(client, table_name, rows=10):
+
+    dataset_id = table_name.split(".")[0]
+    if client.get_dataset(dataset_id, use_cache=False) is None:
+        client.create_dataset(dataset_id)
+    client.load(pd.DataFrame({"id": range(rows)}), table_name)
+
+
+def test_query_cache_hit(client, fake, tmpdir):
+
+    make_table(client, "ds.source")
+    client.enable_query_cache(str(tmpdir))
+    first = client.query("SELECT * FROM ds.source")
+    second = client.query("SELECT * FROM ds.source")
+    assert client.query_cache_stats()["hits"] == 1
+    pd.testing.assert_frame_equal(first.reset_index(drop=True), second.reset_index(drop=True))
+
+
+def test_query_cache_invalidated_by_table_change(client, fake, tmpdir):
+
+    make_table(client, "ds.source")
+    client.enable_query_cache(str(tmpdir))
+    client.query("SELECT * FROM ds.source")
+    make_table(client, "ds.source")
+    client.query("SELECT * FROM ds.source")
+    assert client.query_cache_stats()["hits"] == 0
+    assert client.query_cache_stats()["misses"] == 2
+
+
+def test_metadata_cache(client, fake):
+
+    client.create_bucket("bucket")
+    client.enable_metadata_cache(ttl=60)
+    for _ in range(3):
+        client.get_bucket("bucket")
+    assert client.stats().set_index("method").loc["buckets.get", "calls"] == 1
+    client.delete_bucket("bucket")
+    assert client.get_bucket("bucket") is None
+
+
+def test_query_without_tables_is_not_cached(client, fake, tmpdir):
+
+    client.enable_query_cache(str(tmpdir))
+    client.query("SELECT CURRENT_TIMESTAMP()")
+    client.query("SELECT CURRENT_TIMESTAMP()")
+    stats = client.query_cache_stats()
+    assert stats["hits"] == 0
+    assert stats["entries"] == 0
+
+
+def test_unsavable_result_is_returned(client, fake, tmpdir, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise ValueError("can not serialize")
+
+    make_table(client, "ds.source")
+    cache = client.enable_query_cache(str(tmpdir))
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", fail)
+    monkeypatch.setattr(pd.DataFrame, "to_pickle", fail)
+    assert len(client.query("SELECT * FROM ds.source")) > 0
+    assert cache.stats()["entries"] == 0
+    assert tmpdir.listdir() == []
+
+
+def test_corrupt_entry_is_deleted(client, fake, tmpdir):
+
+    make_table(client, "ds.source")
+    cache = client.enable_query_cache(str(tmpdir))
+    expected = client.query("SELECT * FROM ds.source")
+    entry, = tmpdir.listdir()
+    entry.write_binary(b"truncated")
+    df = client.query("SELECT * FROM ds.source")
+    assert len(df) == len(expected)
+    assert cache.stats()["hits"] == 0
+    # corrupt entry was replaced by the result read again.
+    assert client.query("SELECT * FROM ds.source") is not None
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_errors_bypass_cache(client, fake, tmpdir):
+
+    make_table(client, "ds.source")
+    client.enable_query_cache(str(tmpdir))
+    # source table metadata can not be read (ex: table of other project).
+    fake.config.update(fail_requests=100, error_status=403, error_reason="accessDenied",
+                       error_match=r"^GET .*/tables/source$")
+    assert len(client.query("SELECT * FROM ds.source")) == fake.config["query_rows"]
+    assert client.query_cache_stats()["misses"] == 0
+
+
+def test_lquery_cache_key_has_extract_format(client, fake, tmpdir):
+
+    make_table(client, "ds.source")
+    fake.config.update(query_rows=10)
+    client.enable_query_cache(str(tmpdir))
+    csv = client.lquery("SELECT * FROM ds.source")
+    avro = client.lquery("SELECT * FROM ds.source", extract_format="avro")
+    client.lquery("SELECT * FROM ds.source", extract_format="avro")
+    assert client.query_cache_stats()["hits"] == 1
+    assert client.query_cache_stats()["misses"] == 2
+    assert len(csv) == len(avro) == 10
+
+
+def test_get_during_mutation_does_not_cache_old_metadata(client, fake, monkeypatch):
+
+    make_table(client, "ds.table")
+    client.create_bucket("bucket")
+    client.enable_metadata_cache(ttl=60)
+    try_execute = client._try_execute
+
+    def get_then_execute(req, *args, **kwargs):
+        # other thread reads metadata before the mutation reaches the backend.
+        if req.method in ("DELETE", "PATCH"):
+            client.get_table("ds.table")
+            client.get_bucket("bucket")
+        return try_execute(req, *args, **kwargs)
+
+    monkeypatch.setattr(client, "_try_execute", get_then_execute)
+    client.patch_table("ds.table", {"description": "patched"})
+    assert client.get_table("ds.table")["description"] == "patched"
+    client.delete_table("ds.table")
+    assert client.get_table("ds.table") is None
+    client.delete_bucket("bucket")
+    assert client.get_bucket("bucket") is None
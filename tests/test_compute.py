@@ -0,0 +1,20 @@
+import pytest
+
+
+def test_batch_retries_only_failed_items(client, fake):
+
+    fake.config.update(fail_requests=1, error_status=503, error_reason="backendError",
+                       error_match=r"^POST .*/instances/b/stop$")
+    client.stop_instance("zone", ["a", "b", "c"])
+    path = "POST /compute/beta/projects/{0}/zones/zone/instances/{1}/stop"
+    assert fake.counts[path.format(client._project_id, "a")] == 1
+    assert fake.counts[path.format(client._project_id, "b")] == 2
+    assert fake.counts[path.format(client._project_id, "c")] == 1
+
+
+def test_batch_raises_item_error(client, fake):
+
+    fake.config.update(fail_requests=1, error_status=403, error_reason="forbidden",
+                       error_match=r"^DELETE .*/instances/b$")
+    with pytest.raises(Exception):
+        client.delete_instance("zone", ["a", "b"])
@@ -0,0 +1,64 @@
+import os
+import stat
+import time
+import threading
+import dsclient
+from dsclient.credentials import CredentialManager, TokenCache
+
+
+class SlowCredentials(object):
+
+    token_expiry = None
+
+    def __init__(self):
+
+        self.access_token = None
+        self.refreshes = 0
+
+    def refresh(self, http):
+
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.access_token = "token-{0}".format(self.refreshes)
+
+
+def test_refresh_is_shared_by_threads():
+
+    credentials = SlowCredentials()
+    manager = CredentialManager(credentials, "key")
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get_token()))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tokens == ["token-1"] * 10
+    assert credentials.refreshes == 1
+
+
+def test_token_cache_files_are_private(tmpdir):
+
+    directory = os.path.join(str(tmpdir), "token")
+    manager = CredentialManager(SlowCredentials(), "key", TokenCache(directory))
+    assert manager.get_token() == "token-1"
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    for name in os.listdir(directory):
+        assert stat.S_IMODE(os.stat(os.path.join(directory, name)).st_mode) == 0o600
+
+    # other process of the same key file reads token without request.
+    credentials = SlowCredentials()
+    other = CredentialManager(credentials, "key", TokenCache(directory))
+    other.load_cached()
+    assert other.get_token() == "token-1"
+    assert credentials.refreshes == 0
+
+
+def test_token_is_kept_in_memory_by_default(monkeypatch, tmpdir):
+
+    monkeypatch.delenv("DSCLIENT_TOKEN_CACHE", raising=False)
+    monkeypatch.setenv("HOME", str(tmpdir))
+    client = dsclient.Client("test-project")
+    monkeypatch.setattr(client, "_load_credentials", lambda scopes: SlowCredentials())
+    assert client._get_credentials(None).get_token() == "token-1"
+    assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,12 @@
+import numpy as np
+import pandas as pd
+
+
+def test_gql_dtypes(client, fake):
+
+    fake.config.update(gql_entities=250, page_size=100)
+    df = client.gql("SELECT * FROM Bench")
+    assert len(df) == 250
+    assert df["id"].dtype == np.int64
+    assert df["flag"].dtype == np.bool_
+    assert df["created"].iloc[0] == pd.Timestamp("2017-01-01", tz="UTC")
@@ -0,0 +1,66 @@
+import os
+import json
+import pytest
+import dsclient
+from dsclient import discovery
+from dsclient.base import ClientBase
+from dsclient.credentials import StaticCredentials
+
+DOCUMENT = json.dumps({"name": "storage", "version": "v1", "rootUrl": "https://www.googleapis.com/"})
+
+
+def test_client_builds_nothing_until_used(fake, monkeypatch):
+
+    def fail(*args):
+        raise AssertionError("built at construction")
+
+    monkeypatch.setattr(ClientBase, "_build_service", fail)
+    monkeypatch.setattr(ClientBase, "_load_credentials", fail)
+    client = dsclient.Client("test-project")
+    assert client._services == {} and client._credentials is None
+
+
+def test_only_used_service_is_built(fake):
+
+    client = dsclient.Client("test-project")
+    client._credentials = StaticCredentials()
+    client.create_bucket("bucket")
+    client.get_bucket("bucket")
+    assert list(client._services) == [("storage", "v1")]
+
+
+def test_document_from_disk_cache(monkeypatch, tmpdir):
+
+    fetched = []
+
+    def fetch(api_name, api_version):
+        fetched.append(api_name)
+        return DOCUMENT
+
+    monkeypatch.setattr(discovery, "_packaged_path", lambda api_name, api_version: None)
+    monkeypatch.setattr(discovery, "_fetch", fetch)
+    cache_dir = str(tmpdir)
+    assert discovery.load_document("storage", "v1", cache_dir) == DOCUMENT
+    assert os.path.exists(os.path.join(cache_dir, "storage.v1.json"))
+    assert discovery.load_document("storage", "v1", cache_dir) == DOCUMENT
+    assert fetched == ["storage"]
+
+
+def test_stale_document_used_offline(monkeypatch, tmpdir):
+
+    def offline(api_name, api_version):
+        raise IOError("offline")
+
+    monkeypatch.setattr(discovery, "_packaged_path", lambda api_name, api_version: None)
+    monkeypatch.setattr(discovery, "_fetch", offline)
+    tmpdir.join("storage.v1.json").write(DOCUMENT)
+    # expired cache is used when fetch fails.
+    assert discovery.load_document("storage", "v1", str(tmpdir), max_age=0) == DOCUMENT
+    with pytest.raises(IOError):
+        discovery.load_document("bigquery", "v2", str(tmpdir))
+
+
+def test_root_url_of_stand_in_server():
+
+    document = json.loads(discovery.with_root_url(DOCUMENT, "http://127.0.0.1:8080"))
+    assert document["rootUrl"] == "http://127.0.0.1:8080/"
@@ -0,0 +1,49 @@
+import pickle
+import pytest
+
+
+def test_download_in_chunks(client, fake):
+
+    client.create_bucket("bucket")
+    blob = bytes(bytearray(range(256))) * 4096
+    client.write_blob(blob, "gs://bucket/blob")
+    assert client.read_blob("gs://bucket/blob") == blob
+    with client.download("gs://bucket/blob", chunk_size=256 * 1024) as fileobj:
+        assert pickle.load(fileobj) == blob
+
+
+def test_download_retries_by_client_policy(client, fake):
+
+    client.create_bucket("bucket")
+    blob = b"x" * (1024 * 1024)
+    client.write_blob(blob, "gs://bucket/blob")
+    fake.config.update(fail_requests=2, error_match="^GET /storage/v1/b/bucket/o/blob$")
+    with client.download("gs://bucket/blob", chunk_size=256 * 1024) as fileobj:
+        assert pickle.load(fileobj) == blob
+    stats = client.stats().set_index("method")
+    # 4 chunks of object and a short last one, 2 retries.
+    assert stats.loc["objects.get", "calls"] == 5
+    assert stats.loc["objects.get", "retries"] == 2
+    assert stats.loc["objects.get", "bytes_in"] > len(blob)
+
+
+def test_download_is_pinned_to_generation(client, fake, monkeypatch):
+
+    client.create_bucket("bucket")
+    client.write_blob(b"x" * (1024 * 1024), "gs://bucket/blob")
+    execute = client._instrumented_execute
+    chunks = []
+
+    def overwrite_after_first_chunk(req, *args, **kwargs):
+        if "alt=media" not in req.uri:
+            return execute(req, *args, **kwargs)
+        chunks.append(req.uri)
+        content = execute(req, *args, **kwargs)
+        if len(chunks) == 1:
+            client.write_blob(b"y" * (1024 * 1024), "gs://bucket/blob")
+        return content
+
+    monkeypatch.setattr(client, "_instrumented_execute", overwrite_after_first_chunk)
+    with pytest.raises(Exception, match="overwritten"):
+        client.download("gs://bucket/blob", chunk_size=256 * 1024)
+    assert "generation=" in chunks[1]
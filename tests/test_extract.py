@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def table(client, fake):
+
+    fake.config.update(query_rows=50)
+    client.create_dataset("ds")
+    client.query("SELECT 1", table_name="ds.table")
+    client.create_bucket("bucket")
+    return "ds.table"
+
+
+def test_extract_gzip_csv(client, fake, table):
+
+    client.extract(table, "gs://bucket/table-*.csv.gz", compression="GZIP")
+    extract = list(fake.jobs.values())[-1]["configuration"]["extract"]
+    assert extract["compression"] == "GZIP"
+    assert extract["printHeader"] is True
+    with client.download("gs://bucket/table-000000000000.csv.gz") as fileobj:
+        assert fileobj.read(2) == b"\x1f\x8b"
+    # gzip is inferred from suffix.
+    df = client.read_csv("gs://bucket/table-*.csv.gz")
+    assert df["id"].tolist() == list(range(50))
+
+
+def test_extract_ndjson_and_avro(client, fake, table):
+
+    client.extract(table, "gs://bucket/table-*.json.gz",
+                   destination_format="NEWLINE_DELIMITED_JSON", compression="GZIP")
+    df = client.read_ndjson("gs://bucket/table-*.json.gz")
+    # values are not converted, BigQuery writes INTEGER as string.
+    assert df["id"].astype(int).tolist() == list(range(50))
+    assert "printHeader" not in list(fake.jobs.values())[-1]["configuration"]["extract"]
+
+    pytest.importorskip("fastavro")
+    client.extract(table, "gs://bucket/table-*.avro", destination_format="AVRO",
+                   compression="DEFLATE")
+    df = client.read_avro("gs://bucket/table-*.avro")
+    # avro values are typed, not read as strings.
+    assert str(df["id"].dtype) == "int64"
+    assert df["flag"].tolist() == [i % 2 == 1 for i in range(50)]
+
+
+def test_extract_read_csv_formats(client, fake, table):
+
+    df = client.extract_read_csv(table, bucket="bucket", extract_format="json.gz")
+    assert df["id"].tolist() == list(range(50))
+    with pytest.raises(Exception, match="extract format must be one of"):
+        client.extract_read_csv(table, bucket="bucket", extract_format="parquet")
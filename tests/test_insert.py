@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+def test_streaming_insert(client, fake):
+
+    client.create_dataset("ds")
+    df = pd.DataFrame({"id": np.arange(1000)})
+    client.insert(df, "ds.streamed", max_rows=300, verbose=False)
+    assert client.get_table("ds.streamed", use_cache=False)["numRows"] == "1000"
+
+
+def test_streaming_insert_retries_rows_by_policy(client, fake):
+
+    from dsclient.retry import RetryPolicy
+    client.create_dataset("ds")
+    # insertAll requests are not retried, failed rows are retried by insert.
+    client.set_retry_policy(RetryPolicy(max_attempts=1))
+    df = pd.DataFrame({"id": np.arange(1000)})
+    fake.config.update(fail_requests=1, error_match="insertAll")
+    retry = RetryPolicy(max_attempts=1)
+    result = client.insert(df, "ds.streamed", max_rows=300, workers=1, retry=retry, verbose=False)
+    assert result["inserted"] == 700
+    assert [error["index"] for error in result["errors"]] == list(range(300))
+
+    fake.config.update(fail_requests=1)
+    retry = RetryPolicy(max_attempts=2, initial=0.001)
+    result = client.insert(df, "ds.streamed_2", max_rows=300, workers=1, retry=retry, verbose=False)
+    assert result["inserted"] == 1000
+    assert result["seconds"] < 1
@@ -0,0 +1,36 @@
+import pytest
+import pandas as pd
+from dsclient.errors import BigQueryError
+
+
+def test_load_partitioned_polls_with_backoff(client, fake):
+
+    client.create_dataset("ds")
+    fake.config.update(job_seconds=1.0)
+    df = pd.DataFrame({"day": pd.to_datetime(["2017-01-01", "2017-01-02"]), "v": [1, 2]})
+    result = client.load_partitioned(df, "ds.part", "day")
+    assert result["state"].tolist() == ["DONE", "DONE"]
+    # polled at 0.5s, 0.75s, 1.125s ... while jobs run, not in busy loop.
+    assert client.stats().set_index("method").loc["batch:jobs.get", "calls"] <= 6
+
+
+def test_failed_query_job_raises_bigquery_error(client, fake):
+
+    client.create_dataset("ds")
+    fake.config.update(fail_jobs=1, error_reason="invalidQuery", job_seconds=0.2)
+    job = client.query("SELECT 1", table_name="ds.result", block=False)
+    assert isinstance(job.exception(), BigQueryError)
+    with pytest.raises(BigQueryError) as e:
+        job.result()
+    assert e.value.reasons == ["invalidQuery"]
+    # the error of getQueryResults is not retried.
+    assert client.stats().set_index("method").loc["jobs.getQueryResults", "retries"] == 0
+
+
+def test_query_job_failed_by_backend_error_is_inserted_again(client, fake):
+
+    client.create_dataset("ds")
+    fake.config.update(query_rows=10, fail_jobs=1, job_seconds=0.2)
+    client.query("SELECT 1", table_name="ds.result")
+    assert client.get_table("ds.result", use_cache=False)["numRows"] == "10"
+    assert client.stats().set_index("method").loc["jobs.insert", "calls"] == 2
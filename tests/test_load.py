@@ -0,0 +1,45 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+
+def test_load_dataframe(client, fake):
+
+    client.create_dataset("ds")
+    df = pd.DataFrame({"id": np.arange(1000), "name": ["x"] * 1000})
+    client.load(df, "ds.loaded", chunk_rows=100)
+    assert client.get_table("ds.loaded", use_cache=False)["numRows"] == "1000"
+    client.load(df, "ds.loaded")
+    assert client.get_table("ds.loaded", use_cache=False)["numRows"] == "2000"
+    client.load(df, "ds.loaded", append=False)
+    assert client.get_table("ds.loaded", use_cache=False)["numRows"] == "1000"
+
+
+def test_upload_rewinds_by_serializing_again():
+
+    from dsclient.bigquery.upload import DataFrameUpload
+    upload = DataFrameUpload(pd.DataFrame({"id": np.arange(1000)}), chunk_rows=100, chunksize=1024)
+    first = upload.getbytes(0, 1024)
+    second = upload.getbytes(1024, 1024)
+    assert upload.getbytes(0, 1024) == first
+    assert upload.getbytes(1024, 1024) == second
+    assert upload.getbytes(512, 1024) == (first + second)[512:1536]
+
+
+def test_load_job_retried_with_new_upload(client, fake):
+
+    client.create_dataset("ds")
+    fake.config.update(fail_jobs=1)
+    df = pd.DataFrame({"id": np.arange(1000), "name": ["x"] * 1000})
+    client.load(df, "ds.loaded", chunk_rows=100, chunk_size=256 * 1024)
+    assert client.get_table("ds.loaded", use_cache=False)["numRows"] == "1000"
+    assert fake.config["fail_jobs"] == 0
+
+
+@pytest.mark.parametrize("source_format", ["CSV", "NEWLINE_DELIMITED_JSON", "AVRO", "PARQUET"])
+def test_load_source_formats(client, fake, source_format):
+
+    client.create_dataset("ds")
+    df = pd.DataFrame({"id": np.arange(5), "name": list("abcde")})
+    client.load(df, "ds.loaded", source_format=source_format)
+    assert client.get_table("ds.loaded", use_cache=False)["numRows"] == "5"
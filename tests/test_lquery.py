@@ -0,0 +1,76 @@
+import pytest
+import pandas as pd
+
+
+def test_lquery(client, fake):
+
+    fake.config.update(query_rows=100)
+    df = client.lquery("SELECT 1", use_cache=False, processes=1)
+    assert len(df) == 100
+    assert list(df.columns) == ["id", "value", "name", "flag", "ts"]
+    # temporary dataset, table, objects and bucket are deleted.
+    assert not fake.datasets and not fake.tables and not fake.buckets
+
+
+def test_cleanup_errors_do_not_hide_error(client, fake, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise ValueError("read failed")
+
+    monkeypatch.setattr(client, "_extract_read", fail)
+    # listing temporary objects to delete them fails.
+    fake.config.update(fail_requests=100, error_status=403, error_reason="forbidden",
+                       error_match=r"^GET /storage/v1/b/[^/]+/o$")
+    with pytest.raises(ValueError):
+        client.lquery("SELECT 1", use_cache=False)
+    assert fake.errors > 0
+    assert not fake.datasets and not fake.buckets
+
+
+def test_read_csv_shards_in_processes(client, fake):
+
+    client.create_bucket("bucket")
+    for i in range(6):
+        client.write_csv(pd.DataFrame({"id": [i] * 10}), "gs://bucket/part-{0}.csv".format(i))
+    df = client.read_csv("gs://bucket/part-*", workers=2, processes=2)
+    assert df["id"].tolist() == [i for i in range(6) for _ in range(10)]
+
+
+def test_shards_parsed_in_threads_by_default(client, fake, monkeypatch):
+
+    def no_pool(processes):
+        raise AssertionError("process pool is opt-in")
+
+    monkeypatch.setattr("dsclient.storage.client._process_pool", no_pool)
+    fake.config.update(query_rows=100)
+    assert len(client.lquery("SELECT 1", use_cache=False)) == 100
+    client.create_bucket("bucket")
+    for i in range(6):
+        client.write_csv(pd.DataFrame({"id": [i] * 10}), "gs://bucket/part-{0}.csv".format(i))
+    df = client.read_csv("gs://bucket/part-*", workers=2)
+    assert df["id"].tolist() == [i for i in range(6) for _ in range(10)]
+
+
+@pytest.mark.parametrize("extract_format", ["csv", "csv.gz", "json", "json.gz", "avro", "avro.deflate"])
+def test_lquery_extract_formats(client, fake, extract_format):
+
+    fake.config.update(query_rows=100)
+    df = client.lquery("SELECT 1", use_cache=False, extract_format=extract_format)
+    assert len(df) == 100
+    assert df["id"].tolist() == list(range(100))
+    assert df["flag"].tolist() == [i % 2 == 1 for i in range(100)]
+
+
+@pytest.mark.parametrize("extract_format", ["csv", "json", "avro"])
+def test_lquery_dtypes_do_not_depend_on_format(client, fake, extract_format):
+
+    fake.config.update(query_rows=100)
+    df = client.lquery("SELECT 1", use_cache=False, extract_format=extract_format,
+                       categorical=True, nullable=True)
+    assert str(df["id"].dtype) == "Int64"
+    assert str(df["flag"].dtype) == "boolean"
+    assert str(df["name"].dtype) == "category"
+    assert str(df["ts"].dtype) == "datetime64[ns]"
+    chunk = next(client.lquery_iter("SELECT 1", chunk_rows=50, extract_format=extract_format,
+                                    categorical=True, nullable=True))
+    assert [str(dtype) for dtype in chunk.dtypes] == [str(dtype) for dtype in df.dtypes]
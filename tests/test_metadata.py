@@ -0,0 +1,46 @@
+def make_tables(client, names):
+
+    client.create_dataset("ds")
+    for name in names:
+        client.create_table(name, {"schema": {"fields": [{"name": "id", "type": "INTEGER"}]}})
+
+
+def test_get_tables_in_batches(client, fake):
+
+    names = ["ds.t{0}".format(i) for i in range(4)]
+    make_tables(client, names)
+    http_requests = fake.http_requests
+    tables = client.get_tables(names + ["ds.missing"], batch_size=2)
+    assert fake.http_requests - http_requests == 3
+    assert list(tables) == names + ["ds.missing"]
+    assert [table["tableReference"]["tableId"] for table, error in list(tables.values())[:4]] == \
+           ["t0", "t1", "t2", "t3"]
+    assert tables["ds.missing"] == (None, None)
+    datasets = client.get_datasets(["ds", "missing"])
+    assert datasets["ds"][0]["datasetReference"]["datasetId"] == "ds"
+    assert datasets["missing"] == (None, None)
+
+
+def test_patch_and_delete_tables(client, fake):
+
+    names = ["ds.t{0}".format(i) for i in range(3)]
+    make_tables(client, names)
+    patched = client.patch_tables(dict((name, {"description": name}) for name in names))
+    assert all(error is None for table, error in patched.values())
+    assert client.get_table("ds.t1")["description"] == "ds.t1"
+
+    # errors are returned by item, other items are deleted.
+    deleted = client.delete_tables(names + ["ds.missing"])
+    assert all(deleted[name][1] is None for name in names)
+    assert deleted["ds.missing"][1].resp.status == 404
+    assert not fake.tables
+
+
+def test_batch_items_retried_by_policy(client, fake):
+
+    names = ["ds.t{0}".format(i) for i in range(3)]
+    make_tables(client, names)
+    fake.config.update(fail_requests=1, error_match=r"^GET .*/tables/t1$")
+    tables = client.get_tables(names)
+    assert all(error is None for table, error in tables.values())
+    assert fake.errors == 1
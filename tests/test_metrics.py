@@ -0,0 +1,25 @@
+from dsclient.metrics import MemoryCollector
+
+
+def test_stats_per_method(client, fake):
+
+    client.create_bucket("bucket")
+    for _ in range(3):
+        client.get_bucket("bucket", use_cache=False)
+    stats = client.stats().set_index("method")
+    assert stats.loc["buckets.get", "calls"] == 3
+    assert stats.loc["buckets.insert", "calls"] == 1
+
+
+def test_calls_without_collectors(client, fake):
+
+    client.remove_collector(client._stats_collector)
+    client.create_bucket("bucket")
+    assert client.get_bucket("bucket", use_cache=False)["name"] == "bucket"
+
+
+def test_added_collector(client, fake):
+
+    collector = client.add_collector(MemoryCollector())
+    client.create_bucket("bucket")
+    assert collector.summary()["calls"].sum() == 1
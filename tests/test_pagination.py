@@ -0,0 +1,72 @@
+import pandas as pd
+
+TABLES = "GET /bigquery/v2/projects/test-project/datasets/ds/*"
+
+
+def make_tables(client, count):
+
+    client.create_dataset("ds")
+    for i in range(count):
+        client.create_table("ds.t{0}".format(i), {"schema": {"fields": [{"name": "id", "type": "INTEGER"}]}})
+
+
+def test_iter_tables_requests_pages_when_needed(client, fake):
+
+    make_tables(client, 5)
+    tables = client.iter_tables("ds", page_size=2)
+    assert TABLES not in fake.counts
+    assert next(tables)["tableReference"]["tableId"] == "t0"
+    next(tables)
+    assert fake.counts[TABLES] == 1
+    next(tables)
+    assert fake.counts[TABLES] == 2
+    assert [table["tableReference"]["tableId"] for table in client.iter_tables("ds", page_size=2)] == \
+           ["t{0}".format(i) for i in range(5)]
+
+
+def test_max_items_stops_early(client, fake):
+
+    make_tables(client, 5)
+    fake.counts.clear()
+    assert len(list(client.iter_tables("ds", page_size=2, max_items=3))) == 3
+    assert fake.counts[TABLES] == 2
+    df = client.tables_frame("ds", page_size=2)
+    assert df["table_name"].tolist() == ["ds.t{0}".format(i) for i in range(5)]
+    assert list(df.columns) == ["table_name", "type", "creationTime"]
+
+
+def test_iter_buckets_and_objects(client, fake):
+
+    for name in ["data-a", "data-b", "logs"]:
+        client.create_bucket(name)
+    names = [bucket["name"] for bucket in client.iter_buckets(prefix="data-", page_size=1)]
+    assert names == ["data-a", "data-b"]
+    assert client.list_bucket(prefix="data-", maxResults=1)["items"][0]["name"] == "data-a"
+
+    for i in range(5):
+        client.write_text("x", "gs://data-a/part-{0}.txt".format(i))
+    client.write_text("x", "gs://data-a/part-0.csv")
+    uris = client.list_object("gs://data-a/part-*.txt")
+    assert uris == ["gs://data-a/part-{0}.txt".format(i) for i in range(5)]
+    items = list(client.iter_objects("gs://data-a/part-*.txt", page_size=2, max_items=3))
+    assert [item["name"] for item in items] == ["part-0.txt", "part-1.txt", "part-2.txt"]
+
+
+def test_show_jobs_reads_at_most_max_items(client, fake, monkeypatch):
+
+    for _ in range(150):
+        fake._job("test-project", {"query": {"query": "SELECT 1"}})
+    fake.config.update(page_size=40)
+    frames = []
+    jobs_frame = client.jobs_frame
+
+    def record(*args, **kwargs):
+        frames.append(jobs_frame(*args, **kwargs))
+        return frames[-1]
+
+    monkeypatch.setattr(client, "jobs_frame", record)
+    client.show_jobs()
+    assert len(frames[0]) == 100
+    assert fake.counts["GET /bigquery/v2/projects/test-project/*"] == 3
+    client.show_jobs(max_items=None)
+    assert len(frames[1]) == 150
@@ -0,0 +1,81 @@
+import time
+import threading
+import pandas as pd
+
+RESULTS = "GET /bigquery/v2/projects/test-project/queries/*"
+
+
+def test_query_pages_by_token(client, fake):
+
+    fake.config.update(query_rows=1000, page_size=100)
+    df = client.query("SELECT 1", use_cache=False)
+    assert df["id"].tolist() == list(range(1000))
+    # first page comes with jobs.query.
+    assert fake.counts[RESULTS] == 9
+
+
+def test_query_pages_in_parallel(client, fake, monkeypatch):
+
+    fake.config.update(query_rows=1000, page_size=100, latency=0.01)
+    get_range = client._get_query_range
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def count_running(*args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            return get_range(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(client, "_get_query_range", count_running)
+    df = client.query("SELECT 1", use_cache=False, workers=4, page_size=100)
+    expected = client.query("SELECT 1", use_cache=False)
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+    assert 1 < peak[0] <= 4
+
+
+def test_query_range_larger_than_server_page(client, fake):
+
+    # server answers fewer rows than maxResults, each range reads until it is complete.
+    fake.config.update(query_rows=1000, page_size=100)
+    df = client.query("SELECT 1", use_cache=False, workers=3, page_size=300)
+    assert df["id"].tolist() == list(range(1000))
+
+
+def test_query_iter_chunks(client, fake):
+
+    fake.config.update(query_rows=1000, page_size=100)
+    chunks = client.query_iter("SELECT 1", chunk_rows=300)
+    # query is started by the first chunk.
+    assert fake.counts == {}
+    sizes = [len(chunk) for chunk in chunks]
+    assert sizes == [300, 300, 300, 100]
+    pages = list(client.query_iter("SELECT 1", workers=4, page_size=100))
+    assert [len(page) for page in pages] == [100] * 10
+    assert pd.concat(pages)["id"].tolist() == list(range(1000))
+
+
+def test_query_iter_prefetch_is_bounded(client, fake, monkeypatch):
+
+    fake.config.update(query_rows=1000, page_size=100)
+    get_range = client._get_query_range
+    calls = []
+
+    def record(*args):
+        calls.append(args[2])
+        return get_range(*args)
+
+    monkeypatch.setattr(client, "_get_query_range", record)
+    pages = client.query_iter("SELECT 1", workers=4, page_size=100, prefetch=2)
+    next(pages)
+    assert calls == []
+    next(pages)
+    time.sleep(0.2)
+    # first range is consumed, at most prefetch ranges are ahead of it.
+    assert sorted(calls) == [100, 200, 300]
+    pages.close()
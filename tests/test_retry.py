@@ -0,0 +1,73 @@
+import pytest
+from googleapiclient.errors import HttpError
+from dsclient.retry import RetryPolicy, RetryBudget
+
+
+def test_retries_transient_errors(client, fake):
+
+    client.create_bucket("bucket")
+    fake.config.update(fail_requests=2)
+    assert client.get_bucket("bucket", use_cache=False)["name"] == "bucket"
+    stats = client.stats().set_index("method")
+    assert stats.loc["buckets.get", "retries"] == 2
+    assert stats.loc["buckets.get", "errors"] == 0
+
+
+def test_raises_after_max_attempts(client, fake):
+
+    client.create_bucket("bucket")
+    fake.config.update(fail_requests=10)
+    with pytest.raises(HttpError) as e:
+        client.get_bucket("bucket", use_cache=False)
+    assert e.value.resp.status == 503
+    assert fake.errors == client.get_retry_policy().max_attempts
+
+
+def test_per_call_max_attempts(client, fake):
+
+    fake.config.update(fail_requests=10)
+    with pytest.raises(HttpError):
+        client.create_bucket("bucket", retry=2)
+    assert fake.errors == 2
+
+
+def test_does_not_retry_client_errors(client, fake):
+
+    client.create_bucket("bucket")
+    with pytest.raises(HttpError) as e:
+        client.create_bucket("bucket")
+    assert e.value.resp.status == 409
+    assert client.stats().set_index("method").loc["buckets.insert", "retries"] == 0
+
+
+def test_budget_stops_retries(client, fake):
+
+    client.set_retry_policy(RetryPolicy(initial=0.001, budget=RetryBudget(tokens=1, ratio=0)))
+    client.create_bucket("bucket")
+    fake.config.update(fail_requests=100)
+    for _ in range(2):
+        with pytest.raises(HttpError):
+            client.get_bucket("bucket", use_cache=False)
+    # first call retries once with the only token, second call fails at once.
+    assert fake.errors == 3
+
+
+def test_retry_after(client, fake):
+
+    import time
+    client.create_bucket("bucket")
+    fake.config.update(fail_requests=1, retry_after=0.2)
+    start = time.time()
+    client.get_bucket("bucket", use_cache=False)
+    assert time.time() - start >= 0.2
+
+
+def test_transport_errors_exclude_local_os_errors():
+
+    import errno
+    import socket
+    policy = RetryPolicy()
+    assert policy.retryable(socket.error(errno.ECONNRESET, "connection reset"))
+    assert policy.retryable(socket.timeout())
+    assert not policy.retryable(IOError(errno.ENOENT, "no such file"))
+    assert not policy.retryable(OSError(errno.EACCES, "permission denied"))
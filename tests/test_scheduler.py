@@ -0,0 +1,59 @@
+import pandas as pd
+
+
+def test_scheduler_runs_all_jobs(client, fake):
+
+    client.create_dataset("ds")
+    client.load(pd.DataFrame({"id": range(10)}), "ds.source")
+    scheduler = client.scheduler(max_running=3)
+    for i in range(10):
+        scheduler.submit_copy("ds.source", "ds.copy{0}".format(i))
+    finished = scheduler.wait_all()
+    assert len(finished) == 10
+    assert all(scheduled.exception() is None for scheduled in finished)
+    assert client.get_table("ds.copy9", use_cache=False)["numRows"] == "10"
+
+
+def test_scheduler_retries_rate_limited_jobs(client, fake):
+
+    client.create_dataset("ds")
+    client.load(pd.DataFrame({"id": range(10)}), "ds.source")
+    scheduler = client.scheduler(max_running=2, backoff=0.01, max_backoff=0.05)
+    fake.config.update(fail_requests=2, error_status=403, error_reason="rateLimitExceeded",
+                       error_match="POST .*/jobs$")
+    for i in range(3):
+        scheduler.submit_copy("ds.source", "ds.copy{0}".format(i))
+    finished = scheduler.wait_all()
+    assert all(scheduled.exception() is None for scheduled in finished)
+    assert fake.errors == 2
+
+
+def test_scheduler_fails_job_on_start_error(client, fake):
+
+    client.create_dataset("ds")
+    df = pd.DataFrame({"id": range(10)})
+    scheduler = client.scheduler(max_running=2)
+    bad = scheduler.submit_load(df, "ds.bad", source_format="XML")
+    good = [scheduler.submit_load(df, "ds.good{0}".format(i)) for i in range(3)]
+    finished = scheduler.wait_all(return_exceptions=True)
+    assert len(finished) == 4
+    assert "source_format" in str(bad.exception())
+    assert bad.attempts == 1
+    assert all(scheduled.exception() is None for scheduled in good)
+
+
+def test_scheduler_fails_job_on_result_error(client, fake):
+
+    client.create_dataset("ds")
+    client.create_bucket("bucket")
+    client.load(pd.DataFrame({"id": range(10)}), "ds.source")
+    scheduler = client.scheduler(max_running=2)
+    # extracted table is read by get_table when extract job is finished.
+    fake.config.update(fail_requests=100, error_status=403, error_reason="accessDenied",
+                       error_match=r"^GET .*/tables/source$")
+    extract = scheduler.submit_extract("ds.source", "gs://bucket/source-*.csv")
+    copies = [scheduler.submit_copy("ds.source", "ds.copy{0}".format(i)) for i in range(3)]
+    finished = scheduler.wait_all(timeout=30, return_exceptions=True)
+    assert len(finished) == 4
+    assert extract.exception().resp.status == 403
+    assert all(scheduled.exception() is None for scheduled in copies)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from dsclient.schema import Schema
+
+
+SCHEMA = {"fields": [{"name": "i", "type": "INTEGER"}, {"name": "f", "type": "FLOAT"},
+                     {"name": "b", "type": "BOOLEAN"}, {"name": "s", "type": "STRING"}]}
+
+
+def rows(values):
+
+    return [{"f": [{"v": v} for v in row]} for row in values]
+
+
+def test_default_dtypes():
+
+    df = Schema(SCHEMA).to_dataframe(rows([["1", "0.5", "true", "a"], ["2", "1.5", "false", "b"]]))
+    assert df["i"].dtype == np.int64
+    assert df["f"].dtype == np.float64
+    assert df["b"].dtype == np.bool_
+    assert df["b"].tolist() == [True, False]
+    assert df["s"].tolist() == ["a", "b"]
+
+
+def test_null_without_nullable():
+
+    df = Schema(SCHEMA).to_dataframe(rows([["1", None, None, None], [None, "1.5", "true", "b"]]))
+    assert df["i"].dtype == np.float64
+    assert np.isnan(df["i"][1])
+    assert df["b"].tolist() == [None, True]
+
+
+def test_nullable():
+
+    df = Schema(SCHEMA, nullable=True).to_dataframe(rows([["1", None, None, None]]))
+    assert str(df["i"].dtype) == "Int64"
+    assert str(df["b"].dtype) == "boolean"
+
+
+def test_nan_string_is_missing():
+
+    df = Schema(SCHEMA).update_dtype(pd.DataFrame({"s": np.array(["a", "NaN"], dtype=object)}))
+    assert df["s"][0] == "a"
+    assert pd.isnull(df["s"][1])
+
+
+def test_categorical_ratio_decided_once():
+
+    schema = Schema(SCHEMA, categorical=0.6)
+    first = schema.to_dataframe(rows([["1", "0.5", "true", "a"], ["2", "1.5", "false", "a"]]))
+    second = schema.to_dataframe(rows([["3", "0.5", "true", "b"], ["4", "1.5", "false", "c"]]))
+    assert str(first["s"].dtype) == "category"
+    assert str(second["s"].dtype) == "category"
+
+
+def test_categorical_concat_unions_categories():
+
+    schema = Schema(SCHEMA, categorical=True)
+    pages = [schema.to_dataframe(rows([["1", "0.5", "true", "a"]])),
+             schema.to_dataframe(rows([["2", "1.5", "false", "b"]]))]
+    df = schema.concat(pages)
+    assert str(df["s"].dtype) == "category"
+    assert df["s"].tolist() == ["a", "b"]
+
+
+def test_query_categorical(client, fake):
+
+    fake.config.update(query_rows=250, page_size=100)
+    df = client.query("SELECT * FROM ds.source", workers=4, page_size=100, categorical=True)
+    assert len(df) == 250
+    assert str(df["name"].dtype) == "category"
+    assert df["name"].nunique() == 250
+
+    chunks = list(client.query_iter("SELECT * FROM ds.source", chunk_rows=150,
+                                    page_size=100, categorical=0.5))
+    assert [len(chunk) for chunk in chunks] == [150, 100]
+    assert all(str(chunk["name"].dtype) != "category" for chunk in chunks)
@@ -0,0 +1,75 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from dsclient.cache import SingleFlight
+
+
+def run_together(func, count):
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(func) for _ in range(count)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_callers_in_flight_share_call():
+
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return object()
+
+    leader = ThreadPoolExecutor(max_workers=1).submit(single_flight.do, "key", call)
+    started.wait()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        followers = [executor.submit(single_flight.do, "key", call) for _ in range(4)]
+        while single_flight.stats()["shared"] < 4:
+            time.sleep(0.001)
+        release.set()
+    values = [leader.result()] + [future.result() for future in followers]
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+    assert single_flight.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+    # nothing is kept after the call.
+    single_flight.do("key", call)
+    assert len(calls) == 2
+
+
+def test_error_is_shared():
+
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("failed")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(single_flight.do, "key", fail) for _ in range(3)]
+        while single_flight.stats()["shared"] < 2:
+            time.sleep(0.001)
+        release.set()
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result()
+
+
+def test_client_shares_reads_not_mutations(client, fake):
+
+    client.create_bucket("bucket")
+    client.write_text("x", "gs://bucket/text")
+    client.enable_single_flight()
+    fake.config.update(latency=0.2)
+    fake.counts.clear()
+    assert run_together(lambda: client.get_bucket("bucket")["name"], 4) == ["bucket"] * 4
+    assert fake.counts["GET /storage/v1/b/*"] == 1
+    assert run_together(lambda: client.read_text("gs://bucket/text"), 4) == ["x"] * 4
+    assert client.single_flight_stats()["shared"] == 6
+    run_together(lambda: client.write_text("y", "gs://bucket/text"), 4)
+    assert sum(count for key, count in fake.counts.items() if key.startswith("POST")) == 4
@@ -0,0 +1,40 @@
+import os
+import pytest
+
+
+def test_lquery_iter_chunks_from_scratch_files(client, fake, tmpdir):
+
+    fake.config.update(query_rows=1000)
+    scratch_dir = str(tmpdir.mkdir("scratch"))
+    chunks = client.lquery_iter("SELECT 1", chunk_rows=300, scratch_dir=scratch_dir)
+    first = next(chunks)
+    # shard is on local disk, temporary table and objects are already deleted.
+    assert len(os.listdir(scratch_dir)) == 1
+    assert not fake.tables and not fake.buckets
+    sizes = [len(first)] + [len(chunk) for chunk in chunks]
+    assert sizes == [300, 300, 300, 100]
+    assert str(first["id"].dtype) == "int64"
+    assert os.listdir(scratch_dir) == []
+
+
+def test_extract_read_iter(client, fake, tmpdir):
+
+    fake.config.update(query_rows=100)
+    client.create_dataset("ds")
+    client.query("SELECT 1", table_name="ds.table")
+    chunks = list(client.extract_read_iter("ds.table", chunk_rows=40, extract_format="csv.gz",
+                                           scratch_dir=str(tmpdir)))
+    assert [len(chunk) for chunk in chunks] == [40, 40, 20]
+    assert chunks[2]["id"].tolist() == list(range(80, 100))
+
+
+def test_lquery_to_parquet(client, fake, tmpdir):
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    fake.config.update(query_rows=1000)
+    path = client.lquery_to_parquet("SELECT 1", str(tmpdir.join("result.parquet")), chunk_rows=300)
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 1000
+    assert parquet.metadata.num_row_groups == 4
+    types = dict((field.name, str(field.type)) for field in parquet.schema_arrow)
+    assert types["id"] == "int64" and types["flag"] == "bool" and types["name"] == "string"
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+
+def test_csv_roundtrip(client, fake):
+
+    client.create_bucket("bucket")
+    df = pd.DataFrame({"id": np.arange(100), "value": np.arange(100) * 0.5})
+    client.write_csv(df, "gs://bucket/frame.csv")
+    pd.testing.assert_frame_equal(client.read_csv("gs://bucket/frame.csv"), df)
+
+
+def test_read_csv_shards(client, fake):
+
+    client.create_bucket("bucket")
+    for i in range(4):
+        client.write_csv(pd.DataFrame({"id": [i] * 10}), "gs://bucket/part-{0}.csv".format(i))
+    df = client.read_csv("gs://bucket/part-*", processes=1)
+    assert sorted(df["id"].unique()) == [0, 1, 2, 3]
+    assert len(df) == 40
+
+
+def test_read_empty_object(client, fake):
+
+    client.write_text("", "gs://bucket/empty")
+    assert client.read_text("gs://bucket/empty") == ""
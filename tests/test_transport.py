@@ -0,0 +1,55 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import dsclient
+from dsclient.credentials import StaticCredentials
+from dsclient.transport import HttpPool
+
+
+class CountingHttp(object):
+
+    def __init__(self, counter):
+
+        self.connections = {}
+        self._counter = counter
+
+    def request(self, uri, *args, **kwargs):
+
+        with self._counter["lock"]:
+            self._counter["running"] += 1
+            self._counter["peak"] = max(self._counter["peak"], self._counter["running"])
+        time.sleep(0.01)
+        with self._counter["lock"]:
+            self._counter["running"] -= 1
+        return self, uri
+
+
+def test_pool_bounds_concurrent_http(monkeypatch):
+
+    counter = {"lock": threading.Lock(), "running": 0, "peak": 0}
+    pool = HttpPool(StaticCredentials(), size=3)
+    monkeypatch.setattr(pool, "_new_http", lambda: CountingHttp(counter))
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(pool.request, range(30)))
+    assert [uri for http, uri in results] == list(range(30))
+    # each Http is used by one request at a time, and reused by later ones.
+    assert counter["peak"] <= 3
+    assert len(set(id(http) for http, uri in results)) <= 3
+    assert pool.stats() == {"size": 3, "created": 3, "idle": 3}
+    pool.close()
+    assert pool.stats()["created"] == 0
+
+
+def test_client_shared_by_threads(fake):
+
+    client = dsclient.Client("test-project", pool_size=2)
+    client._credentials = StaticCredentials()
+    client.create_bucket("bucket")
+    for i in range(8):
+        client.write_text(str(i), "gs://bucket/{0}.txt".format(i))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        texts = list(executor.map(lambda i: client.read_text("gs://bucket/{0}.txt".format(i)), range(8)))
+    assert texts == [str(i) for i in range(8)]
+    stats = client.pool_stats()
+    assert len(stats) == 1
+    assert stats[0]["created"] <= 2